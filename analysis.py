@@ -0,0 +1,299 @@
+import importlib.util
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import threading
+from dataclasses import astuple, dataclass, field
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+FEATURE_VERSION = 1
+FRAME = 1024
+BLOCK_FRAMES = 64
+DECODE_RATE = 22050
+TEMPO_RANGE = (60.0, 180.0)
+TEMPO_WINDOW = 120.0
+SILENCE_RMS = 1e-3
+PULSE_CLARITY = 0.2
+PULSE_FLOOR = 2.0
+# Nearest-centroid moods in (arousal, valence) space; both axes run 0..1.
+MOOD_CENTROIDS = {"Energetic": (0.85, 0.7), "Happy": (0.55, 0.8), "Calm": (0.25, 0.45), "Sad": (0.15, 0.15)}
+
+@dataclass
+class TrackFeatures:
+    duration: float
+    rms: float
+    dynamics: float
+    zcr: float
+    centroid: float
+    tempo: float
+
+@dataclass
+class AnalysisReport:
+    analyzed: int = 0
+    cached: int = 0
+    tagged: int = 0
+    failed: List[str] = field(default_factory=list)
+    audio_seconds: float = 0.0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def hours_per_minute(self) -> float:
+        # Decoded audio only; cache hits would make the pipeline look arbitrarily fast.
+        return (self.audio_seconds / 3600) / (self.elapsed / 60) if self.elapsed else 0.0
+
+class WavLayout(NamedTuple):
+    encoding: str
+    channels: int
+    sample_rate: int
+    sample_width: int
+    data_offset: int
+    data_size: int
+
+def read_wav_layout(path: str) -> Optional[WavLayout]:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        position = 12
+        while position + 8 <= file_size:
+            f.seek(position)
+            chunk_id, size = struct.unpack("<4sI", f.read(8))
+            if chunk_id == b"fmt ":
+                fmt = f.read(min(size, 40))
+            elif chunk_id == b"data" and fmt is not None:
+                tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if tag == 0xFFFE and len(fmt) >= 26:
+                    tag = struct.unpack("<H", fmt[24:26])[0]
+                width = bits // 8
+                encoding = {(1, 1): "u1", (1, 2): "<i2", (1, 3): "i3", (1, 4): "<i4", (3, 4): "<f4", (3, 8): "<f8"}.get((tag, width))
+                if encoding is None or not channels or not sample_rate:
+                    return None
+                return WavLayout(encoding, channels, sample_rate, width, position + 8, min(size, file_size - position - 8))
+            position += 8 + size + (size & 1)
+    return None
+
+def iter_wav_blocks(path: str, layout: WavLayout, block_frames: int) -> Iterator:
+    # Each block maps only its own window of the file, so resident memory is one
+    # block no matter how long the track is.
+    import numpy as np
+    frame_bytes = layout.channels * layout.sample_width
+    step = block_frames * frame_bytes
+    end = layout.data_offset + layout.data_size - layout.data_size % frame_bytes
+    with open(path, "rb") as f:
+        for start in range(layout.data_offset, end, step):
+            length = min(step, end - start)
+            aligned = start - start % mmap.ALLOCATIONGRANULARITY
+            with mmap.mmap(f.fileno(), length + start - aligned, access=mmap.ACCESS_READ, offset=aligned) as window:
+                raw = np.frombuffer(window, dtype=np.uint8, count=length, offset=start - aligned)
+                samples = _to_float(raw, layout.encoding).reshape(-1, layout.channels)
+                del raw
+                yield samples @ np.full(layout.channels, 1 / layout.channels, dtype=np.float32) if layout.channels > 1 else samples[:, 0]
+
+def _to_float(raw, encoding: str):
+    import numpy as np
+    if encoding == "u1":
+        return (raw.astype(np.float32) - 128.0) / 128.0
+    if encoding == "i3":
+        triples = raw.reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        return values.astype(np.float32) / 8388608.0
+    values = raw.view(np.dtype(encoding))
+    if values.dtype.kind == "f":
+        return values.astype(np.float32)
+    return values.astype(np.float32) / float(2 ** (8 * values.dtype.itemsize - 1))
+
+def iter_decoded_blocks(path: str, block_frames: int, sample_rate: int = DECODE_RATE) -> Iterator:
+    # Compressed formats are streamed through ffmpeg as mono PCM, one block at a time.
+    import numpy as np
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            chunk = process.stdout.read(block_frames * 2)
+            if len(chunk) < 2:
+                break
+            yield np.frombuffer(chunk[:len(chunk) - len(chunk) % 2], dtype="<i2").astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+def open_blocks(path: str, block_frames: int = FRAME * BLOCK_FRAMES) -> Optional[Tuple[int, Iterator]]:
+    layout = read_wav_layout(path) if path.lower().endswith(".wav") else None
+    if layout is not None:
+        return layout.sample_rate, iter_wav_blocks(path, layout, block_frames)
+    if shutil.which("ffmpeg"):
+        return DECODE_RATE, iter_decoded_blocks(path, block_frames)
+    return None
+
+class FeatureAccumulator:
+    def __init__(self, sample_rate: int):
+        import numpy as np
+        self.np = np
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self.voiced = 0
+        self.rms_sum = 0.0
+        self.rms_squares = 0.0
+        self.zcr_sum = 0.0
+        self.centroid_sum = 0.0
+        self.window = np.hanning(FRAME).astype(np.float32)
+        self.bins = np.fft.rfftfreq(FRAME, 1.0 / sample_rate).astype(np.float32)
+        self.previous = np.zeros(len(self.bins), dtype=np.float32)
+        self.carry = np.zeros(0, dtype=np.float32)
+        # Onset strength ring buffer: the tempo estimate only ever sees the latest window.
+        self.envelope = np.zeros(max(1, int(TEMPO_WINDOW * sample_rate / FRAME)), dtype=np.float32)
+        self.written = 0
+
+    def feed(self, samples):
+        np = self.np
+        if len(self.carry):
+            samples = np.concatenate((self.carry, samples))
+        usable = len(samples) - len(samples) % FRAME
+        self.carry = samples[usable:].copy()
+        if not usable:
+            return
+        frames = samples[:usable].reshape(-1, FRAME)
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / FRAME)
+        zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / FRAME
+        spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1)).astype(np.float32)
+        power = spectrum.sum(axis=1)
+        voiced = (rms > SILENCE_RMS) & (power > 0)
+        centroid = (spectrum @ self.bins) / np.where(power > 0, power, 1)
+        compressed = np.log1p(spectrum)
+        flux = np.maximum(np.diff(compressed, axis=0, prepend=self.previous[None, :]), 0).sum(axis=1)
+        self.previous = compressed[-1]
+        self.frames += len(frames)
+        self.voiced += int(voiced.sum())
+        self.rms_sum += float(rms.sum())
+        self.rms_squares += float((rms * rms).sum())
+        self.zcr_sum += float(zcr[voiced].sum())
+        self.centroid_sum += float(centroid[voiced].sum())
+        self._push_envelope(flux)
+
+    def _push_envelope(self, values):
+        size = len(self.envelope)
+        self.written += max(0, len(values) - size)
+        values = values[-size:]
+        slot = self.written % size
+        head = min(len(values), size - slot)
+        self.envelope[slot:slot + head] = values[:head]
+        self.envelope[:len(values) - head] = values[head:]
+        self.written += len(values)
+
+    def tempo(self) -> float:
+        np = self.np
+        size = len(self.envelope)
+        count = min(self.written, size)
+        fps = self.sample_rate / FRAME
+        if count < 8 * fps:
+            return 0.0
+        slot = self.written % size
+        envelope = np.roll(self.envelope, -slot)[-count:] if self.written > size else self.envelope[:count]
+        if envelope.mean() < PULSE_FLOOR:
+            return 0.0
+        # A short blur lets beats that fall between frame boundaries still line up.
+        envelope = np.convolve(envelope - envelope.mean(), (0.25, 0.5, 0.25), mode="same")
+        spectrum = np.fft.rfft(envelope, 2 * count)
+        correlation = np.fft.irfft(spectrum * np.conj(spectrum))[:count]
+        shortest = max(1, int(fps * 60 / TEMPO_RANGE[1]))
+        longest = min(count - 1, int(math.ceil(fps * 60 / TEMPO_RANGE[0])))
+        if correlation[0] <= 0 or longest <= shortest:
+            return 0.0
+        lags = np.arange(shortest, longest + 1)
+        # Prefer lags near 120 BPM so half- and double-time peaks lose ties.
+        weights = np.exp(-0.5 * np.log2(60 * fps / lags / 120) ** 2)
+        scores = correlation[shortest:longest + 1] * weights
+        best = int(np.argmax(scores))
+        if correlation[shortest + best] < PULSE_CLARITY * correlation[0]:
+            return 0.0
+        return float(60 * fps / lags[best])
+
+    def result(self) -> TrackFeatures:
+        frames = max(self.frames, 1)
+        voiced = max(self.voiced, 1)
+        mean = self.rms_sum / frames
+        spread = math.sqrt(max(self.rms_squares / frames - mean * mean, 0.0))
+        return TrackFeatures(duration=(self.frames * FRAME + len(self.carry)) / self.sample_rate, rms=mean,
+                             dynamics=spread / mean if mean else 0.0, zcr=self.zcr_sum / voiced,
+                             centroid=self.centroid_sum / voiced, tempo=self.tempo())
+
+def extract_features(path: str) -> Optional[TrackFeatures]:
+    try:
+        opened = open_blocks(path)
+        if opened is None:
+            return None
+        sample_rate, blocks = opened
+        accumulator = FeatureAccumulator(sample_rate)
+        for block in blocks:
+            accumulator.feed(block)
+        features = accumulator.result()
+    except (OSError, ValueError, struct.error):
+        return None
+    return features if features.duration > 0 else None
+
+def _clamp(value: float) -> float:
+    return min(1.0, max(0.0, value))
+
+def classify_mood(features: TrackFeatures) -> str:
+    if features.rms < SILENCE_RMS:
+        return "Unknown"
+    loudness = _clamp((20 * math.log10(features.rms) + 30) / 20)
+    pace = _clamp((features.tempo - 70) / 90) if features.tempo else 0.2
+    brightness = _clamp((features.centroid - 300) / 2700)
+    noisiness = _clamp(features.zcr / 0.15)
+    arousal = 0.45 * loudness + 0.35 * pace + 0.2 * noisiness
+    valence = 0.5 * brightness + 0.3 * pace + 0.2 * _clamp(1 - features.dynamics)
+    return min(MOOD_CENTROIDS, key=lambda mood: (MOOD_CENTROIDS[mood][0] - arousal) ** 2 + (MOOD_CENTROIDS[mood][1] - valence) ** 2)
+
+def analysis_available() -> bool:
+    # Decoding needs NumPy; checked without importing it so the GUI can report it up front.
+    return importlib.util.find_spec("numpy") is not None
+
+def analyze_files(paths: List[str], workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[TrackFeatures]]]:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        for path in paths:
+            yield path, extract_features(path)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    # Spawned rather than forked: the GUI and playback threads make fork unsafe.
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=get_context("spawn")) as pool:
+        yield from zip(paths, pool.map(extract_features, paths, chunksize=max(1, min(16, len(paths) // (workers * 4)))))
+
+class FeatureCache:
+    def __init__(self, path: str = "metadata_cache.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS features (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, duration REAL, rms REAL, dynamics REAL, zcr REAL, centroid REAL, tempo REAL)")
+        self.conn.commit()
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[TrackFeatures]:
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime_ns, version, duration, rms, dynamics, zcr, centroid, tempo "
+                                    "FROM features WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == size and row[1] == mtime_ns and row[2] == FEATURE_VERSION:
+            return TrackFeatures(*row[3:])
+        return None
+
+    def put_many(self, rows: Iterable[Tuple[str, int, int, TrackFeatures]]):
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [(path, size, mtime_ns, FEATURE_VERSION, *astuple(features)) for path, size, mtime_ns, features in rows])
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,132 @@
+import os
+import threading
+from typing import Optional, Union, BinaryIO
+
+class AudioError(Exception):
+    pass
+
+class NullAudio:
+    name = "null"
+    available = False
+
+    def load(self, source: Union[str, BinaryIO], namehint: str = ""):
+        pass
+
+    def queue(self, source: Union[str, BinaryIO], namehint: str = ""):
+        pass
+
+    def play(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def unpause(self):
+        pass
+
+    def unload(self):
+        pass
+
+    def set_volume(self, volume: float):
+        pass
+
+    def get_busy(self) -> bool:
+        return False
+
+    def ended_events(self) -> int:
+        return 0
+
+    def decode_duration(self, filepath: str) -> Optional[float]:
+        return None
+
+class PygameAudio(NullAudio):
+    name = "pygame"
+
+    def __init__(self):
+        self._pygame = None
+        self._failed = False
+        self._lock = threading.Lock()
+        self._volume: Optional[float] = None
+
+    @property
+    def available(self) -> bool:
+        return self._ensure() is not None
+
+    @property
+    def initialized(self) -> bool:
+        return self._pygame is not None
+
+    def _ensure(self):
+        if self._pygame is not None or self._failed:
+            return self._pygame
+        with self._lock:
+            if self._pygame is None and not self._failed:
+                try:
+                    import pygame
+                    pygame.init()
+                    pygame.mixer.init()
+                    pygame.mixer.music.set_endevent(pygame.USEREVENT + 1)
+                    if self._volume is not None:
+                        pygame.mixer.music.set_volume(self._volume)
+                except Exception as e:
+                    print(f"Audio unavailable, continuing without sound: {e}")
+                    self._failed = True
+                    return None
+                self._pygame = pygame
+        return self._pygame
+
+    def _music(self, action: str, *args):
+        pygame = self._ensure()
+        if pygame is None:
+            raise AudioError("audio device unavailable")
+        try:
+            return getattr(pygame.mixer.music, action)(*args)
+        except pygame.error as e:
+            raise AudioError(str(e)) from e
+
+    def load(self, source, namehint: str = ""):
+        self._music("load", source, namehint)
+
+    def queue(self, source, namehint: str = ""):
+        self._music("queue", source, namehint)
+
+    def play(self):
+        self._music("play")
+
+    def pause(self):
+        self._music("pause")
+
+    def unpause(self):
+        self._music("unpause")
+
+    def unload(self):
+        if self._pygame is not None:
+            self._music("unload")
+
+    def set_volume(self, volume: float):
+        self._volume = volume
+        if self._pygame is not None:
+            self._music("set_volume", volume)
+
+    def get_busy(self) -> bool:
+        return self._pygame is not None and bool(self._music("get_busy"))
+
+    def ended_events(self) -> int:
+        pygame = self._pygame
+        if pygame is None:
+            return 0
+        return len(pygame.event.get(pygame.USEREVENT + 1))
+
+    def decode_duration(self, filepath: str) -> Optional[float]:
+        pygame = self._ensure()
+        if pygame is None:
+            return None
+        try:
+            return pygame.mixer.Sound(filepath).get_length()
+        except pygame.error as e:
+            raise AudioError(str(e)) from e
+
+def default_backend() -> NullAudio:
+    if os.environ.get("VIBETUNE_AUDIO", "").lower() in ("null", "none", "0"):
+        return NullAudio()
+    return PygameAudio()
@@ -0,0 +1,86 @@
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from contextlib import redirect_stdout
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("VIBETUNE_AUDIO", "null")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from analysis import extract_features
+from core import MusicPlayer
+from storage import SqliteStorage
+
+RATE = 44100
+
+def write_track(path: str, seconds: float, bpm: float, loudness: float, rng: np.random.Generator, channels: int = 2):
+    # One second at a time so generating a long track never holds it in memory either.
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        for second in range(int(seconds)):
+            t = second + np.arange(RATE) / RATE
+            pulse = np.exp(-(t % (60 / bpm)) * 20) * rng.standard_normal(RATE) * 0.5
+            tone = 0.4 * np.sin(2 * np.pi * rng.uniform(200, 900) * t)
+            samples = (np.clip(loudness * (pulse + tone), -1, 1) * 32767).astype("<i2")
+            f.writeframes(np.repeat(samples, channels).tobytes() if channels > 1 else samples.tobytes())
+
+def peak_memory(path: str) -> int:
+    tracemalloc.start()
+    extract_features(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure mood analysis throughput and memory.")
+    parser.add_argument("--tracks", type=int, default=48)
+    parser.add_argument("--seconds", type=float, default=180)
+    parser.add_argument("--long-minutes", type=float, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vibetune-analysis-")
+    os.chdir(workdir)
+    rng = np.random.default_rng(23)
+    music = os.path.join(workdir, "music")
+    os.mkdir(music)
+    for i in range(args.tracks):
+        write_track(os.path.join(music, f"track{i:04d}.wav"), args.seconds, rng.uniform(70, 170), rng.uniform(0.05, 1.0), rng)
+    short_path = os.path.join(workdir, "short.wav")
+    long_path = os.path.join(workdir, "long.wav")
+    write_track(short_path, 60, 120, 0.5, rng)
+    write_track(long_path, args.long_minutes * 60, 120, 0.5, rng)
+    print(f"{args.tracks} x {args.seconds:.0f}s stereo WAV, {args.tracks * args.seconds / 3600:.2f} audio hours")
+
+    for run, workers in enumerate(dict.fromkeys(args.workers)):
+        with redirect_stdout(io.StringIO()):
+            player = MusicPlayer(storage=SqliteStorage(os.path.join(workdir, f"bench{run}.db"), import_json=None))
+        player.import_directory(music)
+        player.feature_cache.conn.execute("DELETE FROM features")
+        player.feature_cache.conn.commit()
+        report = player.auto_tag_moods(workers=workers)
+        moods = {mood: len(player.get_songs_by_mood(mood)) for mood in ("Happy", "Energetic", "Sad", "Calm")}
+        print(f"workers={workers:<3} {report.elapsed:7.2f}s {report.hours_per_minute:8.2f} audio-h/min "
+              f"tagged {report.tagged} failed {len(report.failed)} {moods}")
+        for song in player.music_library:
+            player.update_song(song, mood="Unknown")
+        started = time.perf_counter()
+        cached = player.auto_tag_moods(workers=workers)
+        print(f"{'':11} cached rerun {time.perf_counter() - started:.3f}s ({cached.cached} cache hits)")
+        player.close()
+
+    short_peak, long_peak = peak_memory(short_path), peak_memory(long_path)
+    print(f"peak traced memory: 1 min {short_peak / 1024 ** 2:.2f}MiB, {args.long_minutes:.0f} min {long_peak / 1024 ** 2:.2f}MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import io
+import os
+import sys
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import MusicPlayer
+from storage import JsonStorage
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+def title_scan_click(player, songs, title):
+    for i, song in enumerate(list(songs)):
+        if song.title == title:
+            player.play_song(songs, i)
+            return
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    clicks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(14)
+    os.chdir(tempfile.mkdtemp(prefix="vibetune-bench-"))
+    player = MusicPlayer(storage=JsonStorage("playlists.json"))
+    for i in range(count):
+        player._add_to_library(player.store.add(f"Track {i}", f"Artist {rng.randrange(5000)}", rng.choice(MOODS), rng.uniform(90, 480)))
+    view = player.get_songs_by_mood("All")
+    player.set_view(view)
+    targets = [view[rng.randrange(len(view))] for _ in range(clicks)]
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        player.play_song_id(targets[0].id)
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        for song in targets:
+            player.play_song_id(song.id)
+        by_id = (time.perf_counter() - started) / clicks
+        scans = targets[:min(clicks, 20)]
+        started = time.perf_counter()
+        for song in scans:
+            title_scan_click(player, view, song.title)
+        by_title = (time.perf_counter() - started) / len(scans)
+    print(f"n={count} click-to-play by id: first {first * 1000:.2f}ms (builds position map), then {by_id * 1e6:.1f}us")
+    print(f"n={count} click-to-play by title scan: {by_title * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
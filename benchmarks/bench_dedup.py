@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DuplicateFinder
+
+def write_sparse(path: str, size: int, rng: random.Random):
+    # A random header keeps files distinct; truncate() leaves the rest as holes on disk.
+    with open(path, "wb") as f:
+        f.write(rng.randbytes(4096))
+        f.truncate(size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how many bytes duplicate detection reads.")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=int, default=500)
+    parser.add_argument("--min-mb", type=float, default=2)
+    parser.add_argument("--max-mb", type=float, default=12)
+    args = parser.parse_args()
+
+    rng = random.Random(24)
+    root = tempfile.mkdtemp(prefix="vibetune-dedup-")
+    try:
+        files = {}
+        started = time.perf_counter()
+        for i in range(args.files):
+            path = os.path.join(root, f"track{i:06d}.mp3")
+            write_sparse(path, rng.randint(int(args.min_mb * 2 ** 20), int(args.max_mb * 2 ** 20)), rng)
+            files[i] = path
+        for i in range(args.duplicates):
+            path = os.path.join(root, f"copy{i:06d}.mp3")
+            shutil.copyfile(files[rng.randrange(args.files)], path)
+            files[args.files + i] = path
+        print(f"created {len(files)} sparse files in {time.perf_counter() - started:.1f}s")
+
+        finder = DuplicateFinder()
+        report, fingerprints = finder.find(files, {})
+        print(f"cold: {report.elapsed:.2f}s, {len(report.groups)} groups, read {report.bytes_read / 2 ** 20:.1f}MiB "
+              f"of {report.total_bytes / 2 ** 30:.1f}GiB ({report.read_fraction:.3%})")
+        report, _ = finder.find(files, fingerprints)
+        print(f"warm: {report.elapsed:.2f}s, {len(report.groups)} groups, read {report.bytes_read / 2 ** 20:.1f}MiB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
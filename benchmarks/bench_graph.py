@@ -0,0 +1,43 @@
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SongStore, SongList
+from graph import SongGraph
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+def synthetic_library(count: int, seed: int = 7) -> SongList:
+    rng = random.Random(seed)
+    store = SongStore()
+    library = SongList(store)
+    for i in range(count):
+        library.append(store.add(f"Track {i}", f"Artist {rng.randrange(count // 20 or 1)}", rng.choice(MOODS), rng.uniform(90, 480)))
+    return library
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    library = synthetic_library(count)
+    graph = SongGraph(library.store)
+    started = time.perf_counter()
+    graph.build(library)
+    build_time = time.perf_counter() - started
+    lookups = 10_000
+    rng = random.Random(1)
+    probes = [library[rng.randrange(count)] for _ in range(lookups)]
+    started = time.perf_counter()
+    for song in probes:
+        graph.get_recommendations(song, 4)
+    lookup_time = (time.perf_counter() - started) / lookups
+    started = time.perf_counter()
+    for i in range(1000):
+        graph.add_song(library.store.add(f"New {i}", "Artist 1", "Calm", 200.0))
+        graph.flush()
+    add_time = (time.perf_counter() - started) / 1000
+    print(f"songs={count} build={build_time:.2f}s recommend={lookup_time * 1e6:.1f}us incremental_add={add_time * 1e6:.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SongStore, SongList
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+SIZES = [10_000, 100_000, 1_000_000]
+
+@dataclass
+class DataclassSong:
+    title: str
+    artist: str
+    mood: str
+    duration: float
+    filepath: Optional[str] = None
+
+def synthetic_rows(count: int):
+    # Fresh string objects per row, as json.load produces them.
+    for i in range(count):
+        yield f"Track {i}", f"Artist {i % 2000}", MOODS[i % 4].encode().decode(), float(120 + i % 300)
+
+def measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    library = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del library
+    return after - before
+
+def build_dataclasses(count: int):
+    return [DataclassSong(title, artist, mood, duration) for title, artist, mood, duration in synthetic_rows(count)]
+
+def build_store(count: int):
+    store = SongStore()
+    library = SongList(store)
+    for title, artist, mood, duration in synthetic_rows(count):
+        library.append(store.add(title, artist, mood, duration))
+    return store, library
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'songs':>10} {'dataclass B/song':>18} {'SongStore B/song':>18} {'saving':>8}")
+    for count in sizes:
+        before = measure(lambda count=count: build_dataclasses(count)) / count
+        after = measure(lambda count=count: build_store(count)) / count
+        print(f"{count:>10} {before:>18.1f} {after:>18.1f} {1 - after / before:>8.0%}")
+
+if __name__ == "__main__":
+    main()
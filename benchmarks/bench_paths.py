@@ -0,0 +1,44 @@
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SongStore
+from graph import SongGraph, DFSManager
+
+def synthetic_graph(nodes: int, degree: int, seed: int = 3) -> SongGraph:
+    rng = random.Random(seed)
+    store = SongStore()
+    for i in range(nodes):
+        store.add(f"Track {i}", f"Artist {i % 997}", "Calm", rng.uniform(90, 480))
+    graph = SongGraph(store, k=degree)
+    graph.neighbors = {
+        i: sorted(((rng.uniform(0.5, 4.0), rng.randrange(nodes)) for _ in range(degree)), reverse=True)
+        for i in range(nodes)
+    }
+    graph.version += 1
+    return graph
+
+def main():
+    edges = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    degree = 8
+    graph = synthetic_graph(edges // degree, degree)
+    manager = DFSManager(headless=True)
+    rng = random.Random(11)
+    pairs = [(rng.randrange(edges // degree), rng.randrange(edges // degree)) for _ in range(5)]
+    graph.reverse_edges()
+    print(f"edges={edges}")
+    for algorithm in DFSManager.ALGORITHMS:
+        total = 0.0
+        visited = 0
+        for start, end in pairs:
+            started = time.perf_counter()
+            manager.find_path(graph, graph.store.get(start), graph.store.get(end), algorithm)
+            total += time.perf_counter() - started
+            visited += manager.visited_count
+        print(f"{algorithm:>14}: {total / len(pairs) * 1000:8.1f} ms/search, {visited // len(pairs):>8} nodes visited")
+
+if __name__ == "__main__":
+    main()
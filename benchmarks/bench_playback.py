@@ -0,0 +1,53 @@
+import io
+import os
+import sys
+import math
+import struct
+import tempfile
+import time
+import wave
+from contextlib import redirect_stdout
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import MusicPlayer
+from storage import JsonStorage
+
+def write_tone(path: str, seconds: float, frequency: float, rate: int = 44100):
+    frames = b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / rate))) for i in range(rate))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        for _ in range(int(seconds)):
+            f.writeframes(frames)
+
+def main():
+    tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    switches = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    os.chdir(tempfile.mkdtemp(prefix="vibetune-bench-"))
+    player = MusicPlayer(storage=JsonStorage("playlists.json"))
+    songs = []
+    for i in range(tracks):
+        path = os.path.abspath(f"tone{i}.wav")
+        write_tone(path, 30, 220 + 40 * i)
+        songs.append(player.add_song_from_file(path, f"Tone {i}", "Bench", "Calm"))
+    with redirect_stdout(io.StringIO()):
+        player.play_song(songs, 0)
+        player.playback.wait_idle()
+        calls = []
+        for _ in range(switches):
+            started = time.perf_counter()
+            player.next_song()
+            calls.append(time.perf_counter() - started)
+            player.playback.wait_idle()
+    calls.sort()
+    latency = player.playback.switch_latency()
+    print(f"{switches} track switches over {tracks} x 30s WAV files, {len(player.playback.buffer)} buffered")
+    print(f"GUI-thread call: p50 {calls[len(calls) // 2] * 1e6:.0f}us max {calls[-1] * 1e6:.0f}us")
+    print(f"request-to-play: p50 {latency['p50'] * 1000:.2f}ms max {latency['max'] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
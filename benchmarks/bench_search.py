@@ -0,0 +1,45 @@
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SongStore
+from search import SearchIndex
+
+SYLLABLES = ["la", "mo", "ri", "ven", "sun", "ka", "tor", "el", "mi", "dra", "shi", "no", "bel", "gra", "fy", "zu"]
+
+def synthetic_words(count: int, rng: random.Random):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(count)]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(15)
+    words = synthetic_words(20000, rng)
+    artists = [" ".join(rng.sample(words, 2)).title() for _ in range(20000)]
+    store = SongStore()
+    index = SearchIndex(store)
+    started = time.perf_counter()
+    for _ in range(count):
+        index.add(store.add(" ".join(rng.sample(words, rng.randint(1, 4))).title(), rng.choice(artists), "Happy", rng.uniform(90, 480)))
+    print(f"indexed n={count} in {time.perf_counter() - started:.1f}s, {len(index.terms)} terms")
+    index.search("warmup")
+    queries = []
+    for _ in range(100):
+        song_id = rng.randrange(count)
+        target = store.titles[song_id] if rng.random() < 0.7 else store.strings[store.artists[song_id]]
+        queries.append(target.lower())
+    queries += [word[:-1] + "x" + word[-1] for word in rng.sample(words, 20)]
+    latencies = []
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            index.search(query[:end], 20)
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{len(latencies)} keystrokes: p50 {pick(0.5):.2f}ms p99 {pick(0.99):.2f}ms max {latencies[-1] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
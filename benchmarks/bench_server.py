@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import SqliteStorage
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+def populate(path: str, size: int, rng: random.Random):
+    storage = SqliteStorage(path, import_json=None)
+    storage.add_library_songs({"title": f"Track {i} {rng.random():.6f}", "artist": f"Artist {rng.randrange(max(10, size // 20))}",
+                               "mood": rng.choice(MOODS), "duration": rng.uniform(90, 480), "filepath": None} for i in range(size))
+    for name in ("Bench A", "Bench B"):
+        storage.create_playlist(name)
+    storage.close()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def request(reader, writer, method: str, path: str, body=None):
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+def pick(rng: random.Random, size: int, write_ratio: float):
+    if rng.random() < write_ratio:
+        song_id = rng.randrange(size)
+        return "write", rng.choice([
+            ("POST", "/playlists/Bench%20A/songs", {"ids": [song_id]}),
+            ("DELETE", "/playlists/Bench%20A/songs", {"ids": [song_id]}),
+            ("POST", "/queue", {"id": song_id}),
+            ("POST", "/transport/next", None),
+        ])
+    return "read", rng.choice([
+        ("GET", "/status", None),
+        ("GET", f"/library?mood={rng.choice(MOODS)}&offset={rng.randrange(0, 1000)}&limit=50", None),
+        ("GET", f"/songs/{rng.randrange(size)}", None),
+        ("GET", "/playlists", None),
+        ("GET", "/playlists/Bench%20A?limit=50", None),
+        ("GET", "/queue", None),
+        ("GET", f"/search?q=track+{rng.randrange(100)}&limit=20", None),
+    ])
+
+async def client(port: int, size: int, deadline: float, write_ratio: float, seed: int, stats: dict):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            kind, (method, path, body) = pick(rng, size, write_ratio)
+            started = time.perf_counter()
+            status = await request(reader, writer, method, path, body)
+            stats[kind].append(time.perf_counter() - started)
+            if status >= 500:
+                stats["errors"] += 1
+    finally:
+        writer.close()
+
+def quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def run_load(port: int, clients: int, size: int, seconds: float, write_ratio: float) -> dict:
+    stats = {"read": [], "write": [], "errors": 0}
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, size, deadline, write_ratio, seed, stats) for seed in range(clients)))
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the VibeTune control server.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--songs", type=int, default=50_000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vibetune-server-")
+    populate(os.path.join(workdir, "vibetune.db"), args.songs, random.Random(25))
+    port = free_port()
+    env = dict(os.environ, VIBETUNE_AUDIO="null")
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", str(port)], cwd=workdir, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        for line in server.stdout:
+            if "listening" in line:
+                break
+        else:
+            raise SystemExit("server exited before listening")
+        threading.Thread(target=server.stdout.read, daemon=True).start()
+        print(f"{args.songs} songs, {args.write_ratio:.0%} writes, {args.seconds:.0f}s per run")
+        for clients in args.clients:
+            stats = asyncio.run(run_load(port, clients, args.songs + 12, args.seconds, args.write_ratio))
+            total = len(stats["read"]) + len(stats["write"])
+            print(f"clients={clients:<4} {total / stats['elapsed']:>8.0f} req/s  "
+                  f"read p50 {quantile(stats['read'], 0.5) * 1000:6.2f}ms p99 {quantile(stats['read'], 0.99) * 1000:7.2f}ms  "
+                  f"write p50 {quantile(stats['write'], 0.5) * 1000:6.2f}ms p99 {quantile(stats['write'], 0.99) * 1000:7.2f}ms  "
+                  f"errors {stats['errors']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
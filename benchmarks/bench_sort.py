@@ -0,0 +1,35 @@
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SongStore, SongList, LinkedList, SortingManager
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+def synthetic_songs(count: int, seed: int = 5) -> LinkedList:
+    rng = random.Random(seed)
+    store = SongStore()
+    library = SongList(store)
+    for i in range(count):
+        library.append(store.add(f"Track {rng.random():.8f}", f"Artist {rng.randrange(5000)}", rng.choice(MOODS), rng.uniform(90, 480)))
+    return LinkedList(library)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    spec = [("artist", False), ("title", False)]
+    manager = SortingManager()
+    for engine in ("timsort", "merge"):
+        if engine == "merge" and count > 200_000:
+            continue
+        songs = synthetic_songs(count)
+        started = time.perf_counter()
+        manager.sort_songs(songs, spec, engine=engine)
+        elapsed = time.perf_counter() - started
+        comparisons = "uncounted" if manager.comparisons is None else manager.comparisons
+        print(f"{engine:>8} n={count} keys=artist,title: {elapsed:.2f}s comparisons={comparisons} swaps={manager.swaps}")
+
+if __name__ == "__main__":
+    main()
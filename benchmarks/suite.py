@@ -0,0 +1,201 @@
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import LinkedList, MusicPlayer, SortingManager
+from probe import MetadataCache
+from storage import SqliteStorage
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+SIZES = [1_000, 10_000, 100_000]
+QUADRATIC_SORTS = ("Bubble Sort", "Selection Sort", "Insertion Sort")
+NOISE_FLOOR = {"seconds": 0.0005, "peak_bytes": 64 * 1024}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class Context:
+    def __init__(self, size: int, seed: int = 18):
+        self.size = size
+        self.rng = random.Random(seed)
+        self._tempdir = tempfile.TemporaryDirectory(prefix="vibetune-suite-")
+        self.workdir = self._tempdir.name
+        with redirect_stdout(io.StringIO()):
+            self.player = MusicPlayer(storage=SqliteStorage(os.path.join(self.workdir, "suite.db"), import_json=None),
+                                      metadata_cache=MetadataCache(os.path.join(self.workdir, "metadata_cache.db")))
+        store = self.player.store
+        for i in range(size):
+            self.player._add_to_library(store.add(f"Track {self.rng.random():.8f}", f"Artist {self.rng.randrange(max(10, size // 20))}",
+                                                  self.rng.choice(MOODS), self.rng.uniform(90, 480)))
+        self.songs = list(self.player.music_library)
+        self.player.create_playlist("Bench")
+        self.player.add_songs_to_playlist("Bench", self.songs)
+
+    def close(self):
+        self.player.close()
+        self._tempdir.cleanup()
+
+# A case prepares shared state and returns (setup, run): setup() runs untimed before
+# every repetition and its result is passed to run(), so in-place sorts never see
+# input that an earlier repetition already sorted.
+def untimed_setup():
+    return None
+
+def case_linkedlist_append(ctx: Context):
+    return untimed_setup, lambda _: LinkedList(ctx.songs)
+
+def case_linkedlist_iterate(ctx: Context):
+    songs = LinkedList(ctx.songs)
+    return untimed_setup, lambda _: sum(1 for _ in songs)
+
+def case_linkedlist_to_list(ctx: Context):
+    songs = LinkedList(ctx.songs)
+    return untimed_setup, lambda _: songs.to_list()
+
+def sort_case(engine: str) -> Callable:
+    def case(ctx: Context):
+        manager = SortingManager()
+        return (lambda: LinkedList(ctx.songs),
+                lambda songs: manager.sort_songs(songs, [("artist", False), ("title", False)], engine=engine))
+    return case
+
+def step_sort_case(algorithm: str) -> Callable:
+    def case(ctx: Context):
+        manager = SortingManager()
+        return lambda: LinkedList(ctx.songs), lambda songs: manager.start(algorithm, songs).run()
+    return case
+
+def case_playlist_save(ctx: Context):
+    path = os.path.join(ctx.workdir, "export.json")
+    return untimed_setup, lambda _: ctx.player.save_playlists(path)
+
+def case_playlist_load(ctx: Context):
+    player = ctx.player
+    def run(_):
+        player.playlists.clear()
+        player._load_playlists()
+        return len(player.open_playlist("Bench").to_python_list())
+    return untimed_setup, run
+
+def case_mood_filter(ctx: Context):
+    player = ctx.player
+    return untimed_setup, lambda _: [len(player.get_songs_by_mood(mood)) for mood in ["All"] + MOODS]
+
+def case_recommendations(ctx: Context):
+    graph = ctx.player.song_graph
+    picks = [ctx.songs[ctx.rng.randrange(len(ctx.songs))] for _ in range(200)]
+    return untimed_setup, lambda _: [graph.get_recommendations(song, 4) for song in picks]
+
+CASES: Dict[str, Callable] = {
+    "linkedlist.append": case_linkedlist_append,
+    "linkedlist.iterate": case_linkedlist_iterate,
+    "linkedlist.to_list": case_linkedlist_to_list,
+    "sort.timsort": sort_case("timsort"),
+    "sort.merge": sort_case("merge"),
+    **{f"sort.{name.split()[0].lower()}": step_sort_case(name) for name in QUADRATIC_SORTS},
+    "playlist.save": case_playlist_save,
+    "playlist.load": case_playlist_load,
+    "library.mood_filter": case_mood_filter,
+    "library.recommendations": case_recommendations,
+}
+
+def measure(setup: Callable, run: Callable, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        started = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - started)
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+def run_suite(sizes: List[int], selected: Optional[List[str]], repeat: int, quadratic_limit: int) -> Dict:
+    results = {}
+    for size in sizes:
+        ctx = Context(size)
+        try:
+            for name, case in CASES.items():
+                if selected and not any(name.startswith(prefix) for prefix in selected):
+                    continue
+                if name.split(".")[-1] in ("bubble", "selection", "insertion") and size > quadratic_limit:
+                    continue
+                with redirect_stdout(io.StringIO()):
+                    result = measure(*case(ctx), repeat)
+                key = f"{name}/n={size}"
+                results[key] = result
+                print(f"{key:<36} {result['seconds'] * 1000:>10.2f}ms {result['peak_bytes'] / 1024 ** 2:>9.2f}MiB", flush=True)
+        finally:
+            ctx.close()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for key, result in current["results"].items():
+        reference = baseline.get("results", {}).get(key)
+        if reference is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if result[metric] - reference[metric] < NOISE_FLOOR[metric]:
+                continue
+            if reference[metric] and result[metric] > reference[metric] * (1 + threshold):
+                regressions.append(f"{key} {metric}: {reference[metric]:.4g} -> {result[metric]:.4g} "
+                                   f"(+{result[metric] / reference[metric] - 1:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VibeTune data structures and engines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cases", nargs="+", help="case name prefixes to run, e.g. sort linkedlist.append")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quadratic-limit", type=int, default=2_000, help="largest n for bubble/selection/insertion sort")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    current = run_suite(args.sizes, args.cases, args.repeat, args.quadratic_limit)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"wrote {output}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"saved baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; rerun with --save-baseline")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(current, json.load(f), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,371 @@
 import os
-import json
 import time
-import pygame
-import threading
+import hashlib
+from storage import Storage, SqliteStorage, song_key
+from probe import MetadataProbe, MetadataCache
+from graph import SongGraph
+from search import SearchIndex
+from playback import PlaybackClock, PlaybackEngine
+from audio import AudioError, NullAudio, default_backend
+from playqueue import PlayQueue
+from generator import PlaylistGenerator
+from analysis import AnalysisReport, FeatureCache, analysis_available, analyze_files, classify_mood
+from dedup import DuplicateFinder, DuplicateReport, Fingerprint
+from metrics import metrics
+from scanner import ImportReport, ScannedFile, diff_scan, probe_files, title_from_path
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import Future
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Iterable, Sequence, Tuple
+
+class SongStore:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.titles: List[str] = []
+        self.artists = array("I")
+        self.moods = array("I")
+        self.durations = array("d")
+        self.filepaths: Dict[int, str] = {}
+        self.fingerprints: Dict[int, Fingerprint] = {}
+        self._key_ids: Dict[str, int] = {}
+        self.version = 0
+
+    def intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def add(self, title: str, artist: str, mood: str, duration: float, filepath: Optional[str] = None) -> "Song":
+        song_id = len(self.titles)
+        self.titles.append(title)
+        self.artists.append(self.intern(artist))
+        self.moods.append(self.intern(mood))
+        self.durations.append(float(duration))
+        if filepath:
+            self.filepaths[song_id] = filepath
+        self._key_ids.setdefault(song_key({"title": title, "artist": artist, "duration": duration, "filepath": filepath}), song_id)
+        return Song(self, song_id)
+
+    def update(self, song_id: int, **fields):
+        old_key = Song(self, song_id).key
+        self.version += 1
+        if "title" in fields:
+            self.titles[song_id] = fields["title"]
+        if "artist" in fields:
+            self.artists[song_id] = self.intern(fields["artist"])
+        if "mood" in fields:
+            self.moods[song_id] = self.intern(fields["mood"])
+        if "duration" in fields:
+            self.durations[song_id] = float(fields["duration"])
+        if "filepath" in fields:
+            if fields["filepath"]:
+                self.filepaths[song_id] = fields["filepath"]
+            else:
+                self.filepaths.pop(song_id, None)
+        new_key = Song(self, song_id).key
+        if new_key != old_key:
+            if self._key_ids.get(old_key) == song_id:
+                del self._key_ids[old_key]
+            self._key_ids.setdefault(new_key, song_id)
+
+    def release(self, song_id: int):
+        # A row that left the library gives up its key, so the same file or track binds to a live row when it returns.
+        key = Song(self, song_id).key
+        if self._key_ids.get(key) == song_id:
+            del self._key_ids[key]
+
+    def intern_song(self, data: Dict) -> "Song":
+        song_id = self._key_ids.get(song_key(data))
+        if song_id is None:
+            return self.add(**data)
+        return Song(self, song_id)
+
+    def find(self, key: str) -> Optional["Song"]:
+        song_id = self._key_ids.get(key)
+        return None if song_id is None else Song(self, song_id)
+
+    def get(self, song_id: int) -> "Song":
+        if not 0 <= song_id < len(self.titles):
+            raise IndexError(f"No song with id {song_id}")
+        return Song(self, song_id)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __iter__(self):
+        for song_id in range(len(self.titles)):
+            yield Song(self, song_id)
 
-@dataclass
 class Song:
-    title: str
-    artist: str
-    mood: str
-    duration: float
-    filepath: Optional[str] = None
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: SongStore, song_id: int):
+        self.store = store
+        self.id = song_id
+
+    @property
+    def title(self) -> str:
+        return self.store.titles[self.id]
+
+    @property
+    def artist(self) -> str:
+        return self.store.strings[self.store.artists[self.id]]
+
+    @property
+    def mood(self) -> str:
+        return self.store.strings[self.store.moods[self.id]]
+
+    @property
+    def duration(self) -> float:
+        return self.store.durations[self.id]
+
+    @property
+    def filepath(self) -> Optional[str]:
+        return self.store.filepaths.get(self.id)
+
+    @property
+    def fingerprint(self) -> Optional[Fingerprint]:
+        return self.store.fingerprints.get(self.id)
+
+    @property
+    def key(self) -> str:
+        return song_key(self.to_dict())
+
+    @property
+    def stable_id(self) -> str:
+        filepath = self.filepath
+        if filepath:
+            return hashlib.blake2b(os.path.normcase(os.path.abspath(filepath)).encode("utf-8"), digest_size=8).hexdigest()
+        return f"seq:{self.id}"
 
     def to_dict(self):
-        return self.__dict__
+        return {"title": self.title, "artist": self.artist, "mood": self.mood, "duration": self.duration, "filepath": self.filepath}
 
     @classmethod
-    def from_dict(cls, data):
-        return cls(**data)
+    def from_dict(cls, data, store: SongStore):
+        return store.intern_song(data)
+
+    def __eq__(self, other):
+        return isinstance(other, Song) and other.store is self.store and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.store), self.id))
+
+    def __repr__(self):
+        return f"Song(id={self.id}, title={self.title!r}, artist={self.artist!r}, mood={self.mood!r}, duration={self.duration})"
+
+class SongList:
+    def __init__(self, store: SongStore, ids: Iterable[int] = ()):
+        self.store = store
+        self.ids = array("I", ids)
+
+    @classmethod
+    def view(cls, store: SongStore, ids: array) -> "SongList":
+        songs = cls.__new__(cls)
+        songs.store = store
+        songs.ids = ids
+        return songs
+
+    def append(self, song: Song):
+        self.ids.append(song.id)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SongList(self.store, self.ids[index])
+        return Song(self.store, self.ids[index])
+
+    def __iter__(self):
+        store = self.store
+        for song_id in self.ids:
+            yield Song(store, song_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def to_python_list(self) -> "SongList":
+        return self
+
+def _sorted_contains(ids: array, song_id: int) -> bool:
+    position = bisect_left(ids, song_id)
+    return position < len(ids) and ids[position] == song_id
+
+class LibraryIndex:
+    def __init__(self, store: SongStore):
+        self.store = store
+        self.by_mood: Dict[str, array] = {}
+        self.by_artist: Dict[str, array] = {}
+        self._durations: List[float] = []
+        self._duration_ids: List[int] = []
+
+    @staticmethod
+    def _insert(postings: Dict[str, array], key: str, song_id: int):
+        ids = postings.get(key)
+        if ids is None:
+            postings[key] = array("I", [song_id])
+        elif not ids or ids[-1] < song_id:
+            ids.append(song_id)
+        elif not _sorted_contains(ids, song_id):
+            ids.insert(bisect_left(ids, song_id), song_id)
+
+    @staticmethod
+    def _delete(postings: Dict[str, array], key: str, song_id: int):
+        ids = postings.get(key)
+        if ids is not None and _sorted_contains(ids, song_id):
+            ids.pop(bisect_left(ids, song_id))
+
+    def add(self, song: Song):
+        self._insert(self.by_mood, song.mood, song.id)
+        self._insert(self.by_artist, song.artist, song.id)
+        position = bisect_right(self._durations, song.duration)
+        self._durations.insert(position, song.duration)
+        self._duration_ids.insert(position, song.id)
+
+    def remove(self, song: Song):
+        self._delete(self.by_mood, song.mood, song.id)
+        self._delete(self.by_artist, song.artist, song.id)
+        position = bisect_left(self._durations, song.duration)
+        while position < len(self._durations) and self._durations[position] == song.duration:
+            if self._duration_ids[position] == song.id:
+                del self._durations[position]
+                del self._duration_ids[position]
+                return
+            position += 1
+
+    def mood(self, mood: str) -> SongList:
+        return SongList.view(self.store, self.by_mood.get(mood, array("I")))
+
+    def artist(self, artist: str) -> SongList:
+        return SongList.view(self.store, self.by_artist.get(artist, array("I")))
+
+    def _duration_bounds(self, min_duration: Optional[float], max_duration: Optional[float]) -> Tuple[int, int]:
+        low = 0 if min_duration is None else bisect_left(self._durations, min_duration)
+        high = len(self._durations) if max_duration is None else bisect_right(self._durations, max_duration)
+        return low, max(low, high)
+
+    def duration_range(self, min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> SongList:
+        low, high = self._duration_bounds(min_duration, max_duration)
+        return SongList(self.store, sorted(self._duration_ids[low:high]))
+
+    def query(self, mood: Optional[str] = None, artist: Optional[str] = None,
+              min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> Optional[SongList]:
+        postings = []
+        if mood is not None:
+            postings.append(self.by_mood.get(mood, array("I")))
+        if artist is not None:
+            postings.append(self.by_artist.get(artist, array("I")))
+        has_range = min_duration is not None or max_duration is not None
+        if not postings:
+            return self.duration_range(min_duration, max_duration) if has_range else None
+        postings.sort(key=len)
+        if len(postings) == 1 and not has_range:
+            return SongList.view(self.store, postings[0])
+        low, high = self._duration_bounds(min_duration, max_duration)
+        if has_range and high - low < len(postings[0]):
+            driver, others, check_range = sorted(self._duration_ids[low:high]), postings, False
+        else:
+            driver, others, check_range = postings[0], postings[1:], has_range
+        min_value = float("-inf") if min_duration is None else min_duration
+        max_value = float("inf") if max_duration is None else max_duration
+        durations = self.store.durations
+        result = array("I")
+        for song_id in driver:
+            if check_range and not min_value <= durations[song_id] <= max_value:
+                continue
+            if all(_sorted_contains(ids, song_id) for ids in others):
+                result.append(song_id)
+        return SongList.view(self.store, result)
 
 class Node:
+    __slots__ = ("data", "next", "prev")
+
     def __init__(self, data: Song):
         self.data = data
         self.next: Optional["Node"] = None
+        self.prev: Optional["Node"] = None
 
 class LinkedList:
-    def __init__(self):
+    def __init__(self, songs: Optional[Iterable[Song]] = None, doubly: bool = False):
         self.head: Optional[Node] = None
+        self.tail: Optional[Node] = None
         self.size = 0
+        self.doubly = doubly
+        self._nodes: Optional[List[Node]] = []
+        self._snapshot: Optional[Tuple[Song, ...]] = None
+        if songs is not None:
+            self.extend(songs)
 
     def append(self, song: Song):
         new_node = Node(song)
-        if not self.head:
+        if self.tail is None:
             self.head = new_node
         else:
+            self.tail.next = new_node
+            if self.doubly:
+                new_node.prev = self.tail
+        self.tail = new_node
+        self.size += 1
+        if self._nodes is not None:
+            self._nodes.append(new_node)
+        self._snapshot = None
+
+    def extend(self, songs: Iterable[Song]):
+        for song in songs:
+            self.append(song)
+
+    def invalidate(self):
+        # Call after relinking nodes or swapping node data from outside the list.
+        self._snapshot = None
+        self._nodes = None
+        self.tail = None
+        self.size = 0
+        previous = None
+        current = self.head
+        while current:
+            if self.doubly:
+                current.prev = previous
+            previous = current
+            current = current.next
+            self.size += 1
+        self.tail = previous
+
+    def _node_at(self, index: int) -> Node:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("LinkedList index out of range")
+        if self._nodes is None:
+            nodes = []
             current = self.head
-            while current.next:
+            while current:
+                nodes.append(current)
                 current = current.next
-            current.next = new_node
-        self.size += 1
+            self._nodes = nodes
+        return self._nodes[index]
+
+    def pop(self, index: int = -1) -> Song:
+        node = self._node_at(index)
+        if index < 0:
+            index += self.size
+        previous = node.prev if self.doubly else (self._nodes[index - 1] if index > 0 else None)
+        if previous is None:
+            self.head = node.next
+        else:
+            previous.next = node.next
+        if node.next is None:
+            self.tail = previous
+        elif self.doubly:
+            node.next.prev = previous
+        node.next = node.prev = None
+        self._nodes.pop(index)
+        self.size -= 1
+        self._snapshot = None
+        return node.data
 
     def to_list(self) -> List[Song]:
         songs = []
@@ -50,6 +375,16 @@ class LinkedList:
             current = current.next
         return songs
 
+    def to_python_list(self) -> Tuple[Song, ...]:
+        if self._snapshot is None:
+            self._snapshot = tuple(self)
+        return self._snapshot
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_python_list()[index]
+        return self._node_at(index).data
+
     def __iter__(self):
         current = self.head
         while current:
@@ -62,29 +397,94 @@ class LinkedList:
 @dataclass
 class Playlist:
     name: str
-    songs: LinkedList = field(default_factory=LinkedList)
+    loader: Optional[Callable[[], Iterable[Song]]] = field(default=None, repr=False, compare=False)
+    header_count: int = field(default=0, repr=False, compare=False)
+    header_duration: float = field(default=0.0, repr=False, compare=False)
+    _songs: Optional[LinkedList] = field(default=None, repr=False, compare=False)
+    _members: Optional[Counter] = field(default=None, repr=False, compare=False)
+
+    @property
+    def songs(self) -> LinkedList:
+        if self._songs is None:
+            self._songs = LinkedList(self.loader() if self.loader else ())
+            self.loader = None
+        return self._songs
+
+    @property
+    def members(self) -> Counter:
+        if self._members is None:
+            self._members = Counter(song.key for song in self.songs)
+        return self._members
+
+    def replace_songs(self, songs: Iterable[Song]):
+        self._songs = LinkedList(songs)
+        self._members = None
+        self.loader = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._songs is not None
+
+    @property
+    def song_count(self) -> int:
+        return len(self._songs) if self._songs is not None else self.header_count
+
+    @property
+    def total_duration(self) -> float:
+        if self._songs is not None:
+            return sum(song.duration for song in self._songs)
+        return self.header_duration
 
     def to_dict(self):
         return {"name": self.name, "songs": [s.to_dict() for s in self.songs]}
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, store: SongStore):
         playlist = cls(name=data["name"])
         for s_data in data.get("songs", []):
-            playlist.songs.append(Song.from_dict(s_data))
+            playlist.songs.append(Song.from_dict(s_data, store))
         return playlist
 
+@dataclass
+class PlaylistEdit:
+    added: List[Song] = field(default_factory=list)
+    removed: List[Song] = field(default_factory=list)
+    skipped: List[Song] = field(default_factory=list)
+
 class MusicPlayer:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init()
-        self.music_library: List[Song] = []
+    def __init__(self, storage: Optional[Storage] = None, audio: Optional[NullAudio] = None,
+                 metadata_cache: Optional[MetadataCache] = None):
+        self.audio = audio if audio is not None else default_backend()
+        self.store = SongStore()
+        self.music_library = SongList(self.store)
+        self.library_version = 0
+        # Bumped by every change a remote client can see, so the control server can stay idle otherwise.
+        self.revision = 0
+        self.library_index = LibraryIndex(self.store)
+        self.song_graph = SongGraph(self.store)
+        self.search_index = SearchIndex(self.store)
+        self.generator = PlaylistGenerator(self.store)
         self.playlists: Dict[str, Playlist] = {}
-        self.current_song_list: List[Song] = []
-        self.current_song_index: int = -1
+        self.queue = PlayQueue()
+        self._saved_queue_version = -1
+        self.cursor_save_interval = 5.0
+        self._cursor_dirty_since: Optional[float] = None
+        self.current_view: Sequence[Song] = self.music_library
+        self._view_positions: Optional[Dict[int, int]] = None
         self.is_playing: bool = False
+        self.metrics = metrics
+        self.playback = PlaybackEngine(self.audio, on_error=self._on_playback_error)
+        self.clock = PlaybackClock()
+        self._audio_active = False
+        self.storage = storage if storage is not None else SqliteStorage()
+        self.metadata = MetadataProbe(metadata_cache if metadata_cache is not None else MetadataCache(), fallback=self._decode_duration)
+        self._feature_cache: Optional[FeatureCache] = None
+        self.duplicates = DuplicateFinder()
+        self._fingerprints_loaded = False
         self._load_default_library()
+        self._load_saved_library()
         self._load_playlists()
+        self._restore_queue()
 
     def _load_default_library(self):
         default_songs = [
@@ -101,220 +501,980 @@ class MusicPlayer:
             {"title": "Clair de Lune", "artist": "Claude Debussy", "mood": "Calm", "duration": 303},
             {"title": "Orinoco Flow", "artist": "Enya", "mood": "Calm", "duration": 266},
         ]
-        self.music_library = [Song(**s) for s in default_songs]
+        for data in default_songs:
+            self._add_to_library(self.store.add(**data))
 
+    @metrics.timed("library.load")
+    def _load_saved_library(self):
+        for data in self.storage.load_library():
+            self._add_to_library(self.store.add(**data))
+
+    @metrics.timed("playlists.load_headers")
     def _load_playlists(self):
-        if os.path.exists("playlists.json"):
+        for name, count, duration in self.storage.playlist_headers():
+            self.playlists[name] = Playlist(name=name, loader=lambda n=name: self._load_playlist_songs(n),
+                                            header_count=count, header_duration=duration)
+
+    @metrics.timed("playlist.load")
+    def _load_playlist_songs(self, name: str) -> List[Song]:
+        songs = []
+        for s_data in self.storage.load_playlist(name):
             try:
-                with open("playlists.json", "r") as f:
-                    playlists_data = json.load(f)
-                    for p_data in playlists_data:
-                        playlist = Playlist.from_dict(p_data)
-                        self.playlists[playlist.name] = playlist
-            except (json.JSONDecodeError, TypeError):
-                self.playlists = {}
-
-    def save_playlists(self):
-        with open("playlists.json", "w") as f:
-            json.dump([p.to_dict() for p in self.playlists.values()], f, indent=4)
+                songs.append(Song.from_dict(s_data, self.store))
+            except (TypeError, ValueError):
+                continue
+        return songs
 
-    def add_song_from_file(self, filepath: str, title: str, artist: str, mood: str):
+    def open_playlist(self, name: str) -> LinkedList:
+        playlist = self.playlists[name]
+        if not playlist.is_loaded:
+            self.revision += 1
+        return playlist.songs
+
+    @metrics.timed("playlists.save")
+    def save_playlists(self, path: str = "playlists.json"):
+        self.storage.export_json(path)
+
+    def _decode_duration(self, filepath: str) -> Optional[float]:
         try:
-            sound = pygame.mixer.Sound(filepath)
-            duration = sound.get_length()
-            song = Song(title=title, artist=artist, mood=mood, duration=duration, filepath=filepath)
-            self.music_library.append(song)
-            return song
-        except pygame.error as e:
+            return self.audio.decode_duration(filepath)
+        except AudioError as e:
             print(f"Error loading song from file: {e}")
+            metrics.inc("library.decode_errors")
+            return None
+
+    def add_song_from_file(self, filepath: str, title: str, artist: str, mood: str):
+        info = self.metadata.probe(filepath)
+        if info is None:
             return None
+        song = self.store.add(title=title, artist=artist, mood=mood, duration=info.duration, filepath=filepath)
+        self._add_to_library(song)
+        self.storage.add_library_song(song.to_dict())
+        return song
 
     def create_playlist(self, name: str) -> bool:
         if name and name not in self.playlists:
             self.playlists[name] = Playlist(name=name)
-            self.save_playlists()
+            self.revision += 1
+            self.storage.create_playlist(name)
             return True
         return False
 
     def delete_playlist(self, name: str):
         if name in self.playlists:
             del self.playlists[name]
-            self.save_playlists()
+            self.revision += 1
+            self.storage.delete_playlist(name)
 
     def add_song_to_playlist(self, playlist_name: str, song: Song) -> bool:
-        if playlist_name in self.playlists:
-            playlist = self.playlists[playlist_name]
-            if not any(s.filepath == song.filepath for s in playlist.songs if s.filepath and song.filepath):
-                playlist.songs.append(song)
-                self.save_playlists()
+        return bool(self.add_songs_to_playlist(playlist_name, [song]).added)
+
+    def add_songs_to_playlist(self, playlist_name: str, songs: Iterable[Song]) -> PlaylistEdit:
+        result = PlaylistEdit()
+        playlist = self.playlists.get(playlist_name)
+        if playlist is None:
+            result.skipped.extend(songs)
+            return result
+        members = playlist.members
+        songs = list(songs)
+        audio = self._playlist_audio(playlist) if any(song.fingerprint and song.fingerprint.full for song in songs) else set()
+        for song in songs:
+            key = song.key
+            fingerprint = song.fingerprint
+            if members[key] or (fingerprint and fingerprint.full and (fingerprint.size, fingerprint.full) in audio):
+                result.skipped.append(song)
+                continue
+            members[key] += 1
+            if fingerprint and fingerprint.full:
+                audio.add((fingerprint.size, fingerprint.full))
+            playlist.songs.append(song)
+            result.added.append(song)
+        if result.added:
+            self._view_positions = None
+            self.revision += 1
+            self.storage.append_entries(playlist_name, [song.to_dict() for song in result.added])
+        return result
+
+    def _playlist_audio(self, playlist: Playlist) -> set:
+        # Content identities of songs already in the playlist, for songs a duplicate scan has hashed.
+        fingerprints = self.store.fingerprints
+        return {(fingerprint.size, fingerprint.full) for fingerprint in (fingerprints.get(song.id) for song in playlist.songs)
+                if fingerprint is not None and fingerprint.full}
+
+    def remove_songs(self, playlist_name: str, songs: Iterable[Song]) -> PlaylistEdit:
+        result = PlaylistEdit()
+        playlist = self.playlists.get(playlist_name)
+        if playlist is None:
+            result.skipped.extend(songs)
+            return result
+        members = playlist.members
+        to_remove = set()
+        for song in songs:
+            key = song.key
+            if members[key] and key not in to_remove:
+                to_remove.add(key)
+                result.removed.append(song)
+            else:
+                result.skipped.append(song)
+        if to_remove:
+            kept = [song for song in playlist.songs if song.key not in to_remove]
+            for key in to_remove:
+                del members[key]
+            self._replace_playlist_songs(playlist, kept)
+            self.storage.replace_entries(playlist_name, [song.to_dict() for song in kept])
+        return result
+
+    def reorder(self, playlist_name: str, order: List[int]) -> bool:
+        playlist = self.playlists.get(playlist_name)
+        if playlist is None or sorted(order) != list(range(playlist.song_count)):
+            return False
+        current = playlist.songs.to_python_list()
+        reordered = [current[position] for position in order]
+        self._replace_playlist_songs(playlist, reordered)
+        self.storage.replace_entries(playlist_name, [song.to_dict() for song in reordered])
+        return True
+
+    def _replace_playlist_songs(self, playlist: Playlist, songs: List[Song]):
+        showing = playlist.is_loaded and self.current_view is playlist.songs
+        playlist.replace_songs(songs)
+        if showing:
+            self.set_view(playlist.songs)
+        self._view_positions = None
+        self.revision += 1
+
+    def _add_to_library(self, song: Song):
+        self.music_library.append(song)
+        self.library_version += 1
+        self.revision += 1
+        # Library and mood views are live over the id arrays, so cached positions go stale.
+        self._view_positions = None
+        self.library_index.add(song)
+        self.song_graph.add_song(song)
+        self.search_index.add(song)
+
+    def remove_song(self, song: Song) -> bool:
+        ids = self.music_library.ids
+        for position, song_id in enumerate(ids):
+            if song_id == song.id:
+                ids.pop(position)
+                self.library_version += 1
+                self.revision += 1
+                self._view_positions = None
+                self.library_index.remove(song)
+                self.song_graph.remove_song(song)
+                self.search_index.remove(song)
+                self.store.release(song.id)
                 return True
         return False
 
-    def get_songs_by_mood(self, mood: str) -> List[Song]:
+    def _remove_from_library(self, songs: List[Song]):
+        dropped = {song.id for song in songs}
+        for song in songs:
+            self.library_index.remove(song)
+            self.song_graph.remove_song(song)
+            self.search_index.remove(song)
+            self.store.release(song.id)
+        ids = self.music_library.ids
+        ids[:] = array("I", (song_id for song_id in ids if song_id not in dropped))
+        self.library_version += 1
+        self.revision += 1
+        self._view_positions = None
+
+    def update_song(self, song: Song, **fields) -> bool:
+        old_key = song.key
+        other = self.store.find(song_key({**song.to_dict(), **fields}))
+        if other is not None and other.id != song.id:
+            # Title, artist and duration (or the file) identify a song; an edit may not merge two.
+            return False
+        old_duration = song.duration
+        self.library_index.remove(song)
+        self.song_graph.remove_song(song)
+        self.search_index.remove(song)
+        self.store.update(song.id, **fields)
+        self.library_index.add(song)
+        self.song_graph.add_song(song)
+        self.search_index.add(song)
+        self._view_positions = None
+        self.revision += 1
+        self.storage.update_library_song(old_key, song.to_dict())
+        if song.duration != old_duration:
+            self._refresh_playlist_headers()
+        return True
+
+    def _refresh_playlist_headers(self):
+        # Unloaded playlists show the stored totals, which storage keeps in step with song edits.
+        for name, count, duration in self.storage.playlist_headers():
+            playlist = self.playlists.get(name)
+            if playlist is not None and not playlist.is_loaded:
+                playlist.header_count, playlist.header_duration = count, duration
+
+    def _library_files(self, root: str) -> Dict[str, Song]:
+        prefix = os.path.join(root, "")
+        files = {}
+        for song in self.music_library:
+            filepath = song.filepath
+            if filepath:
+                path = os.path.abspath(filepath)
+                if path.startswith(prefix):
+                    files[path] = song
+        return files
+
+    @staticmethod
+    def _on_owner(owner: Optional[Callable[[Callable], Future]], work: Callable):
+        # Background jobs hand every read and write of player state to the thread that owns the
+        # player (the Tk thread in the GUI) and wait for it; without an owner they run inline.
+        return work() if owner is None else owner(work).result()
+
+    @metrics.timed("library.import")
+    def import_directory(self, path: str, progress_callback: Optional[Callable[[int, int], None]] = None,
+                         batch_size: int = 500, workers: Optional[int] = None,
+                         owner: Optional[Callable[[Callable], Future]] = None) -> ImportReport:
+        started = time.perf_counter()
+        root = os.path.abspath(path)
+        report = ImportReport(root=root)
+        library_files, merged = self._on_owner(owner, lambda: (self._library_files(root), self.storage.load_merged()))
+        cached = self.metadata.cache.stats_under(root) if self.metadata.cache is not None else {}
+        known = {file_path: cached.get(file_path, (-1, -1)) for file_path in library_files}
+        changed, missing, report.unchanged = diff_scan(root, known)
+        report.scanned = len(changed) + report.unchanged
+        if merged:
+            # Copies merge_duplicates folded away stay on disk; they come back only if the file changes.
+            kept = [scanned for scanned in changed if not self._is_merged_copy(scanned, merged)]
+            report.skipped = len(changed) - len(kept)
+            changed = kept
+        if missing:
+            dropped = [library_files[file_path] for file_path in missing]
+            self._on_owner(owner, lambda: self._drop_missing(dropped))
+            report.removed = len(dropped)
+        pending = []
+        for done, scanned in enumerate(probe_files(changed, workers, fallback=self.metadata.fallback, cache=self.metadata.cache), 1):
+            if scanned.info is None:
+                report.failed.append(scanned.path)
+            else:
+                pending.append(scanned)
+            if len(pending) >= batch_size:
+                self._on_owner(owner, lambda batch=pending: self._apply_import_batch(batch, library_files, report))
+                pending = []
+            if progress_callback and (done % batch_size == 0 or done == len(changed)):
+                progress_callback(done, len(changed))
+        if pending:
+            self._on_owner(owner, lambda: self._apply_import_batch(pending, library_files, report))
+        report.elapsed = time.perf_counter() - started
+        metrics.inc("import.scanned", report.scanned)
+        metrics.inc("import.failed", len(report.failed))
+        return report
+
+    @staticmethod
+    def _is_merged_copy(scanned: ScannedFile, merged: Dict[str, str]) -> bool:
+        fingerprint = Fingerprint.decode(merged.get(scanned.path))
+        return fingerprint is not None and (fingerprint.size, fingerprint.mtime_ns) == (scanned.size, scanned.mtime_ns)
+
+    def _drop_missing(self, dropped: List[Song]):
+        self.storage.remove_library_songs([song.to_dict() for song in dropped])
+        self._remove_from_library(dropped)
+
+    def _apply_import_batch(self, batch: List[ScannedFile], library_files: Dict[str, Song], report: ImportReport):
+        added = []
+        restored = []
+        with self.storage.batch():
+            for scanned in batch:
+                info = scanned.info
+                existing = library_files.get(scanned.path)
+                if existing is not None:
+                    self.update_song(existing, duration=info.duration)
+                    report.updated += 1
+                    continue
+                title, artist = info.title or title_from_path(scanned.path), info.artist or "Unknown Artist"
+                song = self.store.find(song_key({"filepath": scanned.path}))
+                if song is None:
+                    song = self.store.add(title=title, artist=artist, mood="Unknown", duration=info.duration, filepath=scanned.path)
+                else:
+                    # A playlist still holds this file's row: bring that row back instead of binding a second one.
+                    self.store.update(song.id, title=title, artist=artist, duration=info.duration)
+                    restored.append(song)
+                self._add_to_library(song)
+                added.append(song.to_dict())
+            self.storage.add_library_songs(added)
+            for song in restored:
+                self.storage.update_library_song(song.key, song.to_dict())
+        report.added += len(added)
+
+    @property
+    def feature_cache(self) -> FeatureCache:
+        if self._feature_cache is None:
+            self._feature_cache = FeatureCache(self.metadata.cache.path if self.metadata.cache is not None else "metadata_cache.db")
+        return self._feature_cache
+
+    @metrics.timed("library.analyze")
+    def auto_tag_moods(self, songs: Optional[Iterable[Song]] = None, only_unknown: bool = True,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       batch_size: int = 200, workers: Optional[int] = None,
+                       owner: Optional[Callable[[Callable], Future]] = None) -> AnalysisReport:
+        started = time.perf_counter()
+        report = AnalysisReport()
+        candidates = self._on_owner(owner, lambda: [(song, song.filepath) for song in (self.music_library if songs is None else songs)
+                                                    if song.filepath and not (only_unknown and song.mood != "Unknown")])
+        targets: Dict[str, Tuple[Song, int, int]] = {}
+        for song, filepath in candidates:
+            path = os.path.abspath(filepath)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                report.failed.append(path)
+                continue
+            targets[path] = (song, stat.st_size, stat.st_mtime_ns)
+        moods: Dict[str, str] = {}
+        pending = []
+        for path, (song, size, mtime_ns) in targets.items():
+            features = self.feature_cache.get(path, size, mtime_ns)
+            if features is None:
+                pending.append(path)
+            else:
+                moods[path] = classify_mood(features)
+                report.cached += 1
+        if pending and not analysis_available():
+            report.error = "NumPy is required to analyze audio"
+            report.failed.extend(pending)
+            pending = []
+        fresh = []
+        for done, (path, features) in enumerate(analyze_files(pending, workers), 1):
+            if features is None:
+                report.failed.append(path)
+            else:
+                _, size, mtime_ns = targets[path]
+                fresh.append((path, size, mtime_ns, features))
+                moods[path] = classify_mood(features)
+                report.analyzed += 1
+                report.audio_seconds += features.duration
+            if len(fresh) >= batch_size:
+                self.feature_cache.put_many(fresh)
+                fresh = []
+            if progress_callback and (done % batch_size == 0 or done == len(pending)):
+                progress_callback(done, len(pending))
+        if fresh:
+            self.feature_cache.put_many(fresh)
+        report.tagged = self._on_owner(owner, lambda: self._apply_moods([(targets[path][0], mood) for path, mood in moods.items()], only_unknown))
+        report.elapsed = time.perf_counter() - started
+        metrics.inc("analysis.audio_seconds", report.audio_seconds)
+        metrics.inc("analysis.failed", len(report.failed))
+        return report
+
+    def _apply_moods(self, tags: List[Tuple[Song, str]], only_unknown: bool) -> int:
+        tagged = 0
+        with self.storage.batch():
+            for song, mood in tags:
+                # A mood picked by hand while the analysis ran wins over the guess.
+                if mood != "Unknown" and mood != song.mood and not (only_unknown and song.mood != "Unknown"):
+                    self.update_song(song, mood=mood)
+                    tagged += 1
+        return tagged
+
+    def _load_fingerprints(self):
+        if self._fingerprints_loaded:
+            return
+        self._fingerprints_loaded = True
+        for key, text in self.storage.load_fingerprints().items():
+            song = self.store.find(key)
+            fingerprint = Fingerprint.decode(text)
+            if song is not None and fingerprint is not None:
+                self.store.fingerprints.setdefault(song.id, fingerprint)
+
+    @metrics.timed("library.find_duplicates")
+    def find_duplicates(self, owner: Optional[Callable[[Callable], Future]] = None) -> DuplicateReport:
+        files, known = self._on_owner(owner, self._duplicate_inputs)
+        report, updated = self.duplicates.find(files, known)
+        report.groups = self._on_owner(owner, lambda: self._apply_fingerprints(report.groups, updated))
+        metrics.inc("library.bytes_hashed", report.bytes_read)
+        return report
+
+    def _duplicate_inputs(self) -> Tuple[Dict[int, str], Dict[int, Fingerprint]]:
+        self._load_fingerprints()
+        files = {song.id: os.path.abspath(song.filepath) for song in self.music_library if song.filepath}
+        return files, dict(self.store.fingerprints)
+
+    def _apply_fingerprints(self, groups: List[List[int]], updated: Dict[int, Fingerprint]) -> List[List[Song]]:
+        if updated:
+            self.store.fingerprints.update(updated)
+            self.storage.save_fingerprints((self.store.get(song_id).key, fingerprint.encode()) for song_id, fingerprint in updated.items())
+        # The canonical copy keeps a hand-picked mood if any copy has one, otherwise the first imported.
+        return [sorted((self.store.get(song_id) for song_id in group), key=lambda song: (song.mood == "Unknown", song.id))
+                for group in groups]
+
+    def merge_duplicates(self, groups: Optional[List[List[Song]]] = None) -> int:
+        if groups is None:
+            groups = self.find_duplicates().groups
+        canonical = {song.id: group[0] for group in groups for song in group[1:] if song != group[0]}
+        if not canonical:
+            return 0
+        dropped = [self.store.get(song_id) for song_id in canonical]
+        with self.storage.batch():
+            for name in self.storage.playlists_with_songs(song.to_dict() for song in dropped):
+                playlist = self.playlists.get(name)
+                if playlist is None:
+                    continue
+                seen = set()
+                rewritten = []
+                for song in playlist.songs:
+                    song = canonical.get(song.id, song)
+                    if song.id not in seen:
+                        seen.add(song.id)
+                        rewritten.append(song)
+                self._replace_playlist_songs(playlist, rewritten)
+                self.storage.replace_entries(name, [song.to_dict() for song in rewritten])
+            self.storage.remove_library_songs([song.to_dict() for song in dropped])
+            merged = [(song.key, self._current_fingerprint(song)) for song in dropped]
+            self.storage.save_merged((key, fingerprint.encode()) for key, fingerprint in merged if fingerprint is not None)
+        self._remove_from_library(dropped)
+        metrics.inc("library.duplicates_merged", len(dropped))
+        return len(dropped)
+
+    @staticmethod
+    def _current_fingerprint(song: Song) -> Optional[Fingerprint]:
+        # The merged copy is remembered by size and mtime, so an import can tell it apart from a changed file.
+        if not song.filepath:
+            return None
+        try:
+            stat = os.stat(song.filepath)
+        except OSError:
+            return None
+        fingerprint = song.fingerprint
+        return fingerprint if fingerprint is not None and fingerprint.matches(stat) else Fingerprint(stat.st_size, stat.st_mtime_ns)
+
+    def get_songs_by_mood(self, mood: str) -> SongList:
+        if mood == "All":
+            return SongList.view(self.store, self.music_library.ids)
+        return self.library_index.mood(mood)
+
+    def query_songs(self, mood: Optional[str] = None, artist: Optional[str] = None,
+                    min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> SongList:
         if mood == "All":
-            return self.music_library[:]
-        return [song for song in self.music_library if song.mood == mood]
+            mood = None
+        result = self.library_index.query(mood, artist, min_duration, max_duration)
+        return result if result is not None else self.get_songs_by_mood("All")
+
+    @metrics.timed("playlist.generate")
+    def generate_playlist(self, target_duration: float, moods: Optional[Iterable[str]] = None, max_per_artist: int = 2,
+                          tolerance: float = 30.0, order: str = "arc", seed: Optional[int] = None) -> SongList:
+        moods = [mood for mood in (moods or ()) if mood != "All"]
+        if moods:
+            candidates = array("I")
+            for mood in dict.fromkeys(moods):
+                candidates.extend(self.library_index.by_mood.get(mood, ()))
+        else:
+            candidates = self.music_library.ids
+        ids = self.generator.generate(candidates, target_duration, tolerance, max_per_artist, order, seed)
+        return SongList(self.store, ids)
+
+    @metrics.timed("search.query")
+    def search(self, query: str, limit: int = 50) -> SongList:
+        return SongList(self.store, self.search_index.search(query, limit))
+
+    def song_by_id(self, song_id: int) -> Optional[Song]:
+        try:
+            return self.store.get(song_id)
+        except IndexError:
+            return None
+
+    def set_view(self, songs: Sequence[Song]):
+        self.current_view = songs
+        self._view_positions = None
+
+    def view_position(self, song_id: int) -> Optional[int]:
+        if self._view_positions is None:
+            positions = {}
+            ids = self.current_view.ids if isinstance(self.current_view, SongList) else (song.id for song in self.current_view)
+            for position, view_id in enumerate(ids):
+                positions.setdefault(view_id, position)
+            self._view_positions = positions
+        return self._view_positions.get(song_id)
+
+    def play_song_id(self, song_id: int) -> bool:
+        position = self.view_position(song_id)
+        if position is None:
+            song = self.song_by_id(song_id)
+            if song is None:
+                return False
+            self.play_song([song], 0)
+        else:
+            self.play_song(self.current_view, position)
+        return True
 
-    def play_song(self, song_list: List[Song], song_index: int):
-        self.current_song_list = song_list
-        self.current_song_index = song_index
+    @metrics.timed("playback.play_request")
+    def play_song(self, song_list: Sequence[Song], song_index: int):
+        queue = self.queue
+        if queue.source is song_list and queue.pristine and len(queue) == len(song_list):
+            queue.jump(song_index)
+        else:
+            ids = song_list.ids if isinstance(song_list, SongList) else (song.id for song in song_list)
+            queue.load(ids, song_index, source=song_list)
+        self._start_current()
+
+    def _start_current(self):
+        self.revision += 1
         song = self.get_current_song()
-        pygame.mixer.music.stop()
-        if song and song.filepath and os.path.exists(song.filepath):
-            try:
-                pygame.mixer.music.load(song.filepath)
-                pygame.mixer.music.play()
-                self.is_playing = True
-            except pygame.error as e:
-                print(f"Error playing file {song.filepath}: {e}")
-                self.is_playing = False
-        elif song:
-            print(f"Playing (dummy track): {song.title}")
-            self.is_playing = True
+        if song is None:
+            self.playback.stop()
+            self.clock.stop()
+            self._audio_active = self.is_playing = False
+            return
+        self.clock.start()
+        self.is_playing = True
+        if song.filepath and self.audio.name != "null" and not self.playback.is_missing(song.filepath):
+            self.playback.play(song.filepath, self._upcoming_paths())
+            self._audio_active = True
         else:
+            self.playback.stop()
+            self._audio_active = False
+            print(f"Playing (dummy track): {song.title}")
+        self._save_queue_cursor()
+
+    def _on_playback_error(self, filepath: str, error: Exception):
+        print(f"Error playing file {filepath}: {error}")
+        metrics.inc("playback.errors")
+        self._audio_active = False
+        if not isinstance(error, OSError) and self.audio.available:
             self.is_playing = False
+            self.clock.pause()
+
+    def _upcoming_paths(self) -> List[str]:
+        paths = []
+        for song_id in self.queue.peek(self.playback.prefetch):
+            filepath = self.store.filepaths.get(song_id)
+            if not filepath:
+                break
+            paths.append(filepath)
+        return paths
+
+    def _refresh_upcoming(self):
+        # Every queue edit ends here, so this is also where they are marked for the server.
+        self.revision += 1
+        if self._audio_active:
+            self.playback.set_upcoming(self._upcoming_paths())
+
+    def poll_playback(self) -> bool:
+        changed = False
+        for transition in self.playback.poll():
+            changed = True
+            if transition == "advanced":
+                self.queue.next(auto=True)
+                self.clock.start()
+                self._refresh_upcoming()
+                self._save_queue_cursor()
+            elif transition == "ended" and self.is_playing:
+                self._advance(auto=True)
+        if self.is_playing and not self._audio_active:
+            song = self.get_current_song()
+            if song and self.clock.position() >= song.duration:
+                self._advance(auto=True)
+                changed = True
+        if changed:
+            self.revision += 1
+        self._flush_queue_cursor()
+        return changed
 
     def get_current_song(self) -> Optional[Song]:
-        if self.current_song_list and 0 <= self.current_song_index < len(self.current_song_list):
-            return self.current_song_list[self.current_song_index]
-        return None
+        song_id = self.queue.current_song_id
+        return self.store.get(song_id) if song_id is not None else None
 
     def toggle_play_pause(self):
         song = self.get_current_song()
         if not song:
             return
-        if song.filepath and os.path.exists(song.filepath):
+        if not self.is_playing and not self.clock.running and not self.clock.position():
+            self._start_current()
+            return
+        if self._audio_active:
             if self.is_playing:
-                if pygame.mixer.music.get_busy():
-                    pygame.mixer.music.pause()
+                self.playback.pause()
             else:
-                pygame.mixer.music.unpause()
+                self.playback.resume()
+        if self.is_playing:
+            self.clock.pause()
+        else:
+            self.clock.resume()
         self.is_playing = not self.is_playing
+        self.revision += 1
+
+    def _advance(self, auto: bool):
+        if self.queue.next(auto=auto) is None:
+            self.playback.stop()
+            self.clock.stop()
+            self._audio_active = self.is_playing = False
+            self.revision += 1
+            return
+        self._start_current()
 
     def next_song(self):
-        if self.current_song_list:
-            next_index = (self.current_song_index + 1) % len(self.current_song_list)
-            self.play_song(self.current_song_list, next_index)
+        if len(self.queue):
+            self._advance(auto=False)
 
     def prev_song(self):
-        if self.current_song_list:
-            prev_index = (self.current_song_index - 1 + len(self.current_song_list)) % len(self.current_song_list)
-            self.play_song(self.current_song_list, prev_index)
+        if len(self.queue) and self.queue.prev() is not None:
+            self._start_current()
+
+    def enqueue(self, song: Song):
+        self.queue.enqueue(song.id)
+        self._refresh_upcoming()
+
+    def play_next(self, song: Song):
+        self.queue.play_next(song.id)
+        self._refresh_upcoming()
+
+    def remove_from_queue(self, song: Song) -> bool:
+        removed = self.queue.remove(song.id)
+        if removed:
+            self._refresh_upcoming()
+        return removed
+
+    def set_shuffle(self, enabled: bool):
+        self.queue.set_shuffle(enabled)
+        self._refresh_upcoming()
+        self._save_queue_cursor()
+
+    def set_repeat(self, mode: str):
+        self.queue.set_repeat(mode)
+        self._refresh_upcoming()
+        self._save_queue_cursor()
+
+    def _song_key(self, song_id: int) -> str:
+        return self.store.get(song_id).key
+
+    def _resolve_key(self, key: str) -> Optional[int]:
+        song = self.store.find(key)
+        return song.id if song is not None else None
+
+    def _save_queue_cursor(self):
+        # Track changes only mark the cursor dirty, so skipping never waits on SQLite on the
+        # Tk thread; poll_playback writes it at most once per interval and close() flushes the rest.
+        if self._cursor_dirty_since is None:
+            self._cursor_dirty_since = time.monotonic()
+
+    def _flush_queue_cursor(self):
+        if self._cursor_dirty_since is not None and time.monotonic() - self._cursor_dirty_since >= self.cursor_save_interval:
+            self._cursor_dirty_since = None
+            # Periodic saves skip the history so they cost one small row write.
+            self.storage.save_state("queue_cursor", self.queue.cursor_state(self._song_key, include_history=False))
+
+    def save_queue(self):
+        if self.queue.version != self._saved_queue_version:
+            self.storage.save_state("queue", self.queue.order_state(self._song_key))
+            self._saved_queue_version = self.queue.version
+        self._cursor_dirty_since = None
+        self.storage.save_state("queue_cursor", self.queue.cursor_state(self._song_key, include_history=True))
+
+    def _restore_queue(self):
+        order = self.storage.load_state("queue")
+        if order:
+            self.queue.restore(order, self.storage.load_state("queue_cursor"), self._resolve_key)
+            self._saved_queue_version = self.queue.version
+
+    def close(self):
+        self.save_queue()
+        if self._feature_cache is not None:
+            self._feature_cache.close()
+        if self.metadata.cache is not None:
+            self.metadata.cache.close()
+        self.storage.close()
 
     def set_volume(self, volume_level):
-        pygame.mixer.music.set_volume(float(volume_level))
+        self.playback.set_volume(float(volume_level))
 
     def get_playback_position(self):
         song = self.get_current_song()
-        if song and song.filepath and os.path.exists(song.filepath) and pygame.mixer.music.get_busy():
-            return pygame.mixer.music.get_pos() / 1000, song.duration
-        return 0, song.duration if song else 0
+        if song is None:
+            return 0, 0
+        return min(self.clock.position(), song.duration), song.duration
+
+SORT_FIELDS = ("title", "artist", "mood", "duration")
+
+def parse_sort_spec(spec) -> List[Tuple[str, bool]]:
+    if isinstance(spec, str):
+        spec = [spec]
+    parsed = []
+    for item in spec:
+        if isinstance(item, str):
+            name, descending = item.lstrip("-"), item.startswith("-")
+        else:
+            name, descending = item[0], bool(item[1])
+        if name not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {name}")
+        parsed.append((name, descending))
+    return parsed
+
+def sort_column(songs: Sequence[Song], name: str) -> list:
+    if name == "duration":
+        return [song.duration for song in songs]
+    if name == "title":
+        return [song.title.lower() for song in songs]
+    lowered: Dict[str, str] = {}
+    column = []
+    for song in songs:
+        value = getattr(song, name)
+        key = lowered.get(value)
+        if key is None:
+            key = lowered[value] = value.lower()
+        column.append(key)
+    return column
+
+class _Descending:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+def composite_keys(songs: Sequence[Song], fields: List[Tuple[str, bool]]) -> List[tuple]:
+    columns = []
+    for name, descending in fields:
+        column = sort_column(songs, name)
+        if descending:
+            column = [-value for value in column] if name == "duration" else [_Descending(value) for value in column]
+        columns.append(column)
+    return list(zip(*columns))
+
+class SortRun:
+    def __init__(self, manager: "SortingManager", songs: LinkedList, steps: Callable, fields: List[Tuple[str, bool]]):
+        self.manager = manager
+        self.songs = songs
+        self.items = list(songs.to_python_list())
+        self._steps = steps(self.items, composite_keys(self.items, fields))
+        self.paused = False
+        self.finished = False
+        self.cancelled = False
+        self.steps_per_frame = 1
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def set_speed(self, steps_per_frame: int):
+        self.steps_per_frame = max(1, int(steps_per_frame))
+
+    @metrics.timed("sort.step")
+    def step(self, max_events: int = 1) -> List[tuple]:
+        events = []
+        if self.finished:
+            return events
+        steps = self._steps
+        for _ in range(max_events):
+            event = next(steps, None)
+            if event is None:
+                self._finish()
+                break
+            events.append(event)
+        metrics.inc("sort.events", len(events))
+        return events
+
+    def next_frame(self) -> List[tuple]:
+        return [] if self.paused else self.step(self.steps_per_frame)
+
+    def run(self) -> LinkedList:
+        while not self.finished:
+            self.step(4096)
+        return self.songs
+
+    def cancel(self):
+        if not self.finished:
+            self._steps.close()
+            self.finished = True
+            self.cancelled = True
+            self.manager._finish_run(self)
+
+    def _finish(self):
+        node = self.songs.head
+        for song in self.items:
+            node.data = song
+            node = node.next
+        self.songs.invalidate()
+        self.finished = True
+        self.manager._finish_run(self)
+
+class _CountingKey:
+    __slots__ = ("value", "manager")
+
+    def __init__(self, value, manager: "SortingManager"):
+        self.value = value
+        self.manager = manager
+
+    def __lt__(self, other):
+        self.manager.comparisons += 1
+        return self.value < other.value
 
 class SortingManager:
-    def __init__(self, update_callback: Callable, stats_callback: Callable, finished_callback: Callable):
+    def __init__(self, update_callback: Optional[Callable] = None, stats_callback: Optional[Callable] = None,
+                 finished_callback: Optional[Callable] = None):
         self.update_callback = update_callback
         self.stats_callback = stats_callback
         self.finished_callback = finished_callback
         self.is_sorting = False
-        self.comparisons = 0
+        # None after an uncounted timsort: counting wraps every key and makes the sort about four times slower.
+        self.comparisons: Optional[int] = 0
         self.swaps = 0
-        self.delay = 0.1
-
-    def sort_in_thread(self, algorithm: str, songs_source):
-        if isinstance(songs_source, list):
-            linked = LinkedList()
-            for song in songs_source:
-                linked.append(song)
-            songs = linked
-        else:
-            songs = songs_source
+        self.metrics = metrics
+
+    def start(self, algorithm: str, songs_source, spec=("title",)) -> Optional["SortRun"]:
         if self.is_sorting:
-            return
+            return None
+        songs = songs_source if isinstance(songs_source, LinkedList) else LinkedList(songs_source)
+        steps = getattr(self, f"_{algorithm.lower().replace(' ', '_')}", None)
+        if steps is None:
+            raise ValueError(f"Unknown sort algorithm: {algorithm}")
         self.is_sorting = True
         self.comparisons = 0
         self.swaps = 0
-        thread = threading.Thread(target=self._run_sort, args=(algorithm, songs))
-        thread.daemon = True
-        thread.start()
-
-    def _run_sort(self, algorithm: str, songs: LinkedList):
-        sorter = getattr(self, f"_{algorithm.lower().replace(' ', '_')}")
-        sorter(songs)
-        self.update_callback(songs.to_list(), {})
+        return SortRun(self, songs, steps, parse_sort_spec(spec))
+
+    def _finish_run(self, run: "SortRun"):
         self.is_sorting = False
-        self.finished_callback()
+        metrics.inc("sort.comparisons", self.comparisons)
+        metrics.inc("sort.swaps", self.swaps)
+        if self.stats_callback:
+            self.stats_callback(self.comparisons, self.swaps)
+        if self.finished_callback:
+            self.finished_callback()
 
-    def _bubble_sort(self, songs: LinkedList):
-        if not songs.head or not songs.head.next:
+    @metrics.timed("sort.sort_songs")
+    def sort_songs(self, songs, spec=("title",), engine: str = "timsort", count_comparisons: bool = False) -> LinkedList:
+        fields = parse_sort_spec(spec)
+        linked = songs if isinstance(songs, LinkedList) else LinkedList(songs)
+        self.comparisons = 0
+        self.swaps = 0
+        if engine == "timsort":
+            if not count_comparisons:
+                self.comparisons = None
+            self._timsort(linked, fields, count_comparisons)
+        elif engine == "merge":
+            self._linked_merge_sort(linked, fields)
+        else:
+            raise ValueError(f"Unknown sort engine: {engine}")
+        if self.stats_callback:
+            self.stats_callback(self.comparisons, self.swaps)
+        return linked
+
+    def _timsort(self, songs: LinkedList, fields: List[Tuple[str, bool]], count_comparisons: bool):
+        snapshot = songs.to_python_list()
+        order = list(range(len(snapshot)))
+        for name, descending in reversed(fields):
+            column = sort_column(snapshot, name)
+            if count_comparisons:
+                order.sort(key=lambda position: _CountingKey(column[position], self), reverse=descending)
+            else:
+                order.sort(key=column.__getitem__, reverse=descending)
+        node = songs.head
+        for position, source in enumerate(order):
+            if position != source:
+                node.data = snapshot[source]
+                self.swaps += 1
+            node = node.next
+        songs.invalidate()
+
+    def _linked_merge_sort(self, songs: LinkedList, fields: List[Tuple[str, bool]]):
+        if songs.size < 2:
             return
-        end = None
-        while end != songs.head:
+        keys = {}
+        node = songs.head
+        for key in composite_keys(songs.to_python_list(), fields):
+            keys[node] = key
+            node = node.next
+        dummy = Node(None)
+        dummy.next = songs.head
+        width = 1
+        while width < songs.size:
+            tail = dummy
+            current = dummy.next
+            while current:
+                left = current
+                right = self._split(left, width)
+                current = self._split(right, width)
+                tail = self._merge(left, right, tail, keys)
+            width *= 2
+        songs.head = dummy.next
+        songs.invalidate()
+
+    @staticmethod
+    def _split(node: Optional[Node], width: int) -> Optional[Node]:
+        for _ in range(width - 1):
+            if node is None:
+                break
+            node = node.next
+        if node is None:
+            return None
+        rest = node.next
+        node.next = None
+        return rest
+
+    def _merge(self, left: Optional[Node], right: Optional[Node], tail: Node, keys: Dict[Node, tuple]) -> Node:
+        comparisons = 0
+        moves = 0
+        while left and right:
+            comparisons += 1
+            if keys[right] < keys[left]:
+                tail.next = right
+                right = right.next
+                moves += 1
+            else:
+                tail.next = left
+                left = left.next
+            tail = tail.next
+        tail.next = left or right
+        while tail.next:
+            tail = tail.next
+        self.comparisons += comparisons
+        self.swaps += moves
+        return tail
+
+    def _bubble_sort(self, items: list, keys: list):
+        end = len(keys)
+        while end > 1:
             swapped = False
-            current = songs.head
-            while current.next != end:
-                if not self.is_sorting:
-                    return
+            for i in range(end - 1):
                 self.comparisons += 1
-                self.stats_callback(self.comparisons, self.swaps)
-                self.update_callback(songs.to_list(), {"compare": [current.data.title, current.next.data.title]})
-                time.sleep(self.delay)
-                if current.data.title.lower() > current.next.data.title.lower():
-                    current.data, current.next.data = current.next.data, current.data
+                yield ("compare", i, i + 1)
+                if keys[i + 1] < keys[i]:
+                    keys[i], keys[i + 1] = keys[i + 1], keys[i]
+                    items[i], items[i + 1] = items[i + 1], items[i]
                     self.swaps += 1
-                    self.update_callback(songs.to_list(), {"swap": [current.data.title, current.next.data.title]})
-                    time.sleep(self.delay)
                     swapped = True
-                current = current.next
+                    yield ("swap", i, i + 1)
             if not swapped:
                 break
-            end = current
+            end -= 1
 
-    def _selection_sort(self, songs: LinkedList):
-        start = songs.head
-        while start:
-            min_node = start
-            current = start.next
-            while current:
-                if not self.is_sorting:
-                    return
+    def _selection_sort(self, items: list, keys: list):
+        count = len(keys)
+        for start in range(count):
+            smallest = start
+            for j in range(start + 1, count):
                 self.comparisons += 1
-                self.stats_callback(self.comparisons, self.swaps)
-                self.update_callback(songs.to_list(), {"compare": [current.data.title, min_node.data.title]})
-                time.sleep(self.delay)
-                if current.data.title.lower() < min_node.data.title.lower():
-                    min_node = current
-                current = current.next
-            if min_node != start:
-                start.data, min_node.data = min_node.data, start.data
+                yield ("compare", j, smallest)
+                if keys[j] < keys[smallest]:
+                    smallest = j
+                    yield ("min", smallest)
+            if smallest != start:
+                keys[start], keys[smallest] = keys[smallest], keys[start]
+                items[start], items[smallest] = items[smallest], items[start]
                 self.swaps += 1
-                self.update_callback(songs.to_list(), {"swap": [start.data.title, min_node.data.title]})
-                time.sleep(self.delay)
-            start = start.next
+                yield ("swap", start, smallest)
 
-    def _insertion_sort(self, songs: LinkedList):
-        if not songs.head or not songs.head.next:
-            return
-        sorted_head = songs.head
-        current = sorted_head.next
-        sorted_head.next = None
-        while current:
-            if not self.is_sorting:
-                return
-            key_node = current
-            current = current.next
-            if key_node.data.title.lower() < sorted_head.data.title.lower():
-                key_node.next = sorted_head
-                sorted_head = key_node
-            else:
-                search = sorted_head
-                while search.next and search.next.data.title.lower() < key_node.data.title.lower():
-                    self.comparisons += 1
-                    self.stats_callback(self.comparisons, self.swaps)
-                    self.update_callback(songs.to_list(), {"compare": [key_node.data.title, search.next.data.title]})
-                    time.sleep(self.delay)
-                    search = search.next
-                key_node.next = search.next
-                search.next = key_node
-            songs.head = sorted_head
-            self.update_callback(songs.to_list(), {})
-            time.sleep(self.delay)
+    def _insertion_sort(self, items: list, keys: list):
+        for i in range(1, len(keys)):
+            key = keys[i]
+            j = i
+            while j > 0:
+                self.comparisons += 1
+                yield ("compare", j - 1, i)
+                if not key < keys[j - 1]:
+                    break
+                j -= 1
+            if j != i:
+                keys.insert(j, keys.pop(i))
+                items.insert(j, items.pop(i))
+                self.swaps += 1
+                yield ("move", i, j)
@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SAMPLE_BYTES = 16 * 1024
+SAMPLE_POINTS = 4
+READ_CHUNK = 1024 * 1024
+
+class Fingerprint(NamedTuple):
+    size: int
+    mtime_ns: int
+    sample: Optional[str] = None
+    full: Optional[str] = None
+
+    def encode(self) -> str:
+        return f"{self.size}:{self.mtime_ns}:{self.sample or ''}:{self.full or ''}"
+
+    @classmethod
+    def decode(cls, text: str) -> Optional["Fingerprint"]:
+        try:
+            size, mtime_ns, sample, full = text.split(":")
+            return cls(int(size), int(mtime_ns), sample or None, full or None)
+        except (AttributeError, ValueError):
+            return None
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+@dataclass
+class DuplicateReport:
+    groups: List[list] = field(default_factory=list)
+    scanned: int = 0
+    missing: int = 0
+    total_bytes: int = 0
+    bytes_read: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def read_fraction(self) -> float:
+        return self.bytes_read / self.total_bytes if self.total_bytes else 0.0
+
+def sample_offsets(size: int) -> List[int]:
+    if size <= SAMPLE_BYTES * SAMPLE_POINTS:
+        return [0]
+    last = size - SAMPLE_BYTES
+    return [last * i // (SAMPLE_POINTS - 1) for i in range(SAMPLE_POINTS)]
+
+def sample_digest(path: str, size: int) -> Tuple[str, int]:
+    # Small files are hashed whole, so their sample digest doubles as the full digest.
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    if size <= SAMPLE_BYTES * SAMPLE_POINTS:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest.update(data)
+        return digest.hexdigest(), len(data)
+    read = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in sample_offsets(size):
+            chunk = mapped[offset:offset + SAMPLE_BYTES]
+            digest.update(chunk)
+            read += len(chunk)
+    return digest.hexdigest(), read
+
+def full_digest(path: str) -> Tuple[str, int]:
+    digest = hashlib.blake2b(digest_size=32)
+    read = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            read += len(chunk)
+    return digest.hexdigest(), read
+
+class DuplicateFinder:
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self._lock = threading.Lock()
+
+    def find(self, files: Dict[int, str], known: Dict[int, Fingerprint]) -> Tuple[DuplicateReport, Dict[int, Fingerprint]]:
+        # Each stage only touches files that collided in the previous one: equal sizes
+        # get sampled, equal samples get hashed in full. Returns fingerprints that changed.
+        started = time.perf_counter()
+        report = DuplicateReport()
+        prints: Dict[int, Fingerprint] = {}
+        for song_id, path in files.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                report.missing += 1
+                continue
+            previous = known.get(song_id)
+            prints[song_id] = previous if previous is not None and previous.matches(stat) else Fingerprint(stat.st_size, stat.st_mtime_ns)
+            report.total_bytes += stat.st_size
+        report.scanned = len(prints)
+        updated: Dict[int, Fingerprint] = {}
+        by_size = self._collisions(prints, lambda fp: fp.size)
+        self._fill(by_size, files, prints, updated, report, "sample")
+        by_sample = self._collisions({song_id: prints[song_id] for song_id in by_size if prints[song_id].sample},
+                                     lambda fp: (fp.size, fp.sample))
+        self._fill(by_sample, files, prints, updated, report, "full")
+        groups = defaultdict(list)
+        for song_id in by_sample:
+            fingerprint = prints[song_id]
+            if fingerprint.full:
+                groups[(fingerprint.size, fingerprint.full)].append(song_id)
+        report.groups = sorted((sorted(ids) for ids in groups.values() if len(ids) > 1), key=lambda ids: ids[0])
+        report.elapsed = time.perf_counter() - started
+        return report, updated
+
+    @staticmethod
+    def _collisions(prints: Dict[int, Fingerprint], key) -> List[int]:
+        buckets = defaultdict(list)
+        for song_id, fingerprint in prints.items():
+            buckets[key(fingerprint)].append(song_id)
+        return [song_id for ids in buckets.values() if len(ids) > 1 for song_id in ids]
+
+    def _fill(self, song_ids: Iterable[int], files: Dict[int, str], prints: Dict[int, Fingerprint],
+              updated: Dict[int, Fingerprint], report: DuplicateReport, stage: str):
+        pending = [song_id for song_id in song_ids if getattr(prints[song_id], stage) is None]
+
+        def compute(song_id: int):
+            fingerprint = prints[song_id]
+            try:
+                if stage == "sample":
+                    digest, read = sample_digest(files[song_id], fingerprint.size)
+                    whole = fingerprint.size <= SAMPLE_BYTES * SAMPLE_POINTS
+                    fingerprint = fingerprint._replace(sample=digest, full=digest if whole else None)
+                else:
+                    digest, read = full_digest(files[song_id])
+                    fingerprint = fingerprint._replace(full=digest)
+            except (OSError, ValueError):
+                return
+            with self._lock:
+                prints[song_id] = updated[song_id] = fingerprint
+                report.bytes_read += read
+
+        if len(pending) < 2:
+            for song_id in pending:
+                compute(song_id)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+            list(pool.map(compute, pending))
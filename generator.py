@@ -0,0 +1,151 @@
+import random
+from collections import Counter
+from itertools import count
+from typing import Iterable, List, Optional, Sequence
+
+MOOD_ENERGY = {"Sad": 0.2, "Calm": 0.3, "Unknown": 0.5, "Happy": 0.7, "Energetic": 0.9}
+ORDERS = ("arc", "rise", "fall", "none")
+
+def reachable_rows(weights: Sequence[int], cells: int):
+    # Row i marks every total reachable with the first i weights; kept for reconstruction.
+    try:
+        import numpy as np
+    except ImportError:
+        rows = [1]
+        mask = (1 << cells) - 1
+        for weight in weights:
+            rows.append(rows[-1] | ((rows[-1] << weight) & mask))
+        return rows, lambda row, cell: (row >> cell) & 1
+    rows = np.zeros((len(weights) + 1, cells), dtype=bool)
+    rows[0, 0] = True
+    for i, weight in enumerate(weights):
+        rows[i + 1] = rows[i]
+        if weight < cells:
+            rows[i + 1, weight:] |= rows[i, :cells - weight]
+    return rows, lambda row, cell: row[cell]
+
+def subset_near(weights: Sequence[int], target: int, slack: int) -> List[int]:
+    # Nothing past the sum of all weights is reachable, so a short pool never pays for a wide table.
+    target = min(target, sum(weights))
+    cells = target + slack + 1
+    rows, has = reachable_rows(weights, cells)
+    last = rows[-1]
+    best = None
+    for distance in range(slack + 1):
+        for cell in (target - distance, target + distance):
+            if 0 <= cell < cells and has(last, cell):
+                best = cell
+                break
+        if best is not None:
+            break
+    if best is None:
+        best = next((cell for cell in range(target, -1, -1) if has(last, cell)), 0)
+    picked = []
+    for i in range(len(weights), 0, -1):
+        if not has(rows[i - 1], best):
+            picked.append(i - 1)
+            best -= weights[i - 1]
+    return picked[::-1]
+
+class PlaylistGenerator:
+    def __init__(self, store, dp_items: int = 1500, dp_window: float = 1800.0, resolution: float = 1.0):
+        self.store = store
+        self.dp_items = dp_items
+        self.dp_window = dp_window
+        self.resolution = resolution
+
+    def generate(self, candidates: Iterable[int], target: float, tolerance: float = 30.0, max_per_artist: int = 2,
+                 order: str = "arc", seed: Optional[int] = None) -> List[int]:
+        if order not in ORDERS:
+            raise ValueError(f"Unknown playlist order: {order}")
+        rng = random.Random(seed)
+        durations = self.store.durations
+        limit = target + tolerance
+        ids = [song_id for song_id in candidates if 0 < durations[song_id] <= limit]
+        if not ids or target <= 0:
+            return []
+        per_artist: Counter = Counter()
+        chosen: List[int] = []
+        total = 0.0
+        # The DP table is (pool + 1) x (remaining seconds), so anything past the window is filled greedily
+        # whatever the library size; that keeps it near dp_items x (dp_window + one track).
+        if target > self.dp_window:
+            total = self._greedy(ids, target - self.dp_window, max_per_artist, per_artist, chosen, rng)
+        pool = self._pool(ids, set(chosen), target - total + tolerance, max_per_artist, per_artist, rng)
+        weights = [max(1, round(durations[song_id] / self.resolution)) for song_id in pool]
+        picked = subset_near(weights, max(0, round((target - total) / self.resolution)), round(tolerance / self.resolution))
+        chosen.extend(pool[i] for i in picked)
+        return self.order(chosen, order, rng)
+
+    def _greedy(self, ids: List[int], goal: float, max_per_artist: int, per_artist: Counter, chosen: List[int],
+                rng: random.Random) -> float:
+        durations, artists = self.store.durations, self.store.artists
+        exhaustive = len(ids) <= self.dp_items * 2
+        if exhaustive:
+            probes = rng.sample(ids, len(ids))
+        else:
+            # Random probes instead of shuffling the whole candidate list keep this O(playlist length).
+            probes = (ids[rng.randrange(len(ids))] for _ in count())
+        seen = set()
+        total = 0.0
+        attempts = 0
+        for song_id in probes:
+            if total >= goal or len(seen) >= len(ids) or (not exhaustive and attempts >= 50 * (len(chosen) + 20)):
+                break
+            attempts += 1
+            if song_id in seen:
+                continue
+            seen.add(song_id)
+            duration = durations[song_id]
+            if per_artist[artists[song_id]] >= max_per_artist or total + duration > goal:
+                continue
+            per_artist[artists[song_id]] += 1
+            chosen.append(song_id)
+            total += duration
+        return total
+
+    def _pool(self, ids: List[int], exclude: set, limit: float, max_per_artist: int, per_artist: Counter,
+              rng: random.Random) -> List[int]:
+        durations, artists = self.store.durations, self.store.artists
+        if len(ids) <= self.dp_items * 2:
+            order = ids[:]
+            rng.shuffle(order)
+        else:
+            order = (ids[rng.randrange(len(ids))] for _ in range(self.dp_items * 4))
+        pool = []
+        taken: Counter = Counter()
+        for song_id in order:
+            if song_id in exclude or durations[song_id] > limit:
+                continue
+            artist = artists[song_id]
+            if per_artist[artist] + taken[artist] >= max_per_artist:
+                continue
+            exclude.add(song_id)
+            taken[artist] += 1
+            pool.append(song_id)
+            if len(pool) >= self.dp_items:
+                break
+        return pool
+
+    def order(self, song_ids: List[int], order: str, rng: random.Random) -> List[int]:
+        if order == "none" or len(song_ids) < 3:
+            return song_ids
+        store = self.store
+        energy = {song_id: MOOD_ENERGY.get(store.strings[store.moods[song_id]], 0.5) for song_id in song_ids}
+        ranked = sorted(song_ids, key=lambda song_id: (energy[song_id], rng.random()))
+        if order == "fall":
+            ranked.reverse()
+        elif order == "arc":
+            ranked = ranked[0::2] + ranked[1::2][::-1]
+        return self._spread_artists(ranked)
+
+    def _spread_artists(self, song_ids: List[int]) -> List[int]:
+        artists, moods = self.store.artists, self.store.moods
+        for i in range(1, len(song_ids)):
+            if artists[song_ids[i]] != artists[song_ids[i - 1]]:
+                continue
+            for j in range(i + 1, len(song_ids)):
+                if artists[song_ids[j]] != artists[song_ids[i - 1]] and moods[song_ids[j]] == moods[song_ids[i]]:
+                    song_ids[i], song_ids[j] = song_ids[j], song_ids[i]
+                    break
+        return song_ids
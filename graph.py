@@ -0,0 +1,355 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Set, Tuple, Optional
+
+class SongGraph:
+    def __init__(self, store, k: int = 8, candidate_cap: int = 24, bucket_seconds: float = 10.0, duration_window: float = 60.0,
+                 max_bucket_radius: int = 30):
+        self.store = store
+        self.k = k
+        self.candidate_cap = candidate_cap
+        self.bucket_seconds = bucket_seconds
+        self.duration_window = duration_window
+        self.max_bucket_radius = max_bucket_radius
+        # Postings are insertion-ordered dicts used as sets so removals are O(1).
+        self.by_artist: Dict[int, Dict[int, None]] = {}
+        self.by_mood_bucket: Dict[Tuple[int, int], Dict[int, None]] = {}
+        self.by_bucket: Dict[int, Dict[int, None]] = {}
+        self.neighbors: Dict[int, List[Tuple[float, int]]] = {}
+        self._pending: Dict[int, None] = {}
+        # Who lists each song as a neighbour, so a removal knows which lists to refill. In-degree stays small (about k),
+        # so plain lists are cheaper than sets here.
+        self._inbound: Dict[int, List[int]] = {}
+        self._dirty: Set[int] = set()
+        self.version = 0
+        self._reverse: Optional[Dict[int, List[Tuple[float, int]]]] = None
+        self._reverse_version = -1
+
+    def __len__(self):
+        return len(self.neighbors) + len(self._pending)
+
+    def _bucket(self, song_id: int) -> Tuple[int, int]:
+        return self.store.moods[song_id], int(self.store.durations[song_id] // self.bucket_seconds)
+
+    def add_song(self, song):
+        self.by_artist.setdefault(self.store.artists[song.id], {})[song.id] = None
+        mood_bucket = self._bucket(song.id)
+        self.by_mood_bucket.setdefault(mood_bucket, {})[song.id] = None
+        self.by_bucket.setdefault(mood_bucket[1], {})[song.id] = None
+        self._pending[song.id] = None
+
+    def build(self, songs):
+        for song in songs:
+            self.add_song(song)
+        self.flush()
+
+    def remove_song(self, song):
+        song_id = song.id
+        mood_bucket = self._bucket(song_id)
+        for postings in (self.by_artist.get(self.store.artists[song_id]), self.by_mood_bucket.get(mood_bucket),
+                         self.by_bucket.get(mood_bucket[1])):
+            if postings:
+                postings.pop(song_id, None)
+        self._pending.pop(song_id, None)
+        self._dirty.discard(song_id)
+        for _, other in self.neighbors.pop(song_id, ()):
+            self._inbound[other].remove(song_id)
+        for source in self._inbound.pop(song_id, ()):
+            neighbors = self.neighbors.get(source)
+            if neighbors is not None:
+                self.neighbors[source] = [(score, other) for score, other in neighbors if other != song_id]
+                self._dirty.add(source)
+        self.version += 1
+
+    def _candidates(self, song_id: int) -> List[Tuple[float, int]]:
+        store = self.store
+        cap = self.candidate_cap
+        artist = store.artists[song_id]
+        mood, bucket = self._bucket(song_id)
+        candidate_ids = set(itertools.islice(self.by_artist.get(artist, ()), cap // 2))
+        for nearby in (bucket, bucket - 1, bucket + 1):
+            candidate_ids.update(itertools.islice(self.by_bucket.get(nearby, ()), cap // 4))
+        candidate_ids.discard(song_id)
+        wanted = len(candidate_ids) + cap
+        for radius in range(self.max_bucket_radius + 1):
+            for nearby in ((bucket,) if radius == 0 else (bucket - radius, bucket + radius)):
+                postings = self.by_mood_bucket.get((mood, nearby))
+                remaining = wanted - len(candidate_ids)
+                if postings and remaining > 0:
+                    candidate_ids.update(itertools.islice(postings, remaining + 1))
+            candidate_ids.discard(song_id)
+            if len(candidate_ids) >= wanted:
+                break
+        artists, moods, durations = store.artists, store.moods, store.durations
+        duration = durations[song_id]
+        window = self.duration_window
+        scored = []
+        for other in candidate_ids:
+            score = 2.0 if artists[other] == artist else 0.0
+            if moods[other] == mood:
+                score += 1.0
+            gap = abs(durations[other] - duration)
+            if gap < window:
+                score += 1.0 - gap / window
+            if score > 0:
+                scored.append((score, other))
+        return scored
+
+    def _offer(self, song_id: int, score: float, other: int):
+        neighbors = self.neighbors.get(song_id)
+        if neighbors is None or any(existing == other for _, existing in neighbors):
+            return
+        if len(neighbors) < self.k or score > neighbors[-1][0]:
+            # Lists are replaced, never edited in place, so a shallow copy of `neighbors` is a consistent snapshot.
+            ranked = sorted(neighbors + [(score, other)], key=lambda item: -item[0])
+            self._inbound.setdefault(other, []).append(song_id)
+            for _, evicted in ranked[self.k:]:
+                self._inbound[evicted].remove(song_id)
+            self.neighbors[song_id] = ranked[:self.k]
+
+    def _refill(self):
+        # Lists that lost a neighbour to remove_song pick up replacements the same way additions are offered.
+        dirty, self._dirty = self._dirty, set()
+        self.version += 1
+        for song_id in dirty:
+            for score, other in self._candidates(song_id):
+                self._offer(song_id, score, other)
+
+    def flush(self):
+        if self._dirty:
+            self._refill()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self.version += 1
+        incremental = bool(self.neighbors)
+        for song_id in pending:
+            scored = self._candidates(song_id)
+            scored.sort(key=lambda item: -item[0])
+            self.neighbors[song_id] = scored[:self.k]
+            for _, other in scored[:self.k]:
+                self._inbound.setdefault(other, []).append(song_id)
+            if incremental:
+                for score, other in scored:
+                    self._offer(other, score, song_id)
+
+    def edges(self, song_id: int) -> List[Tuple[float, int]]:
+        self.flush()
+        return [(score, other) for score, other in self.neighbors.get(song_id, ()) if other in self.neighbors]
+
+    def reverse_edges(self) -> Dict[int, List[Tuple[float, int]]]:
+        self.flush()
+        if self._reverse_version != self.version:
+            reverse: Dict[int, List[Tuple[float, int]]] = {}
+            for song_id, neighbors in self.neighbors.items():
+                for score, other in neighbors:
+                    reverse.setdefault(other, []).append((score, song_id))
+            self._reverse = reverse
+            self._reverse_version = self.version
+        return self._reverse
+
+    @staticmethod
+    def resolve(song_or_id) -> int:
+        # Songs are addressed by id: titles are not unique.
+        return song_or_id if isinstance(song_or_id, int) else song_or_id.id
+
+    def get_recommendations(self, song_or_id, count: int = 4) -> list:
+        song_id = self.resolve(song_or_id)
+        return [self.store.get(other) for _, other in self.edges(song_id)[:count]]
+
+class GraphSnapshot:
+    # The adjacency as of one flush, for a search thread to walk while the owner thread keeps editing the graph.
+    def __init__(self, graph: SongGraph, reverse: bool = False):
+        graph.flush()
+        self.store = graph.store
+        self.duration_window = graph.duration_window
+        self.neighbors = dict(graph.neighbors)
+        self._reverse = graph.reverse_edges() if reverse else None
+
+    def flush(self):
+        pass
+
+    def reverse_edges(self) -> Dict[int, List[Tuple[float, int]]]:
+        if self._reverse is None:
+            reverse: Dict[int, List[Tuple[float, int]]] = {}
+            for song_id, neighbors in self.neighbors.items():
+                for score, other in neighbors:
+                    reverse.setdefault(other, []).append((score, song_id))
+            self._reverse = reverse
+        return self._reverse
+
+    resolve = staticmethod(SongGraph.resolve)
+
+MAX_EDGE_SCORE = 4.0
+MIN_EDGE_COST = 0.01
+
+class SearchCancelled(Exception):
+    pass
+
+class DFSManager:
+    ALGORITHMS = ("dfs", "bfs", "bidirectional", "dijkstra", "astar")
+
+    def __init__(self, update_callback: Optional[Callable] = None, finished_callback: Optional[Callable] = None,
+                 delay: float = 0.3, headless: bool = False):
+        self.update_callback = update_callback
+        self.finished_callback = finished_callback
+        self.delay = delay
+        self.headless = headless or update_callback is None
+        self.is_searching = False
+        self.visited_count = 0
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def find_path_in_thread(self, graph: SongGraph, start, end, algorithm: str = "dfs"):
+        if self.is_searching:
+            return
+        self.is_searching = True
+        self._cancelled = False
+        # Flush and snapshot here, on the thread that owns the graph; the worker only reads the snapshot.
+        snapshot = GraphSnapshot(graph, reverse=algorithm == "bidirectional")
+        thread = threading.Thread(target=self._run_search, args=(snapshot, start, end, algorithm))
+        thread.daemon = True
+        thread.start()
+
+    def _run_search(self, graph: GraphSnapshot, start, end, algorithm: str):
+        try:
+            path = self.find_path(graph, start, end, algorithm)
+            if self.update_callback:
+                if path:
+                    titles = [graph.store.titles[song_id] for song_id in path]
+                    self.update_callback({"path": path}, f"Path found ({len(path)} songs, {self.visited_count} visited):\n" + " → ".join(titles))
+                elif not self._cancelled:
+                    self.update_callback({}, "No path found between the selected songs.")
+        finally:
+            self.is_searching = False
+            if self.finished_callback:
+                self.finished_callback()
+
+    def find_path(self, graph: SongGraph, start, end, algorithm: str = "dfs") -> Optional[List[int]]:
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown path algorithm: {algorithm}")
+        start_id, end_id = graph.resolve(start), graph.resolve(end)
+        graph.flush()
+        self.visited_count = 0
+        self._cancelled = False
+        if start_id not in graph.neighbors or end_id not in graph.neighbors:
+            return None
+        if start_id == end_id:
+            return [start_id]
+        try:
+            return getattr(self, f"_{algorithm}")(graph, start_id, end_id)
+        except SearchCancelled:
+            return None
+
+    def _visit(self, graph: SongGraph, song_id: int):
+        self.visited_count += 1
+        if self._cancelled:
+            raise SearchCancelled()
+        if not self.headless:
+            self.update_callback({"visiting": [song_id]}, "")
+            time.sleep(self.delay)
+
+    @staticmethod
+    def _walk_back(parents: Dict[int, int], node: int) -> List[int]:
+        path = [node]
+        while parents[node] != -1:
+            node = parents[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    def _dfs(self, graph: SongGraph, start: int, end: int) -> Optional[List[int]]:
+        adjacency = graph.neighbors
+        parents = {start: -1}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            self._visit(graph, node)
+            if node == end:
+                return self._walk_back(parents, node)
+            for _, other in reversed(adjacency[node]):
+                if other not in parents and other in adjacency:
+                    parents[other] = node
+                    stack.append(other)
+        return None
+
+    def _bfs(self, graph: SongGraph, start: int, end: int) -> Optional[List[int]]:
+        adjacency = graph.neighbors
+        parents = {start: -1}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            self._visit(graph, node)
+            for _, other in adjacency[node]:
+                if other not in parents and other in adjacency:
+                    parents[other] = node
+                    if other == end:
+                        return self._walk_back(parents, other)
+                    queue.append(other)
+        return None
+
+    def _bidirectional(self, graph: SongGraph, start: int, end: int) -> Optional[List[int]]:
+        forward_edges, backward_edges = graph.neighbors, graph.reverse_edges()
+        forward, backward = {start: -1}, {end: -1}
+        forward_frontier, backward_frontier = [start], [end]
+        while forward_frontier and backward_frontier:
+            expand_forward = len(forward_frontier) <= len(backward_frontier)
+            frontier = forward_frontier if expand_forward else backward_frontier
+            edges = forward_edges if expand_forward else backward_edges
+            seen, other_seen = (forward, backward) if expand_forward else (backward, forward)
+            next_frontier = []
+            for node in frontier:
+                self._visit(graph, node)
+                for _, other in edges.get(node, ()):
+                    if other in seen or other not in forward_edges:
+                        continue
+                    seen[other] = node
+                    if other in other_seen:
+                        head = self._walk_back(forward, other)
+                        tail = self._walk_back(backward, other)
+                        return head + tail[::-1][1:]
+                    next_frontier.append(other)
+            if expand_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+    def _dijkstra(self, graph: SongGraph, start: int, end: int) -> Optional[List[int]]:
+        return self._best_first(graph, start, end, lambda node: 0.0)
+
+    def _astar(self, graph: SongGraph, start: int, end: int) -> Optional[List[int]]:
+        durations = graph.store.durations
+        target = durations[end]
+        window = graph.duration_window
+        return self._best_first(graph, start, end, lambda node: min(1.0, abs(durations[node] - target) / window))
+
+    def _best_first(self, graph: SongGraph, start: int, end: int, heuristic: Callable[[int], float]) -> Optional[List[int]]:
+        adjacency = graph.neighbors
+        costs = {start: 0.0}
+        parents = {start: -1}
+        heap = [(heuristic(start), start)]
+        done = set()
+        while heap:
+            _, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            self._visit(graph, node)
+            if node == end:
+                return self._walk_back(parents, node)
+            base = costs[node]
+            for score, other in adjacency[node]:
+                if other in done or other not in adjacency:
+                    continue
+                cost = base + max(MAX_EDGE_SCORE - score, MIN_EDGE_COST)
+                if cost < costs.get(other, float("inf")):
+                    costs[other] = cost
+                    parents[other] = node
+                    heapq.heappush(heap, (cost + heuristic(other), other))
+        return None
@@ -1,11 +1,35 @@
 import os
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-import pygame
-from core import MusicPlayer, SortingManager, Song, LinkedList, DFSManager
-from typing import List
+from core import MusicPlayer, SortingManager, Song, LinkedList
+from graph import DFSManager
+from metrics import metrics, SamplingProfiler
+from concurrent.futures import Future
+from typing import Callable, List
+
+PATH_ALGORITHMS = {"DFS": "dfs", "BFS": "bfs", "Bidirectional BFS": "bidirectional", "Dijkstra": "dijkstra", "A*": "astar"}
+
+def tk_owner(root) -> Callable[[Callable], Future]:
+    # Runs work on the Tk thread, which owns the player; background jobs and the control server submit through it.
+    def submit(work: Callable) -> Future:
+        future = Future()
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(work())
+                except BaseException as e:
+                    future.set_exception(e)
+        root.after(0, run)
+        return future
+    return submit
 
 class AddSongDialog(simpledialog.Dialog):
+    def __init__(self, parent, filename=None, title_hint=None, artist_hint=None):
+        self.filename = filename; self.title_hint = title_hint; self.artist_hint = artist_hint
+        super().__init__(parent, "Add Song")
+
     def body(self, master):
         tk.Label(master, text="Title:").grid(row=0, sticky='w');
         tk.Label(master, text="Artist:").grid(row=1, sticky='w');
@@ -18,14 +42,184 @@ class AddSongDialog(simpledialog.Dialog):
         self.title_entry.grid(row=0, column=1);
         self.artist_entry.grid(row=1, column=1);
         self.mood_menu.grid(row=2, column=1);
-        if hasattr(self, 'filename'):
+        if self.title_hint:
+            self.title_entry.insert(0, self.title_hint);
+        elif self.filename:
             base = os.path.basename(self.filename);
             self.title_entry.insert(0, os.path.splitext(base)[0]);
+        if self.artist_hint:
+            self.artist_entry.insert(0, self.artist_hint);
         return self.title_entry;
 
     def apply(self):
         self.result = {"title": self.title_entry.get(), "artist": self.artist_entry.get(), "mood": self.mood_var.get()}
 
+class VirtualSongTable:
+    OVERSCAN = 5
+
+    def __init__(self, parent, row_height: int = 30):
+        self.tree = ttk.Treeview(parent, columns=('Title', 'Artist', 'Mood', 'Duration'), show='headings', selectmode="browse")
+        self.tree.heading('Title', text='Title'); self.tree.column('Title', width=300)
+        self.tree.heading('Artist', text='Artist'); self.tree.column('Artist', width=200)
+        self.tree.heading('Mood', text='Mood'); self.tree.column('Mood', width=100, anchor=tk.CENTER)
+        self.tree.heading('Duration', text='Duration'); self.tree.column('Duration', width=100, anchor=tk.E)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview); self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.row_height = row_height
+        self.songs = (); self.offset = 0; self.visible_rows = 20
+        self.window_ids: List[str] = []; self.window_positions = {}; self.row_tags = {}
+        self.position_tags = {}; self.id_tags = {}
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_units(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_units(-3)); self.tree.bind('<Button-5>', lambda e: self.scroll_units(3))
+
+    def __len__(self): return len(self.songs)
+
+    def set_songs(self, songs):
+        self.songs = songs; self.offset = 0; self.position_tags = {}; self.id_tags = {}
+        self.refresh()
+
+    def song_at(self, position): return self.songs[position]
+
+    def selected_id(self):
+        selection = self.tree.selection()
+        return int(selection[0].split(':')[0]) if selection else None
+
+    def selected_position(self):
+        selection = self.tree.selection()
+        return self.window_positions.get(selection[0]) if selection else None
+
+    def on_resize(self, event):
+        rows = max(1, (event.height - self.row_height) // self.row_height)
+        if rows != self.visible_rows: self.visible_rows = rows; self.refresh()
+
+    def scroll_units(self, units): self.scroll_to(self.offset + units)
+
+    def yview(self, *args):
+        if args[0] == 'moveto': self.scroll_to(int(float(args[1]) * len(self.songs)))
+        elif args[0] == 'scroll': self.scroll_to(self.offset + int(args[1]) * (self.visible_rows if args[2] == 'pages' else 1))
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.songs) - self.visible_rows))
+        if offset != self.offset: self.offset = offset; self.refresh()
+
+    def _ensure_list(self):
+        if not isinstance(self.songs, list): self.songs = list(self.songs)
+
+    def swap(self, i, j):
+        self._ensure_list(); self.songs[i], self.songs[j] = self.songs[j], self.songs[i]
+
+    def move_row(self, i, j):
+        self._ensure_list(); self.songs.insert(j, self.songs.pop(i))
+
+    def set_position_tags(self, tags): self.position_tags = tags
+    def set_id_tags(self, tags): self.id_tags = tags
+
+    @metrics.timed("gui.table_refresh")
+    def refresh(self):
+        start = self.offset; window = self.songs[start:start + self.visible_rows + self.OVERSCAN]
+        new_ids = []; seen = {}
+        for song in window:
+            base = str(song.id); count = seen.get(base, 0); seen[base] = count + 1
+            new_ids.append(base if count == 0 else f"{base}:{count}")
+        new_set = set(new_ids)
+        removed = [item_id for item_id in self.window_ids if item_id not in new_set]
+        if removed:
+            self.tree.delete(*removed)
+            for item_id in removed: self.row_tags.pop(item_id, None)
+        current = [item_id for item_id in self.window_ids if item_id in new_set]
+        for index, (item_id, song) in enumerate(zip(new_ids, window)):
+            tag = self.position_tags.get(start + index) or self.id_tags.get(song.id); tags = (tag,) if tag else ()
+            if item_id in self.row_tags:
+                if self.row_tags[item_id] != tags: self.tree.item(item_id, tags=tags); self.row_tags[item_id] = tags
+            else:
+                duration_str = f"{int(song.duration // 60)}:{int(song.duration % 60):02d}"
+                self.tree.insert('', tk.END, iid=item_id, text=song.title, values=(song.title, song.artist, song.mood, duration_str), tags=tags)
+                self.row_tags[item_id] = tags; current.append(item_id)
+        for index, item_id in enumerate(new_ids):
+            if current[index] != item_id:
+                self.tree.move(item_id, '', index); current.remove(item_id); current.insert(index, item_id)
+        self.window_ids = new_ids
+        self.window_positions = {item_id: start + index for index, item_id in enumerate(new_ids)}
+        total = len(self.songs)
+        self.scrollbar.set(start / total if total else 0, min(1, (start + self.visible_rows) / total) if total else 1)
+
+class SortAnimator:
+    HIGHLIGHT_TAGS = {"compare": "compare", "swap": "swap", "move": "swap", "min": "min"}
+
+    def __init__(self, table: VirtualSongTable, run, on_frame=None, fps: int = 30):
+        self.table = table; self.run = run; self.on_frame = on_frame
+        self.frame_ms = max(1, 1000 // fps)
+        self._job = None
+
+    def start(self): self._job = self.table.tree.after(self.frame_ms, self.tick)
+
+    def stop(self):
+        if self._job: self.table.tree.after_cancel(self._job); self._job = None
+
+    def step(self):
+        if self.run.paused: self.apply(self.run.step(1))
+
+    def tick(self):
+        self.apply(self.run.next_frame())
+        if self.run.finished: self.table.set_position_tags({}); self.table.refresh(); self._job = None
+        else: self._job = self.table.tree.after(self.frame_ms, self.tick)
+
+    def apply(self, events):
+        if not events: return
+        last = None
+        for event in events:
+            if event[0] == "swap": self.table.swap(event[1], event[2])
+            elif event[0] == "move": self.table.move_row(event[1], event[2])
+            last = event
+        tag = self.HIGHLIGHT_TAGS[last[0]]
+        self.table.set_position_tags({position: tag for position in last[1:]})
+        self.table.refresh()
+        if self.on_frame: self.on_frame(self.run)
+
+class StatsPanel(tk.Toplevel):
+    def __init__(self, parent, refresh_ms: int = 1000):
+        super().__init__(parent)
+        self.title("VibeTune Stats"); self.geometry("640x520"); self.refresh_ms = refresh_ms
+        self.profiler = SamplingProfiler(thread_ids=[threading.get_ident()])
+        self.table = ttk.Treeview(self, columns=('Count', 'p50', 'p99', 'Max'), selectmode="none"); self.table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.table.heading('#0', text='Metric'); self.table.column('#0', width=220)
+        for column in ('Count', 'p50', 'p99', 'Max'): self.table.heading(column, text=column); self.table.column(column, width=90, anchor=tk.E)
+        self.profile_text = tk.Text(self, height=8, font=("Consolas", 9)); self.profile_text.pack(fill=tk.X, padx=5)
+        buttons = tk.Frame(self); buttons.pack(fill=tk.X, padx=5, pady=5)
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        tk.Checkbutton(buttons, text="Collect", variable=self.enabled_var, command=lambda: setattr(metrics, "enabled", self.enabled_var.get())).pack(side=tk.LEFT)
+        self.profile_button = tk.Button(buttons, text="Start Profiler", command=self.toggle_profiler); self.profile_button.pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Reset", command=metrics.reset).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Export Prometheus", command=lambda: self.export(metrics.to_prometheus, ".prom")).pack(side=tk.RIGHT)
+        tk.Button(buttons, text="Export JSON", command=lambda: self.export(metrics.to_json, ".json")).pack(side=tk.RIGHT, padx=5)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        self.table.delete(*self.table.get_children())
+        for name, summary in sorted(snapshot["histograms"].items()):
+            self.table.insert('', tk.END, text=name, values=(summary["count"], f"{summary['p50'] * 1000:.2f}ms", f"{summary['p99'] * 1000:.2f}ms", f"{summary['max'] * 1000:.2f}ms"))
+        for name, value in sorted(snapshot["counters"].items()):
+            self.table.insert('', tk.END, text=name, values=(f"{value:g}", "", "", ""))
+        if self.profiler.running:
+            self.profile_text.delete("1.0", tk.END)
+            self.profile_text.insert(tk.END, "\n".join(f"{hits:>6}  {location}" for location, hits in self.profiler.top()))
+        self._job = self.after(self.refresh_ms, self.refresh)
+
+    def toggle_profiler(self):
+        if self.profiler.running: self.profiler.stop(); self.profile_button.config(text="Start Profiler")
+        else: self.profiler.samples.clear(); self.profiler.start(); self.profile_button.config(text="Stop Profiler")
+
+    def export(self, render, extension):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=extension)
+        if path:
+            with open(path, "w", encoding="utf-8") as f: f.write(render())
+
+    def close(self):
+        self.after_cancel(self._job); self.profiler.stop(); self.destroy()
+
 class VibeTuneApp:
     def __init__(self, root):
         self.root = root
@@ -34,11 +228,12 @@ class VibeTuneApp:
         self.root.configure(bg='#f8f9fa')
         
         self.music_player = MusicPlayer()
+        self.owner = tk_owner(self.root)
         self.sorting_manager = SortingManager(
-            update_callback=self.schedule_tree_update,
-            stats_callback=self.schedule_stats_update,
+            stats_callback=self.update_stats_labels,
             finished_callback=self.on_sort_finished
         )
+        self.sort_animator = None
         self.dfs_manager = DFSManager(
             update_callback=self.schedule_tree_update_dfs,
             finished_callback=self.on_dfs_finished
@@ -46,12 +241,29 @@ class VibeTuneApp:
         self.current_view = "Library"
         self.current_view_name = "All"
         self.displayed_songs: LinkedList = LinkedList()
+        self.recommendation_ids: List[int] = []
+        self.dfs_song_ids: List[int] = []
+        self.stats_panel = None
+        self.search_var = tk.StringVar()
+        self._search_job = None
+        self._playback_job = None
+        self.pump_interval_ms = 50
+        self.progress_interval_ms = 250
+        self._last_progress = 0.0
         self.sort_algorithm_var = tk.StringVar(value="Bubble Sort")
+        self.path_algorithm_var = tk.StringVar(value="DFS")
         
         self.setup_ui()
         self.load_songs_by_mood("All")
         self.update_playlist_listbox()
-        self.update_playback_progress()
+        self.update_player_info()
+        self.control_server = None
+        if os.environ.get("VIBETUNE_CONTROL_PORT"):
+            from server import ControlServer
+            self.control_server = ControlServer(self.music_player, port=int(os.environ["VIBETUNE_CONTROL_PORT"]),
+                                                owner=self.owner, on_write=self.on_remote_write)
+            self.control_server.start_in_thread()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         main_frame = tk.Frame(self.root, bg='#f8f9fa')
@@ -65,15 +277,23 @@ class VibeTuneApp:
 
     def setup_sidebar(self, parent):
         tk.Label(parent, text="Library", font=("Inter", 16, "bold"), bg='#e9ecef', fg='#343a40').pack(pady=10, padx=10, anchor='w');
+        search_entry = tk.Entry(parent, textvariable=self.search_var, font=("Inter", 11), relief=tk.FLAT); search_entry.pack(fill=tk.X, padx=10, pady=(0, 8))
+        search_entry.bind('<KeyRelease>', self.schedule_search); search_entry.bind('<Escape>', lambda e: self.search_var.set("") or self.schedule_search())
         moods = ["All", "Happy", "Energetic", "Sad", "Calm"]
         for mood in moods:
             btn = tk.Button(parent, text=mood, font=("Inter", 11), bg='#e9ecef', relief=tk.FLAT, anchor='w', command=lambda m=mood: self.load_songs_by_mood(m))
             btn.pack(fill=tk.X, padx=15, pady=2);
-        tk.Button(parent, text="➕ Add Song File", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.add_song_dialog).pack(fill=tk.X, padx=10, pady=10)
+        tk.Button(parent, text="➕ Add Song File", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.add_song_dialog).pack(fill=tk.X, padx=10, pady=(10, 2))
+        self.import_button = tk.Button(parent, text="📁 Import Folder", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.import_folder_dialog); self.import_button.pack(fill=tk.X, padx=10, pady=2)
+        self.analyze_button = tk.Button(parent, text="🎚 Auto-tag Moods", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.auto_tag_moods); self.analyze_button.pack(fill=tk.X, padx=10, pady=2)
+        self.dedup_button = tk.Button(parent, text="🧬 Find Duplicates", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.find_duplicates); self.dedup_button.pack(fill=tk.X, padx=10, pady=2)
+        self.import_status_label = tk.Label(parent, text="", font=("Inter", 9), bg='#e9ecef', fg='#6c757d'); self.import_status_label.pack(fill=tk.X, padx=10)
+        tk.Button(parent, text="📊 Stats", font=("Inter", 10, "bold"), bg='#d3d9df', relief=tk.FLAT, command=self.show_stats).pack(fill=tk.X, padx=10, pady=2)
         playlist_header = tk.Frame(parent, bg='#e9ecef'); playlist_header.pack(fill=tk.X, pady=(20, 5), padx=10)
         tk.Label(playlist_header, text="Playlists", font=("Inter", 16, "bold"), bg='#e9ecef', fg='#343a40').pack(side=tk.LEFT)
         tk.Button(playlist_header, text="🗑️", font=("Inter", 12), relief=tk.FLAT, bg='#e9ecef', command=self.delete_playlist).pack(side=tk.RIGHT)
         tk.Button(playlist_header, text="➕", font=("Inter", 12, "bold"), relief=tk.FLAT, bg='#e9ecef', command=self.create_playlist_dialog).pack(side=tk.RIGHT)
+        tk.Button(playlist_header, text="✨", font=("Inter", 12), relief=tk.FLAT, bg='#e9ecef', command=self.generate_playlist_dialog).pack(side=tk.RIGHT)
         playlist_frame = tk.Frame(parent, bg='white'); playlist_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         self.playlist_listbox = tk.Listbox(playlist_frame, font=("Inter", 11), relief=tk.FLAT, highlightthickness=0, selectbackground='#ff5500')
         self.playlist_listbox.pack(fill=tk.BOTH, expand=True)
@@ -91,8 +311,9 @@ class VibeTuneApp:
         self.dfs_start_combo = ttk.Combobox(dfs_frame, state="readonly", width=20); self.dfs_start_combo.grid(row=0, column=1, padx=5)
         tk.Label(dfs_frame, text="End:", font=("Inter", 9), bg='#f8f9fa').grid(row=1, column=0)
         self.dfs_end_combo = ttk.Combobox(dfs_frame, state="readonly", width=20); self.dfs_end_combo.grid(row=1, column=1, padx=5)
+        self.path_algorithm_combo = ttk.Combobox(dfs_frame, textvariable=self.path_algorithm_var, values=list(PATH_ALGORITHMS), state="readonly", width=16); self.path_algorithm_combo.grid(row=0, column=2, rowspan=2, padx=5)
         self.dfs_button = tk.Button(dfs_frame, text="Visualize DFS", command=self.visualize_dfs, bg='#17a2b8', fg='white', font=("Inter", 10, "bold"), relief=tk.FLAT, padx=10, pady=5)
-        self.dfs_button.grid(row=0, column=2, rowspan=2, padx=5)
+        self.dfs_button.grid(row=0, column=3, rowspan=2, padx=5)
 
         sort_frame = tk.Frame(algo_frame, bg='#f8f9fa'); sort_frame.pack(pady=5)
         stats_frame = tk.Frame(sort_frame, bg='#e9ecef', bd=1, relief=tk.SUNKEN); stats_frame.pack(side=tk.LEFT, padx=10, ipady=2, ipadx=5)
@@ -100,22 +321,20 @@ class VibeTuneApp:
         self.swaps_label = tk.Label(stats_frame, text="Swaps: 0", font=("Inter", 9), bg='#e9ecef'); self.swaps_label.pack(anchor='w')
         sort_algo_dropdown = ttk.Combobox(sort_frame, textvariable=self.sort_algorithm_var, values=["Bubble Sort", "Selection Sort", "Insertion Sort"], state="readonly", width=15); sort_algo_dropdown.pack(side=tk.LEFT)
         self.sort_button = tk.Button(sort_frame, text="Visualize Sort", command=self.visualize_sort, bg='#ff5500', fg='white', font=("Inter", 10, "bold"), relief=tk.FLAT, padx=10, pady=5); self.sort_button.pack(side=tk.LEFT, padx=5)
+        self.sort_pause_button = tk.Button(sort_frame, text="⏸", command=self.toggle_sort_pause, font=("Inter", 10), relief=tk.FLAT, state=tk.DISABLED); self.sort_pause_button.pack(side=tk.LEFT)
+        self.sort_step_button = tk.Button(sort_frame, text="Step", command=self.step_sort, font=("Inter", 10), relief=tk.FLAT, state=tk.DISABLED); self.sort_step_button.pack(side=tk.LEFT)
+        tk.Label(sort_frame, text="Speed", font=("Inter", 9), bg='#f8f9fa').pack(side=tk.LEFT, padx=(5, 0))
+        self.sort_speed_scale = tk.Scale(sort_frame, from_=1, to=500, orient=tk.HORIZONTAL, showvalue=False, length=100, bg='#f8f9fa', highlightthickness=0, command=self.set_sort_speed); self.sort_speed_scale.pack(side=tk.LEFT)
 
         tree_frame = tk.Frame(parent); tree_frame.grid(row=1, column=0, sticky='nsew')
         style = ttk.Style(); style.theme_use("clam")
         style.configure("Treeview", background="white", rowheight=30, fieldbackground="white", font=("Inter", 10))
         style.configure("Treeview.Heading", font=("Inter", 10, "bold"), background="#e9ecef", relief="flat")
         style.map('Treeview', background=[('selected', '#fed7aa')])
-        self.song_tree = ttk.Treeview(tree_frame, columns=('Artist', 'Mood', 'Duration'), show='headings', selectmode="browse")
-        self.song_tree.heading('#0', text='Title'); self.song_tree.column('#0', width=300)
-        self.song_tree.heading('Artist', text='Artist'); self.song_tree.column('Artist', width=200)
-        self.song_tree.heading('Mood', text='Mood'); self.song_tree.column('Mood', width=100, anchor=tk.CENTER)
-        self.song_tree.heading('Duration', text='Duration'); self.song_tree.column('Duration', width=100, anchor=tk.E)
+        self.song_table = VirtualSongTable(tree_frame); self.song_tree = self.song_table.tree
         self.song_tree.tag_configure('compare', background='#fff3cd'); self.song_tree.tag_configure('swap', background='#f5c6cb'); self.song_tree.tag_configure('min', background='#cce5ff')
         self.song_tree.tag_configure('visiting_dfs', background='#f0ad4e'); self.song_tree.tag_configure('path_dfs', background='#17a2b8', foreground='white')
         self.song_tree.bind('<Double-1>', self.play_selected_song); self.song_tree.bind('<Button-3>', self.show_context_menu)
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.song_tree.yview); vsb.pack(side='right', fill='y'); self.song_tree.configure(yscrollcommand=vsb.set)
-        self.song_tree.pack(side='left', fill='both', expand=True)
     
     def setup_player_controls(self, parent):
         parent.grid_columnconfigure(2, weight=1)
@@ -127,6 +346,8 @@ class VibeTuneApp:
         tk.Button(button_controls, text="⏮", command=self.prev_song_action, font=("Arial", 16), relief=tk.FLAT, bg='white').pack(side=tk.LEFT, padx=10)
         self.play_pause_btn = tk.Button(button_controls, text="▶", command=self.toggle_play_pause, font=("Arial", 20, "bold"), relief=tk.FLAT, bg='#ff5500', fg='white', padx=10, width=3); self.play_pause_btn.pack(side=tk.LEFT, padx=10)
         tk.Button(button_controls, text="⏭", command=self.next_song_action, font=("Arial", 16), relief=tk.FLAT, bg='white').pack(side=tk.LEFT, padx=10)
+        self.shuffle_btn = tk.Button(button_controls, text="🔀", command=self.toggle_shuffle, font=("Arial", 12), relief=tk.FLAT, bg='white'); self.shuffle_btn.pack(side=tk.LEFT, padx=5)
+        self.repeat_btn = tk.Button(button_controls, text="🔁", command=self.cycle_repeat, font=("Arial", 12), relief=tk.FLAT, bg='white'); self.repeat_btn.pack(side=tk.LEFT, padx=5)
         progress_controls = tk.Frame(center_frame, bg='white', width=400); progress_controls.pack(fill=tk.X, padx=10, pady=5)
         self.current_time_label = tk.Label(progress_controls, text="0:00", font=("Inter", 9), bg='white'); self.current_time_label.pack(side=tk.LEFT)
         self.progress_bar = ttk.Scale(progress_controls, from_=0, to=100); self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
@@ -143,7 +364,8 @@ class VibeTuneApp:
     def add_song_dialog(self):
         filepath = filedialog.askopenfilename(filetypes=[("Audio Files", "*.mp3 *.wav")])
         if not filepath: return
-        dialog = AddSongDialog(self.root, filename=filepath)
+        info = self.music_player.metadata.probe(filepath)
+        dialog = AddSongDialog(self.root, filename=filepath, title_hint=info and info.title, artist_hint=info and info.artist)
         if dialog.result:
             details = dialog.result
             if not details['title'] or not details['artist']:
@@ -153,12 +375,82 @@ class VibeTuneApp:
                 messagebox.showinfo("Success", f"Added '{song.title}' to the library.")
                 self.load_songs_by_mood(self.current_view_name if self.current_view == "Library" else "All")
 
+    def import_folder_dialog(self):
+        folder = filedialog.askdirectory()
+        if not folder: return
+        self.import_button.config(state=tk.DISABLED); self.import_status_label.config(text="Scanning...")
+        def progress(done, total): self.root.after(0, lambda: self.import_status_label.config(text=f"Imported {done}/{total}"))
+        def run():
+            report = self.music_player.import_directory(folder, progress_callback=progress, owner=self.owner)
+            self.root.after(0, self.on_import_finished, report)
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_import_finished(self, report):
+        self.import_button.config(state=tk.NORMAL)
+        self.import_status_label.config(text=f"+{report.added} ~{report.updated} -{report.removed} in {report.elapsed:.1f}s")
+        if self.current_view == "Library": self.load_songs_by_mood(self.current_view_name)
+        elif self.current_view == "Search": self.run_search()
+
+    def auto_tag_moods(self):
+        self.analyze_button.config(state=tk.DISABLED); self.import_status_label.config(text="Analyzing...")
+        def progress(done, total): self.root.after(0, lambda: self.import_status_label.config(text=f"Analyzed {done}/{total}"))
+        def run():
+            report = self.music_player.auto_tag_moods(progress_callback=progress, owner=self.owner)
+            self.root.after(0, self.on_auto_tag_finished, report)
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_auto_tag_finished(self, report):
+        self.analyze_button.config(state=tk.NORMAL)
+        if report.error: messagebox.showerror("Auto-tag Moods", report.error)
+        self.import_status_label.config(text=f"Tagged {report.tagged} ({report.hours_per_minute:.1f} h/min)" + (f", {len(report.failed)} failed" if report.failed else ""))
+        if self.current_view == "Library": self.load_songs_by_mood(self.current_view_name)
+        elif self.current_view == "Search": self.run_search()
+
+    def find_duplicates(self):
+        self.dedup_button.config(state=tk.DISABLED); self.import_status_label.config(text="Fingerprinting...")
+        def run():
+            report = self.music_player.find_duplicates(owner=self.owner)
+            self.root.after(0, self.on_duplicates_found, report)
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_duplicates_found(self, report):
+        self.dedup_button.config(state=tk.NORMAL)
+        copies = sum(len(group) - 1 for group in report.groups)
+        self.import_status_label.config(text=f"{copies} duplicates, read {report.read_fraction:.1%} of {report.total_bytes / 2 ** 30:.1f} GB")
+        if not copies: messagebox.showinfo("Duplicates", "No duplicate audio files found."); return
+        examples = "\n".join(f"• {group[0].title} ×{len(group)}" for group in report.groups[:8])
+        if not messagebox.askyesno("Duplicates", f"Found {copies} duplicate copies in {len(report.groups)} groups:\n{examples}\n\nMerge them and point playlists at one copy?"): return
+        merged = self.music_player.merge_duplicates(report.groups)
+        self.import_status_label.config(text=f"Merged {merged} duplicates")
+        self.update_playlist_listbox()
+        if self.current_view == "Library": self.load_songs_by_mood(self.current_view_name)
+        elif self.current_view == "Search": self.run_search()
+        elif self.current_view == "Playlist" and self.current_view_name in self.music_player.playlists:
+            self.displayed_songs = self.music_player.open_playlist(self.current_view_name); self.music_player.set_view(self.displayed_songs)
+            self.update_song_tree(self.displayed_songs.to_python_list(), {})
+
+    def show_stats(self):
+        if self.stats_panel is not None and self.stats_panel.winfo_exists(): self.stats_panel.lift(); return
+        self.stats_panel = StatsPanel(self.root)
+
     def create_playlist_dialog(self):
         name = simpledialog.askstring("New Playlist", "Enter playlist name:")
         if name:
             if self.music_player.create_playlist(name): self.update_playlist_listbox()
             else: messagebox.showerror("Error", "A playlist with that name already exists.")
     
+    def generate_playlist_dialog(self):
+        mood = self.current_view_name if self.current_view == "Library" and self.current_view_name != "All" else None
+        minutes = simpledialog.askinteger("Auto Playlist", f"Target length in minutes ({mood or 'all moods'}):", initialvalue=60, minvalue=1, maxvalue=24 * 60)
+        if not minutes: return
+        name = simpledialog.askstring("Auto Playlist", "Playlist name:", initialvalue=f"{mood or 'Mixed'} {minutes} min")
+        if not name: return
+        if not self.music_player.create_playlist(name): messagebox.showerror("Error", "A playlist with that name already exists."); return
+        songs = self.music_player.generate_playlist(minutes * 60, moods=[mood] if mood else None)
+        self.music_player.add_songs_to_playlist(name, songs); self.update_playlist_listbox()
+        total = sum(song.duration for song in songs)
+        messagebox.showinfo("Auto Playlist", f"'{name}': {len(songs)} songs, {int(total // 60)}:{int(total % 60):02d}")
+
     def delete_playlist(self):
         selected = self.playlist_listbox.curselection()
         if not selected: messagebox.showwarning("No Selection", "Please select a playlist to delete."); return
@@ -175,10 +467,11 @@ class VibeTuneApp:
         selected = self.playlist_listbox.curselection()
         if not selected: return;
         playlist_name = self.playlist_listbox.get(selected[0])
+        self.cancel_sort()
         self.current_view = "Playlist"; self.current_view_name = playlist_name
         self.playlist_title_label.config(text=f"Playlist: {playlist_name}")
         self.sort_button.config(state=tk.DISABLED);
-        self.displayed_songs = self.music_player.playlists[playlist_name].songs
+        self.displayed_songs = self.music_player.open_playlist(playlist_name); self.music_player.set_view(self.displayed_songs)
         self.update_song_tree(self.displayed_songs.to_python_list(), {})
 
     def show_context_menu(self, event):
@@ -189,119 +482,183 @@ class VibeTuneApp:
         if not self.music_player.playlists: add_to_playlist_menu.add_command(label="No playlists available", state=tk.DISABLED)
         else:
             for name in self.music_player.playlists.keys(): add_to_playlist_menu.add_command(label=name, command=lambda n=name: self.add_selected_to_playlist(n))
+        context_menu.add_command(label="Play Next", command=lambda: self.queue_selected(self.music_player.play_next))
+        context_menu.add_command(label="Add to Queue", command=lambda: self.queue_selected(self.music_player.enqueue))
         context_menu.add_cascade(label="Add to Playlist", menu=add_to_playlist_menu)
         context_menu.post(event.x_root, event.y_root)
 
+    def queue_selected(self, action):
+        song_id = self.song_table.selected_id()
+        if song_id is None: return
+        song = self.music_player.song_by_id(song_id)
+        if song: action(song)
+
     def add_selected_to_playlist(self, playlist_name):
-        selected_item = self.song_tree.selection()
-        if not selected_item: return
-        song_title = self.song_tree.item(selected_item[0])['text']
-        song_to_add = next((s for s in self.displayed_songs if s.title == song_title), None);
+        song_id = self.song_table.selected_id()
+        if song_id is None: return
+        song_to_add = self.music_player.song_by_id(song_id)
         if song_to_add:
             if not self.music_player.add_song_to_playlist(playlist_name, song_to_add): messagebox.showinfo("Already Exists", f"'{song_to_add.title}' is already in this playlist.")
 
     def load_songs_by_mood(self, mood):
+        self.cancel_sort()
         self.current_view = "Library"; self.current_view_name = mood
         self.playlist_title_label.config(text=f"{mood} Vibes"); self.sort_button.config(state=tk.NORMAL); self.playlist_listbox.selection_clear(0, tk.END)
-        self.displayed_songs = self.music_player.get_songs_by_mood(mood)
+        self.displayed_songs = self.music_player.get_songs_by_mood(mood); self.music_player.set_view(self.displayed_songs)
         self.update_song_tree(self.displayed_songs.to_python_list(), {})
         self.populate_dfs_combos()
 
+    def schedule_search(self, event=None, delay_ms: int = 150):
+        if self._search_job is not None: self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(delay_ms, self.run_search)
+
+    def run_search(self):
+        self._search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            if self.current_view == "Search": self.load_songs_by_mood("All")
+            return
+        self.cancel_sort()
+        self.current_view = "Search"; self.current_view_name = query
+        self.playlist_title_label.config(text=f"Search: {query}"); self.sort_button.config(state=tk.DISABLED); self.playlist_listbox.selection_clear(0, tk.END)
+        self.displayed_songs = self.music_player.search(query); self.music_player.set_view(self.displayed_songs)
+        self.update_song_tree(self.displayed_songs.to_python_list(), {})
+
     def populate_dfs_combos(self):
-        song_titles = [song.title for song in self.music_player.music_library]
-        self.dfs_start_combo['values'] = song_titles
-        self.dfs_end_combo['values'] = song_titles
-        if song_titles:
-            self.dfs_start_combo.current(0); self.dfs_end_combo.current(len(song_titles) - 1)
+        # Combos are keyed by position in dfs_song_ids; titles alone are not unique.
+        songs = self.music_player.music_library
+        self.dfs_song_ids = list(songs.ids)
+        labels = [f"{song.title} — {song.artist}" for song in songs]
+        self.dfs_start_combo['values'] = labels
+        self.dfs_end_combo['values'] = labels
+        if labels:
+            self.dfs_start_combo.current(0); self.dfs_end_combo.current(len(labels) - 1)
 
     def visualize_dfs(self):
-        start_title = self.dfs_start_combo.get(); end_title = self.dfs_end_combo.get()
-        if not start_title or not end_title: messagebox.showerror("Error", "Please select a start and end song."); return
-        if start_title == end_title: messagebox.showinfo("Info", "Start and end songs cannot be the same."); return
+        start, end = self.dfs_start_combo.current(), self.dfs_end_combo.current()
+        if start < 0 or end < 0: messagebox.showerror("Error", "Please select a start and end song."); return
+        start_id, end_id = self.dfs_song_ids[start], self.dfs_song_ids[end]
+        if start_id == end_id: messagebox.showinfo("Info", "Start and end songs cannot be the same."); return
         self.dfs_button.config(state=tk.DISABLED, text="Exploring...")
         self.load_songs_by_mood("All")
-        self.dfs_manager.find_path_in_thread(self.music_player.song_graph, start_title, end_title)
+        self.dfs_manager.find_path_in_thread(self.music_player.song_graph, start_id, end_id, PATH_ALGORITHMS[self.path_algorithm_var.get()])
 
     def schedule_tree_update_dfs(self, highlights, message): self.root.after(0, self.update_song_tree_dfs, highlights, message)
     def on_dfs_finished(self): self.root.after(0, lambda: self.dfs_button.config(state=tk.NORMAL, text="Visualize DFS"))
 
     def update_song_tree_dfs(self, highlights, message):
-        for item_id in self.song_tree.get_children(): self.song_tree.item(item_id, tags=())
-        tree_items = {self.song_tree.item(item_id)['text']: item_id for item_id in self.song_tree.get_children()}
-        if 'path' in highlights:
-            for title in highlights['path']:
-                if title in tree_items: self.song_tree.item(tree_items[title], tags=('path_dfs',))
-        if 'visiting' in highlights:
-            for title in highlights['visiting']:
-                if title in tree_items: self.song_tree.item(tree_items[title], tags=('visiting_dfs',))
-        if message: messagebox.showinfo("Depth-First Search", message)
+        tags = {song_id: 'path_dfs' for song_id in highlights.get('path', ())}
+        tags.update((song_id, 'visiting_dfs') for song_id in highlights.get('visiting', ()))
+        self.song_table.set_id_tags(tags); self.song_table.refresh()
+        if message: messagebox.showinfo("Path Search", message)
 
     def visualize_sort(self):
         if self.current_view != "Library": messagebox.showinfo("Info", "Sorting is only available in the Library view."); return
         if self.sorting_manager.is_sorting: return
+        run = self.sorting_manager.start(self.sort_algorithm_var.get(), self.displayed_songs.to_python_list())
+        if run is None: return
         self.sort_button.config(state=tk.DISABLED, text="Sorting..."); self.update_stats_labels(0, 0)
-        algorithm = self.sort_algorithm_var.get()
-        songs_to_sort = self.displayed_songs.to_python_list()
-        self.sorting_manager.sort_in_thread(algorithm, songs_to_sort)
+        self.sort_pause_button.config(state=tk.NORMAL, text="⏸"); self.sort_step_button.config(state=tk.NORMAL)
+        run.set_speed(self.sort_speed_scale.get())
+        self.sort_animator = SortAnimator(self.song_table, run, on_frame=lambda r: self.update_stats_labels(self.sorting_manager.comparisons, self.sorting_manager.swaps))
+        self.sort_animator.start()
+
+    def toggle_sort_pause(self):
+        if not self.sort_animator: return
+        run = self.sort_animator.run
+        if run.paused: run.resume(); self.sort_pause_button.config(text="⏸")
+        else: run.pause(); self.sort_pause_button.config(text="▶")
+
+    def step_sort(self):
+        if self.sort_animator:
+            if not self.sort_animator.run.paused: self.toggle_sort_pause()
+            self.sort_animator.step()
+
+    def set_sort_speed(self, value):
+        if self.sort_animator: self.sort_animator.run.set_speed(int(float(value)))
     
     def play_selected_song(self, event=None):
-        selected_item = self.song_tree.selection()
-        if not selected_item or self.sorting_manager.is_sorting: return
-        song_title = self.song_tree.item(selected_item[0])['text']
-        song_index = -1; temp_list = list(self.displayed_songs)
-        for i, song in enumerate(temp_list):
-            if song.title == song_title: song_index = i; break
-        if song_index != -1: self.music_player.play_song(self.displayed_songs, song_index); self.update_player_info()
+        song_id = self.song_table.selected_id()
+        if song_id is None or self.sorting_manager.is_sorting: return
+        if self.music_player.play_song_id(song_id): self.update_player_info()
     
     def play_from_recommendation(self, event=None):
         selected_indices = self.recommendation_listbox.curselection()
         if not selected_indices: return
-        selected_title = self.recommendation_listbox.get(selected_indices[0])
-        song_to_play = next((s for s in self.music_player.music_library if s.title == selected_title), None)
+        song_to_play = self.music_player.song_by_id(self.recommendation_ids[selected_indices[0]])
         if song_to_play:
-            temp_playlist = LinkedList(); temp_playlist.append(song_to_play)
-            self.music_player.play_song(temp_playlist, 0); self.update_player_info()
+            self.music_player.play_song([song_to_play], 0); self.update_player_info()
 
     def update_song_tree(self, songs: List[Song], highlights: dict):
-        self.song_tree.delete(*self.song_tree.get_children())
-        for i, song in enumerate(songs):
-            duration_str = f"{int(song.duration // 60)}:{int(song.duration % 60):02d}"; tags=()
-            if 'compare' in highlights and i in highlights['compare']: tags = ('compare',)
-            if 'swap' in highlights and i in highlights['swap']: tags = ('swap',)
-            if 'min' in highlights and i == highlights['min']: tags = ('min',)
-            self.song_tree.insert('', tk.END, text=song.title, values=(song.artist, song.mood, duration_str), tags=tags)
+        self.song_table.set_songs(songs); tags = {}
+        for i in highlights.get('compare', ()): tags[i] = 'compare'
+        for i in highlights.get('swap', ()): tags[i] = 'swap'
+        if 'min' in highlights: tags[highlights['min']] = 'min'
+        if tags: self.song_table.set_position_tags(tags); self.song_table.refresh()
     
-    def schedule_tree_update(self, songs, highlights): self.root.after(0, self.update_song_tree, list(songs), highlights)
-    def schedule_stats_update(self, c, s): self.root.after(0, self.update_stats_labels, c, s)
     def update_stats_labels(self, c, s): self.comparisons_label.config(text=f"Comparisons: {c}"); self.swaps_label.config(text=f"Swaps: {s}")
     
+    def cancel_sort(self):
+        if self.sort_animator and not self.sort_animator.run.finished: self.sort_animator.stop(); self.sort_animator.run.cancel()
+        self.sort_animator = None
+
     def on_sort_finished(self):
-        def re_enable(): self.sort_button.config(state=tk.NORMAL, text="Visualize Sort"); messagebox.showinfo("Sorting Complete", f"Finished: {self.sort_algorithm_var.get()}.")
+        run = self.sort_animator.run if self.sort_animator else None
+        if run and not run.cancelled: self.displayed_songs = run.songs; self.music_player.set_view(run.songs)
+        def re_enable():
+            self.sort_button.config(state=tk.NORMAL, text="Visualize Sort"); self.sort_pause_button.config(state=tk.DISABLED); self.sort_step_button.config(state=tk.DISABLED)
+            if run and not run.cancelled: messagebox.showinfo("Sorting Complete", f"Finished: {self.sort_algorithm_var.get()}.")
         self.root.after(0, re_enable)
     
     def next_song_action(self): self.music_player.next_song(); self.update_player_info()
     def prev_song_action(self): self.music_player.prev_song(); self.update_player_info()
     def toggle_play_pause(self): self.music_player.toggle_play_pause(); self.update_player_info()
+    def toggle_shuffle(self): self.music_player.set_shuffle(not self.music_player.queue.shuffle); self.update_player_info()
+
+    def cycle_repeat(self):
+        modes = {"all": "one", "one": "off", "off": "all"}
+        self.music_player.set_repeat(modes[self.music_player.queue.repeat]); self.update_player_info()
+
+    def on_remote_write(self):
+        self.update_playlist_listbox(); self.update_player_info()
+
+    def on_close(self):
+        if self.stats_panel is not None and self.stats_panel.winfo_exists(): self.stats_panel.close()
+        if self.control_server is not None: self.control_server.stop()
+        self.music_player.close(); self.root.destroy()
     
     def update_player_info(self):
         song=self.music_player.get_current_song()
         self.play_pause_btn.config(text="⏸" if self.music_player.is_playing else "▶")
+        queue = self.music_player.queue
+        self.shuffle_btn.config(bg='#fed7aa' if queue.shuffle else 'white')
+        self.repeat_btn.config(text="🔂" if queue.repeat == "one" else "🔁", bg='white' if queue.repeat == "off" else '#fed7aa')
         if song:
             self.current_song_label.config(text=song.title); self.current_artist_label.config(text=song.artist)
-            self.update_recommendations(song.title)
+            self.update_recommendations(song)
         else:
             self.current_song_label.config(text="No Song Playing"); self.current_artist_label.config(text="Select a song to play")
             self.recommendation_listbox.delete(0, tk.END)
+        self.update_playback_progress(); self.schedule_playback_tick()
     
-    def update_recommendations(self, song_title: str):
+    def update_recommendations(self, song: Song):
         self.recommendation_listbox.delete(0, tk.END)
-        recs = self.music_player.song_graph.get_recommendations(song_title, 4)
-        for song in recs: self.recommendation_listbox.insert(tk.END, song.title)
+        recs = self.music_player.song_graph.get_recommendations(song, 4); self.recommendation_ids = [rec.id for rec in recs]
+        for rec in recs: self.recommendation_listbox.insert(tk.END, rec.title)
 
     def update_playback_progress(self):
         current_time, duration = self.music_player.get_playback_position()
         self.duration_label.config(text=f"{int(duration // 60)}:{int(duration % 60):02d}")
         self.current_time_label.config(text=f"{int(current_time // 60)}:{int(current_time % 60):02d}")
         self.progress_bar.set((current_time / duration) * 100 if duration > 0 else 0)
-        if self.music_player.is_playing and not pygame.mixer.music.get_busy(): self.next_song_action()
-        self.root.after(1000, self.update_playback_progress)
\ No newline at end of file
+        self._last_progress = time.monotonic()
+
+    def schedule_playback_tick(self):
+        if self._playback_job is None and self.music_player.is_playing:
+            self._playback_job = self.root.after(self.pump_interval_ms, self.playback_tick)
+
+    def playback_tick(self):
+        self._playback_job = None
+        if self.music_player.poll_playback(): self.update_player_info()
+        elif time.monotonic() - self._last_progress >= self.progress_interval_ms / 1000: self.update_playback_progress()
+        self.schedule_playback_tick()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from queue import Queue
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Union
+
+from audio import AudioError, NullAudio
+from metrics import metrics
+
+class TrackBuffer:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, path: str) -> Optional[bytes]:
+        data = self._data.get(path)
+        if data is not None:
+            self._data.move_to_end(path)
+        return data
+
+    def put(self, path: str, data: bytes) -> bool:
+        if len(data) > self.max_bytes:
+            return False
+        old = self._data.pop(path, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[path] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+        return True
+
+class PlaybackClock:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._started: Optional[float] = None
+        self._offset = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._started is not None
+
+    def start(self, offset: float = 0.0):
+        self._offset = offset
+        self._started = self._clock()
+
+    def pause(self):
+        if self._started is not None:
+            self._offset += self._clock() - self._started
+            self._started = None
+
+    def resume(self):
+        if self._started is None:
+            self._started = self._clock()
+
+    def stop(self):
+        self._started = None
+        self._offset = 0.0
+
+    def position(self) -> float:
+        if self._started is None:
+            return self._offset
+        return self._offset + self._clock() - self._started
+
+class PlaybackEngine:
+    def __init__(self, audio: NullAudio, prefetch: int = 2, max_bytes: int = 64 * 1024 * 1024,
+                 on_error: Optional[Callable[[str, Exception], None]] = None, missing_ttl: float = 30.0):
+        self.audio = audio
+        self.prefetch = prefetch
+        self.missing_ttl = missing_ttl
+        self.missing: Dict[str, float] = {}
+        self.buffer = TrackBuffer(max_bytes)
+        self.on_error = on_error
+        self.latencies: Deque[float] = deque(maxlen=256)
+        self.current: Optional[str] = None
+        self.queued: Optional[str] = None
+        self._stale_queue = False
+        self._generation = 0
+        self._errors: List[tuple] = []
+        self._lock = threading.Lock()
+        self._commands: Queue = Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def _send(self, command: tuple):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vibetune-playback", daemon=True)
+            self._thread.start()
+        self._commands.put(command)
+
+    def play(self, path: str, upcoming: Sequence[str] = ()):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self.queued = None
+            self._stale_queue = False
+        self._send(("play", generation, path, list(upcoming), time.perf_counter()))
+
+    def set_upcoming(self, upcoming: Sequence[str]):
+        self._send(("upcoming", self._generation, None, list(upcoming), 0.0))
+
+    def stop(self):
+        with self._lock:
+            self._generation += 1
+            self.current = self.queued = None
+        self._send(("stop", self._generation, None, (), 0.0))
+
+    def pause(self):
+        self._send(("pause", self._generation, None, (), 0.0))
+
+    def resume(self):
+        self._send(("resume", self._generation, None, (), 0.0))
+
+    def set_volume(self, volume: float):
+        self.audio.set_volume(volume)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        done = threading.Event()
+        self._send(("sync", 0, done, (), 0.0))
+        return done.wait(timeout)
+
+    def poll(self) -> List[str]:
+        transitions = []
+        with self._lock:
+            errors, self._errors = self._errors, []
+        for generation, path, error in errors:
+            # Reported here, on the polling thread, and only while the failed play is still the latest command.
+            if generation == self._generation:
+                transitions.append("failed")
+                if self.on_error:
+                    self.on_error(path, error)
+        for _ in range(self.audio.ended_events()):
+            with self._lock:
+                if self.queued is not None:
+                    self.current, self.queued = self.queued, None
+                    transitions.append("advanced")
+                    metrics.inc("playback.gapless_switches")
+                elif self._stale_queue:
+                    # The mixer started a track that was queued before the upcoming list changed.
+                    self._stale_queue = False
+                    transitions.append("ended")
+                elif self.current is not None and not self.audio.get_busy():
+                    self.current = None
+                    transitions.append("ended")
+        return transitions
+
+    def is_missing(self, path: str) -> bool:
+        failed_at = self.missing.get(path)
+        return failed_at is not None and time.monotonic() - failed_at < self.missing_ttl
+
+    def switch_latency(self) -> Dict[str, float]:
+        samples = sorted(self.latencies)
+        if not samples:
+            return {"count": 0, "p50": 0.0, "max": 0.0}
+        return {"count": len(samples), "p50": samples[len(samples) // 2], "max": samples[-1]}
+
+    def _run(self):
+        while True:
+            action, generation, path, upcoming, requested = self._commands.get()
+            if action == "sync":
+                path.set()
+                continue
+            if generation != self._generation:
+                continue
+            try:
+                if action == "play":
+                    self._start(generation, path, upcoming, requested)
+                elif action == "upcoming":
+                    self._prepare(generation, upcoming)
+                elif action == "stop":
+                    self.audio.unload()
+                elif action == "pause":
+                    self.audio.pause()
+                elif action == "resume":
+                    self.audio.unpause()
+            except (AudioError, OSError) as e:
+                if isinstance(e, OSError) and path:
+                    self.missing[path] = time.monotonic()
+                if action == "play":
+                    with self._lock:
+                        self._errors.append((generation, path, e))
+
+    def _source(self, path: str) -> Union[io.BytesIO, str]:
+        data = self.buffer.get(path)
+        if data is None:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                self.missing[path] = time.monotonic()
+                raise
+            self.missing.pop(path, None)
+            if not self.buffer.put(path, data):
+                return path
+        return io.BytesIO(data)
+
+    def _start(self, generation: int, path: str, upcoming: List[str], requested: float):
+        source = self._source(path)
+        if generation != self._generation:
+            return
+        self.audio.load(source, os.path.splitext(path)[1].lstrip(".").lower())
+        self.audio.play()
+        self.latencies.append(time.perf_counter() - requested)
+        metrics.observe("playback.track_switch", self.latencies[-1])
+        with self._lock:
+            self.current = path
+        self._prepare(generation, upcoming)
+
+    def _prepare(self, generation: int, upcoming: List[str]):
+        if not upcoming:
+            with self._lock:
+                if generation == self._generation and self.queued is not None:
+                    self.queued = None
+                    self._stale_queue = True
+        for position, path in enumerate(upcoming[:self.prefetch]):
+            if generation != self._generation:
+                return
+            try:
+                source = self._source(path)
+            except OSError:
+                if position == 0:
+                    with self._lock:
+                        if generation == self._generation and self.queued is not None:
+                            self.queued = None
+                            self._stale_queue = True
+                continue
+            if position == 0:
+                with self._lock:
+                    if generation != self._generation or self.current is None:
+                        return
+                    self.audio.queue(source, os.path.splitext(path)[1].lstrip(".").lower())
+                    self.queued = path
@@ -0,0 +1,296 @@
+import random
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+REPEAT_OFF = "off"
+REPEAT_ALL = "all"
+REPEAT_ONE = "one"
+REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+NIL = -1
+
+class PlayQueue:
+    def __init__(self, history_size: int = 100, seed: Optional[int] = None):
+        self.repeat = REPEAT_ALL
+        self.shuffle = False
+        self.history: Deque[int] = deque(maxlen=history_size)
+        self.version = 0
+        self._rng = random.Random(seed)
+        self._back: Deque[int] = deque(maxlen=history_size)
+        self.load(())
+
+    def load(self, song_ids: Iterable[int], start: int = 0, source=None):
+        # Entries are slots in parallel arrays; a freshly loaded queue keeps entry == position.
+        self._songs = array("I", song_ids)
+        count = len(self._songs)
+        self._next = array("i", range(1, count + 1))
+        self._prev = array("i", range(-1, count - 1))
+        if count:
+            self._next[-1] = NIL
+        self._alive = bytearray(b"\x01") * count
+        self.head = 0 if count else NIL
+        self.tail = count - 1 if count else NIL
+        self.size = count
+        self.source = source
+        self.pristine = True
+        self._entries: Optional[Dict[int, int]] = None
+        self._up_next: Deque[int] = deque()
+        self._back.clear()
+        self.version += 1
+        self.current = NIL
+        self._reset_shuffle()
+        self.jump(start)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        entry = self.head
+        while entry != NIL:
+            yield self._songs[entry]
+            entry = self._next[entry]
+
+    @property
+    def current_song_id(self) -> Optional[int]:
+        return self._songs[self.current] if self.current != NIL else None
+
+    def jump(self, position: int) -> Optional[int]:
+        # Position == entry only while the queue is pristine; otherwise walk the links.
+        if self.pristine:
+            entry = position if 0 <= position < len(self._songs) else NIL
+        else:
+            entry = self.head
+            for _ in range(position):
+                if entry == NIL:
+                    break
+                entry = self._next[entry]
+        if entry == NIL:
+            return None
+        self._up_next.clear()
+        self._move(entry)
+        if self.shuffle:
+            self._reset_shuffle()
+        return self.current_song_id
+
+    def entry_of(self, song_id: int) -> int:
+        if self._entries is None:
+            entries = {}
+            entry = self.head
+            while entry != NIL:
+                entries.setdefault(self._songs[entry], entry)
+                entry = self._next[entry]
+            self._entries = entries
+        return self._entries.get(song_id, NIL)
+
+    def _new_entry(self, song_id: int) -> int:
+        entry = len(self._songs)
+        self._songs.append(song_id)
+        self._next.append(NIL)
+        self._prev.append(NIL)
+        self._alive.append(1)
+        if self._entries is not None:
+            self._entries.setdefault(song_id, entry)
+        self.size += 1
+        self.pristine = False
+        self.version += 1
+        return entry
+
+    def _link_after(self, entry: int, after: int):
+        following = self.head if after == NIL else self._next[after]
+        self._prev[entry] = after
+        self._next[entry] = following
+        if after == NIL:
+            self.head = entry
+        else:
+            self._next[after] = entry
+        if following == NIL:
+            self.tail = entry
+        else:
+            self._prev[following] = entry
+
+    def enqueue(self, song_id: int) -> int:
+        entry = self._new_entry(song_id)
+        self._link_after(entry, self.tail)
+        return entry
+
+    def play_next(self, song_id: int) -> int:
+        pending = [e for e in self._up_next if self._alive[e]]
+        entry = self._new_entry(song_id)
+        self._link_after(entry, pending[-1] if pending else self._anchor(self.current))
+        self._up_next.append(entry)
+        return entry
+
+    def remove(self, song_id: int) -> bool:
+        entry = self.entry_of(song_id)
+        if entry == NIL:
+            return False
+        self.remove_entry(entry)
+        return True
+
+    def remove_entry(self, entry: int):
+        if not self._alive[entry]:
+            return
+        before, after = self._prev[entry], self._next[entry]
+        if before == NIL:
+            self.head = after
+        else:
+            self._next[before] = after
+        if after == NIL:
+            self.tail = before
+        else:
+            self._prev[after] = before
+        self._alive[entry] = 0
+        self.size -= 1
+        self.pristine = False
+        self.version += 1
+        if self._entries is not None and self._entries.get(self._songs[entry]) == entry:
+            del self._entries[self._songs[entry]]
+        # Removing the current entry leaves the cursor on it: the track keeps playing and showing
+        # until the next advance, which continues from the gap it left (see _anchor).
+
+    def _anchor(self, entry: int) -> int:
+        # A removed entry keeps its old links; the nearest live entry before it marks where it was.
+        while entry != NIL and not self._alive[entry]:
+            entry = self._prev[entry]
+        return entry
+
+    def set_shuffle(self, enabled: bool):
+        self.shuffle = enabled
+        self._reset_shuffle()
+
+    def set_repeat(self, mode: str):
+        if mode not in REPEAT_MODES:
+            raise ValueError(f"Unknown repeat mode: {mode}")
+        self.repeat = mode
+
+    def _reset_shuffle(self, keep_lookahead: bool = False):
+        # Lazy Fisher-Yates over entry slots: only swapped slots are stored, so
+        # enabling shuffle never copies the queue and each draw is O(1).
+        self._swaps: Dict[int, int] = {}
+        self._drawn = 0
+        if not keep_lookahead:
+            self._lookahead: Deque[int] = deque()
+        if self.current != NIL:
+            self._swaps[self.current] = 0
+            self._drawn = 1
+
+    def _draw(self) -> int:
+        restarted = False
+        while self.size:
+            slots = len(self._songs)
+            if self._drawn >= slots:
+                if self.repeat != REPEAT_ALL or restarted:
+                    return NIL
+                self._reset_shuffle(keep_lookahead=True)
+                restarted = True
+                continue
+            position = self._drawn
+            pick = self._rng.randrange(position, slots)
+            chosen = self._swaps.get(pick, pick)
+            displaced = self._swaps.pop(position, position)
+            if pick != position:
+                self._swaps[pick] = displaced
+            self._drawn += 1
+            if self._alive[chosen] and (chosen != self.current or self.size == 1):
+                return chosen
+        return NIL
+
+    def _following(self, entry: int, auto: bool, skip: int = 0) -> int:
+        if auto and self.repeat == REPEAT_ONE and entry != NIL and self._alive[entry]:
+            return entry
+        if self.shuffle:
+            if any(not self._alive[e] for e in self._lookahead):
+                self._lookahead = deque(e for e in self._lookahead if self._alive[e])
+            while len(self._lookahead) <= skip:
+                drawn = self._draw()
+                if drawn == NIL:
+                    return NIL
+                self._lookahead.append(drawn)
+            return self._lookahead[skip]
+        if entry != NIL and not self._alive[entry]:
+            entry = self._anchor(entry)
+        following = self._next[entry] if entry != NIL else self.head
+        if following == NIL and self.repeat == REPEAT_ALL:
+            following = self.head
+        return following
+
+    def peek(self, count: int = 1, auto: bool = True) -> List[int]:
+        result = []
+        entry = self.current
+        pending = [e for e in self._up_next if self._alive[e]]
+        drawn = 0
+        while len(result) < count:
+            if pending:
+                entry = pending.pop(0)
+            elif self.shuffle and not (auto and self.repeat == REPEAT_ONE):
+                entry = self._following(entry, auto, drawn)
+                drawn += 1
+            else:
+                entry = self._following(entry, auto)
+            if entry == NIL:
+                break
+            result.append(self._songs[entry])
+            if auto and self.repeat == REPEAT_ONE:
+                break
+        return result
+
+    def next(self, auto: bool = False) -> Optional[int]:
+        entry = NIL
+        if not (auto and self.repeat == REPEAT_ONE):
+            while self._up_next and entry == NIL:
+                candidate = self._up_next.popleft()
+                if self._alive[candidate]:
+                    entry = candidate
+        if entry == NIL:
+            entry = self._following(self.current, auto)
+            if self.shuffle and self._lookahead and entry == self._lookahead[0]:
+                self._lookahead.popleft()
+        if entry == NIL or not self._alive[entry]:
+            return None
+        if self.current != NIL:
+            self._back.append(self.current)
+        self._move(entry)
+        return self.current_song_id
+
+    def prev(self) -> Optional[int]:
+        entry = NIL
+        if self.shuffle:
+            while self._back and entry == NIL:
+                candidate = self._back.pop()
+                if self._alive[candidate]:
+                    entry = candidate
+        if entry == NIL:
+            entry = self._anchor(self._prev[self.current]) if self.current != NIL else self.tail
+            if entry == NIL and self.repeat == REPEAT_ALL:
+                entry = self.tail
+        if entry == NIL:
+            return None
+        self._move(entry)
+        return self.current_song_id
+
+    def _move(self, entry: int):
+        self.current = entry
+        self.history.append(self._songs[entry])
+
+    def cursor_state(self, key_of, include_history: bool = True) -> Dict:
+        current = self.current_song_id
+        state = {"current": key_of(current) if current is not None else None, "repeat": self.repeat, "shuffle": self.shuffle}
+        if include_history:
+            state["history"] = [key_of(song_id) for song_id in self.history]
+        return state
+
+    def order_state(self, key_of) -> Dict:
+        return {"version": self.version, "songs": [key_of(song_id) for song_id in self]}
+
+    def restore(self, order: Optional[Dict], cursor: Optional[Dict], resolve):
+        ids = [song_id for song_id in (resolve(key) for key in (order or {}).get("songs", [])) if song_id is not None]
+        cursor = cursor or {}
+        self.repeat = cursor.get("repeat", self.repeat) if cursor.get("repeat") in REPEAT_MODES else self.repeat
+        self.shuffle = bool(cursor.get("shuffle", False))
+        self.load(ids, start=-1)
+        current = resolve(cursor["current"]) if cursor.get("current") else None
+        self.history.clear()
+        self.history.extend(song_id for song_id in (resolve(key) for key in cursor.get("history", [])) if song_id is not None)
+        if current is not None and self.entry_of(current) != NIL:
+            self.current = self.entry_of(current)
+            self._reset_shuffle()
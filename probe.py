@@ -0,0 +1,264 @@
+import os
+import struct
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional, Callable, BinaryIO, Tuple, Iterable, Dict
+
+@dataclass
+class TrackInfo:
+    duration: float
+    title: Optional[str] = None
+    artist: Optional[str] = None
+
+MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MPEG_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 25: [11025, 12000, 8000]}
+ID3_TEXT_FRAMES = {"TIT2": "title", "TT2": "title", "TPE1": "artist", "TP1": "artist"}
+SYNC_SEARCH_BYTES = 64 * 1024
+
+def _decode_text(payload: bytes) -> Optional[str]:
+    if not payload:
+        return None
+    encoding = payload[0]
+    data = payload[1:]
+    try:
+        if encoding == 0:
+            text = data.decode("latin-1")
+        elif encoding == 1:
+            text = data.decode("utf-16")
+        elif encoding == 2:
+            text = data.decode("utf-16-be")
+        else:
+            text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    return text.split("\x00")[0].strip() or None
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def read_id3v2(f: BinaryIO, info: TrackInfo) -> int:
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    major, flags = header[3], header[5]
+    tag_end = 10 + _syncsafe(header[6:10]) + (10 if flags & 0x10 else 0)
+    position = 10
+    if flags & 0x40 and major >= 3:
+        ext = f.read(4)
+        position += (_syncsafe(ext) if major == 4 else struct.unpack(">I", ext)[0] + 4)
+        f.seek(position)
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+    while position + header_size <= tag_end and (info.title is None or info.artist is None):
+        frame_header = f.read(header_size)
+        if len(frame_header) < header_size or frame_header[0] == 0:
+            break
+        frame_id = frame_header[:id_size].decode("latin-1", "replace")
+        if major == 2:
+            size = int.from_bytes(frame_header[3:6], "big")
+        elif major == 4:
+            size = _syncsafe(frame_header[4:8])
+        else:
+            size = struct.unpack(">I", frame_header[4:8])[0]
+        position += header_size
+        field_name = ID3_TEXT_FRAMES.get(frame_id)
+        if field_name and size < 4096:
+            setattr(info, field_name, _decode_text(f.read(size)))
+        position += size
+        f.seek(position)
+    return tag_end
+
+def _parse_mpeg_header(header: bytes) -> Optional[Tuple[int, int, int, int, int, int]]:
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    bitrate = MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples, frame_length = 384, (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and version != 1:
+        samples, frame_length = 576, 72 * bitrate // sample_rate + padding
+    else:
+        samples, frame_length = 1152, 144 * bitrate // sample_rate + padding
+    mono = (header[3] >> 6) == 3
+    if version == 1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    return bitrate, sample_rate, samples, frame_length, side_info, layer
+
+def probe_mp3(f: BinaryIO, file_size: int) -> Optional[TrackInfo]:
+    info = TrackInfo(duration=0.0)
+    audio_start = read_id3v2(f, info)
+    f.seek(audio_start)
+    buffer = f.read(SYNC_SEARCH_BYTES)
+    offset = buffer.find(b"\xff")
+    while 0 <= offset <= len(buffer) - 4:
+        parsed = _parse_mpeg_header(buffer[offset:offset + 4])
+        if parsed:
+            next_offset = offset + parsed[3]
+            if next_offset + 2 > len(buffer) or _parse_mpeg_header(buffer[next_offset:next_offset + 4].ljust(4, b"\0")):
+                break
+        offset = buffer.find(b"\xff", offset + 1)
+    else:
+        return None
+    bitrate, sample_rate, samples, frame_length, side_info, layer = parsed
+    frame = buffer[offset:offset + frame_length]
+    frames = None
+    xing = 4 + side_info
+    if frame[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", frame[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack(">I", frame[xing + 8:xing + 12])[0]
+    elif frame[36:40] == b"VBRI":
+        frames = struct.unpack(">I", frame[50:54])[0]
+    if frames:
+        info.duration = frames * samples / sample_rate
+    else:
+        audio_bytes = file_size - (audio_start + offset)
+        f.seek(max(file_size - 128, 0))
+        if f.read(3) == b"TAG":
+            audio_bytes -= 128
+        info.duration = audio_bytes * 8 / bitrate
+    return info
+
+def probe_wav(f: BinaryIO, file_size: int) -> Optional[TrackInfo]:
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    info = TrackInfo(duration=0.0)
+    byte_rate = None
+    data_size = None
+    position = 12
+    while position + 8 <= file_size:
+        f.seek(position)
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[:4]
+        size = struct.unpack("<I", chunk_header[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            if len(fmt) == 16:
+                byte_rate = struct.unpack("<HHIIHH", fmt)[3]
+        elif chunk_id == b"data":
+            data_size = min(size, file_size - position - 8)
+        elif chunk_id == b"LIST" and size < 65536:
+            payload = f.read(size)
+            if payload[:4] == b"INFO":
+                offset = 4
+                while offset + 8 <= len(payload):
+                    sub_id = payload[offset:offset + 4]
+                    sub_size = struct.unpack("<I", payload[offset + 4:offset + 8])[0]
+                    text = payload[offset + 8:offset + 8 + sub_size].split(b"\0")[0].decode("latin-1").strip()
+                    if sub_id == b"INAM" and text:
+                        info.title = text
+                    elif sub_id == b"IART" and text:
+                        info.artist = text
+                    offset += 8 + sub_size + (sub_size & 1)
+        position += 8 + size + (size & 1)
+    if not byte_rate or data_size is None:
+        return None
+    info.duration = data_size / byte_rate
+    return info
+
+def read_header_info(path: str) -> Optional[TrackInfo]:
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            magic = f.read(4)
+            f.seek(0)
+            if magic == b"RIFF":
+                return probe_wav(f, file_size)
+            if path.lower().endswith(".mp3") or magic[:3] == b"ID3" or magic[:1] == b"\xff":
+                return probe_mp3(f, file_size)
+    except (OSError, struct.error, KeyError, IndexError):
+        pass
+    return None
+
+class MetadataCache:
+    def __init__(self, path: str = "metadata_cache.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "duration REAL NOT NULL, title TEXT, artist TEXT)")
+        self.conn.commit()
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[TrackInfo]:
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime_ns, duration, title, artist FROM probes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == size and row[1] == mtime_ns:
+            return TrackInfo(duration=row[2], title=row[3], artist=row[4])
+        return None
+
+    def get_many(self, files: Iterable[Tuple[str, int, int]]) -> Dict[str, TrackInfo]:
+        found = {}
+        with self._lock:
+            for path, size, mtime_ns in files:
+                row = self.conn.execute("SELECT size, mtime_ns, duration, title, artist FROM probes WHERE path = ?", (path,)).fetchone()
+                if row and row[0] == size and row[1] == mtime_ns:
+                    found[path] = TrackInfo(duration=row[2], title=row[3], artist=row[4])
+        return found
+
+    def put(self, path: str, size: int, mtime_ns: int, info: TrackInfo):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)",
+                              (path, size, mtime_ns, info.duration, info.title, info.artist))
+            self.conn.commit()
+
+    def put_many(self, rows: Iterable[Tuple[str, int, int, TrackInfo]]):
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(path, size, mtime_ns, info.duration, info.title, info.artist) for path, size, mtime_ns, info in rows])
+            self.conn.commit()
+
+    def stats_under(self, root: str) -> Dict[str, Tuple[int, int]]:
+        prefix = os.path.join(root, "")
+        with self._lock:
+            rows = self.conn.execute("SELECT path, size, mtime_ns FROM probes WHERE path >= ? AND path < ?",
+                                     (prefix, prefix + "\U0010ffff")).fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def close(self):
+        self.conn.close()
+
+class MetadataProbe:
+    def __init__(self, cache: Optional[MetadataCache] = None, fallback: Optional[Callable[[str], Optional[float]]] = None):
+        self.cache = cache
+        self.fallback = fallback
+
+    def probe(self, filepath: str) -> Optional[TrackInfo]:
+        path = os.path.abspath(filepath)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if self.cache is not None:
+            cached = self.cache.get(path, stat.st_size, stat.st_mtime_ns)
+            if cached is not None:
+                return cached
+        info = read_header_info(path)
+        if info is None and self.fallback is not None:
+            duration = self.fallback(path)
+            if duration is not None:
+                info = TrackInfo(duration=duration)
+        if info is not None and self.cache is not None:
+            self.cache.put(path, stat.st_size, stat.st_mtime_ns, info)
+        return info
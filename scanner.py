@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from probe import MetadataCache, TrackInfo, read_header_info
+
+AUDIO_EXTENSIONS = {".mp3", ".wav"}
+
+@dataclass
+class ImportReport:
+    root: str
+    scanned: int = 0
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    failed: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+@dataclass
+class ScannedFile:
+    path: str
+    size: int
+    mtime_ns: int
+    info: Optional[TrackInfo] = None
+
+def walk_audio_files(root: str) -> Iterator[Tuple[str, int, int]]:
+    stack = [os.path.abspath(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime_ns
+                except OSError:
+                    continue
+
+def probe_files(files: List[ScannedFile], workers: Optional[int] = None, chunk_size: int = 256,
+                fallback: Optional[Callable[[str], Optional[float]]] = None,
+                cache: Optional[MetadataCache] = None) -> Iterator[ScannedFile]:
+    def probe_chunk(chunk: List[ScannedFile]) -> List[ScannedFile]:
+        for scanned in chunk:
+            scanned.info = read_header_info(scanned.path)
+            if scanned.info is None and fallback is not None:
+                duration = fallback(scanned.path)
+                if duration is not None:
+                    scanned.info = TrackInfo(duration=duration)
+        if cache is not None:
+            cache.put_many((scanned.path, scanned.size, scanned.mtime_ns, scanned.info) for scanned in chunk if scanned.info is not None)
+        return chunk
+
+    if cache is not None:
+        # Files outside the library (failed, merged away, removed by hand) are probed once per (size, mtime), not per scan.
+        hits = cache.get_many((scanned.path, scanned.size, scanned.mtime_ns) for scanned in files)
+        for scanned in files:
+            scanned.info = hits.get(scanned.path)
+            if scanned.info is not None:
+                yield scanned
+        files = [scanned for scanned in files if scanned.info is None]
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for chunk in pool.map(probe_chunk, chunks):
+            yield from chunk
+
+def diff_scan(root: str, known: Dict[str, Tuple[int, int]]) -> Tuple[List[ScannedFile], List[str], int]:
+    changed = []
+    seen = set()
+    unchanged = 0
+    for path, size, mtime_ns in walk_audio_files(root):
+        seen.add(path)
+        if known.get(path) == (size, mtime_ns):
+            unchanged += 1
+        else:
+            changed.append(ScannedFile(path, size, mtime_ns))
+    missing = [path for path in known if path not in seen]
+    return changed, missing, unchanged
+
+def title_from_path(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
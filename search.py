@@ -0,0 +1,246 @@
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+WORD_RE = re.compile(r"\w+")
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+SUBSTRING_SCORE = 1.0
+FUZZY_SCORE = 0.5
+ARTIST_WEIGHT = 0.8
+TITLE_PREFIX_BONUS = 1.0
+
+def tokenize(text: str) -> List[str]:
+    return WORD_RE.findall(text.casefold())
+
+def trigrams(term: str) -> List[str]:
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+def match_score(token: str, words: List[str]) -> float:
+    best = 0.0
+    for word in words:
+        if word == token:
+            return EXACT_SCORE
+        if word.startswith(token):
+            best = PREFIX_SCORE
+        elif not best and token in word:
+            best = SUBSTRING_SCORE
+    return best
+
+class SearchIndex:
+    def __init__(self, store, scan_budget: int = 1500, max_trigram_postings: int = 20000, fuzzy_terms: int = 50,
+                 filter_cap: int = 20000):
+        self.store = store
+        self.scan_budget = scan_budget
+        self.max_trigram_postings = max_trigram_postings
+        self.fuzzy_terms = fuzzy_terms
+        self.filter_cap = filter_cap
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        self.postings: List[array] = []
+        self.trigrams: Dict[str, array] = {}
+        self._sorted_terms: List[str] = []
+        self._pending_terms: List[str] = []
+        self._artist_words: Dict[int, List[str]] = {}
+        self._artist_folded: Dict[int, str] = {}
+
+    def _words(self, song_id: int) -> set:
+        return set(tokenize(self.store.titles[song_id])) | set(self._artist_tokens(song_id))
+
+    def _artist_tokens(self, song_id: int) -> List[str]:
+        artist = self.store.artists[song_id]
+        words = self._artist_words.get(artist)
+        if words is None:
+            words = self._artist_words[artist] = tokenize(self.store.strings[artist])
+        return words
+
+    def _artist_text(self, song_id: int) -> str:
+        artist = self.store.artists[song_id]
+        text = self._artist_folded.get(artist)
+        if text is None:
+            text = self._artist_folded[artist] = self.store.strings[artist].casefold()
+        return text
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.term_ids[term] = term_id
+            self.postings.append(array("I"))
+            for gram in set(trigrams(term)):
+                self.trigrams.setdefault(gram, array("I")).append(term_id)
+            self._pending_terms.append(term)
+        return term_id
+
+    def add(self, song):
+        song_id = song.id
+        for word in self._words(song_id):
+            ids = self.postings[self._term_id(word)]
+            if not ids or ids[-1] < song_id:
+                ids.append(song_id)
+            else:
+                position = bisect_left(ids, song_id)
+                if position == len(ids) or ids[position] != song_id:
+                    ids.insert(position, song_id)
+
+    def remove(self, song):
+        song_id = song.id
+        for word in self._words(song_id):
+            term_id = self.term_ids.get(word)
+            if term_id is None:
+                continue
+            ids = self.postings[term_id]
+            position = bisect_left(ids, song_id)
+            if position < len(ids) and ids[position] == song_id:
+                ids.pop(position)
+
+    def _flush(self):
+        if self._pending_terms:
+            self._sorted_terms.extend(self._pending_terms)
+            self._sorted_terms.sort()
+            self._pending_terms = []
+
+    def _prefix_terms(self, token: str) -> Iterator[int]:
+        sorted_terms = self._sorted_terms
+        position = bisect_left(sorted_terms, token)
+        while position < len(sorted_terms) and sorted_terms[position].startswith(token):
+            yield self.term_ids[sorted_terms[position]]
+            position += 1
+
+    def _estimate(self, token: str, probe: int = 64) -> int:
+        total = 0
+        for count, term_id in enumerate(self._prefix_terms(token)):
+            if count == probe:
+                return len(self.store)
+            total += len(self.postings[term_id])
+        return total
+
+    def _substring_terms(self, token: str) -> Optional[List[int]]:
+        if len(token) < 3:
+            return []
+        grams = [self.trigrams.get(gram) for gram in set(trigrams(token))]
+        if any(ids is None for ids in grams):
+            return []
+        smallest = min(grams, key=len)
+        if len(smallest) > self.max_trigram_postings:
+            return None
+        terms = self.terms
+        return [term_id for term_id in smallest if token in terms[term_id] and not terms[term_id].startswith(token)]
+
+    def _matching_ids(self, token: str, cap: int) -> Optional[set]:
+        term_ids = []
+        total = 0
+        for term_id in self._prefix_terms(token):
+            total += len(self.postings[term_id])
+            if total > cap:
+                return None
+            term_ids.append(term_id)
+        substring = self._substring_terms(token)
+        if substring is None or total + sum(len(self.postings[term_id]) for term_id in substring) > cap:
+            return None
+        ids = set()
+        for term_id in term_ids + substring:
+            ids.update(self.postings[term_id])
+        return ids
+
+    def _fuzzy_terms(self, token: str) -> List[Tuple[float, int]]:
+        grams = set(trigrams(token))
+        counts = Counter()
+        for gram in grams:
+            ids = self.trigrams.get(gram)
+            if ids is not None and len(ids) <= self.max_trigram_postings:
+                counts.update(ids)
+        scored = []
+        for term_id, shared in counts.items():
+            similarity = shared / (len(grams) + len(self.terms[term_id]) - 2 - shared)
+            if similarity >= 0.4 and token not in self.terms[term_id]:
+                scored.append((similarity, term_id))
+        scored.sort(reverse=True)
+        return scored[:self.fuzzy_terms]
+
+    def _driver_tiers(self, token: str, fuzzy: bool) -> Iterator[Tuple[float, Iterator[Tuple[int, float]]]]:
+        # Best tier first, each with the most the driver token can score inside it: exact term, prefixes, substrings, fuzzy.
+        exact = self.term_ids.get(token)
+        if exact is not None:
+            yield EXACT_SCORE, iter([(exact, 0.0)])
+        yield PREFIX_SCORE, ((term_id, 0.0) for term_id in self._prefix_terms(token) if term_id != exact)
+        yield SUBSTRING_SCORE, ((term_id, 0.0) for term_id in self._substring_terms(token) or ())
+        if fuzzy and len(token) >= 3:
+            yield FUZZY_SCORE, ((term_id, FUZZY_SCORE * similarity) for similarity, term_id in self._fuzzy_terms(token))
+
+    def score(self, song_id: int, tokens: List[str], query: str = "", driver: int = -1, driver_floor: float = 0.0) -> Optional[float]:
+        title = self.store.titles[song_id]
+        title_words = tokenize(title)
+        artist_words = self._artist_tokens(song_id)
+        total = 0.0
+        for index, token in enumerate(tokens):
+            best = max(match_score(token, title_words), ARTIST_WEIGHT * match_score(token, artist_words))
+            if index == driver:
+                best = max(best, driver_floor)
+            if not best:
+                return None
+            total += best
+        if query and title.casefold().startswith(query):
+            total += TITLE_PREFIX_BONUS
+        return total
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        self._flush()
+        estimates = [self._estimate(token) for token in tokens]
+        driver = min(range(len(tokens)), key=lambda index: (estimates[index], -len(tokens[index])))
+        normalized = query.casefold().strip()
+        others = [token for index, token in enumerate(tokens) if index != driver]
+        cap = min(self.filter_cap, 32 * estimates[driver])
+        filters = [ids for ids in (self._matching_ids(token, cap) for token in others) if ids is not None]
+        titles, artists, folded_artists = self.store.titles, self.store.artists, self._artist_folded
+        # Tiers are collected best first and ranked together; a later tier is skipped once it cannot reach the top `limit`.
+        # The exact tier is ranked in full, up to scan_budget checks. Broader tiers contribute at most `wanted` matches each,
+        # so their order is approximate: a better hit further down a long prefix or substring list can be missed.
+        wanted = limit * 2
+        headroom = EXACT_SCORE * len(others) + TITLE_PREFIX_BONUS
+        seen = set()
+        results = []
+        checks = 0
+        for bound, term_ids in self._driver_tiers(tokens[driver], fuzzy=len(tokens) == 1):
+            if len(results) >= limit:
+                if bound == FUZZY_SCORE:
+                    break
+                results.sort()
+                if -results[limit - 1][0] >= bound + headroom:
+                    break
+            tier_end = len(results) + wanted if bound < EXACT_SCORE else self.scan_budget + 1
+            for term_id, floor in term_ids:
+                candidates = self.postings[term_id]
+                for ids in filters:
+                    candidates = ids.intersection(candidates)
+                for song_id in candidates:
+                    if song_id in seen:
+                        continue
+                    seen.add(song_id)
+                    checks += 1
+                    if checks > self.scan_budget:
+                        break
+                    if others:
+                        artist = folded_artists.get(artists[song_id])
+                        if artist is None:
+                            artist = self._artist_text(song_id)
+                        haystack = titles[song_id].casefold() + "\0" + artist
+                        if not all(token in haystack for token in others):
+                            continue
+                    score = self.score(song_id, tokens, normalized, driver, floor)
+                    if score is not None:
+                        results.append((-score, len(titles[song_id]), song_id))
+                        if len(results) >= tier_end:
+                            break
+                if len(results) >= tier_end or checks > self.scan_budget:
+                    break
+            if checks > self.scan_budget:
+                break
+        results.sort()
+        return [song_id for _, _, song_id in results[:limit]]
@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from metrics import metrics
+
+MAX_BODY = 1024 * 1024
+PAGE_LIMIT = 500
+WRITE_BATCH = 64
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class Snapshot:
+    # Immutable copy of everything reads need. Song columns are shared with the
+    # previous snapshot until a song is added or edited; strings are append-only.
+    def __init__(self, player, version: int, previous: Optional["Snapshot"] = None):
+        store = player.store
+        self.version = version
+        self.columns_key = (len(store.titles), store.version)
+        if previous is not None and previous.columns_key == self.columns_key:
+            self.titles, self.artists, self.moods, self.durations = previous.titles, previous.artists, previous.moods, previous.durations
+        else:
+            self.titles = list(store.titles)
+            self.artists, self.moods, self.durations = array("I", store.artists), array("I", store.moods), array("d", store.durations)
+        self.strings = store.strings
+        # The library and loaded playlists are only copied when they changed since the
+        # previous snapshot, so a write batch costs O(changes) rather than O(library).
+        self.library_key = player.library_version
+        if previous is not None and previous.library_key == self.library_key:
+            self.library = previous.library
+        else:
+            self.library = array("I", player.music_library.ids)
+        reuse = previous is not None and previous.titles is self.titles and previous.library is self.library
+        self._filters: Dict[Tuple, array] = previous._filters if reuse else {}
+        self.playlists = [{"name": name, "songs": playlist.song_count, "duration": playlist.total_duration}
+                          for name, playlist in player.playlists.items()]
+        # A playlist's cached tuple is replaced on every edit, including in-place sorts.
+        self.playlist_keys: Dict[str, Tuple] = {}
+        self.playlist_songs: Dict[str, array] = {}
+        for name, playlist in player.playlists.items():
+            if not playlist.is_loaded:
+                continue
+            songs = self.playlist_keys[name] = playlist.songs.to_python_list()
+            if previous is not None and previous.playlist_keys.get(name) is songs:
+                self.playlist_songs[name] = previous.playlist_songs[name]
+            else:
+                self.playlist_songs[name] = array("I", (song.id for song in songs))
+        queue = player.queue
+        current = player.get_current_song()
+        self.clock = player.clock
+        self.status = {"playing": player.is_playing, "song": current.id if current else None,
+                       "duration": current.duration if current else 0.0, "repeat": queue.repeat,
+                       "shuffle": queue.shuffle, "queue_length": len(queue), "version": version}
+        self.upcoming = queue.peek(10)
+
+    def song(self, song_id: int) -> Dict:
+        if not 0 <= song_id < len(self.titles):
+            raise RequestError(404, f"No song with id {song_id}")
+        return {"id": song_id, "title": self.titles[song_id], "artist": self.strings[self.artists[song_id]],
+                "mood": self.strings[self.moods[song_id]], "duration": self.durations[song_id]}
+
+    def songs(self, ids, offset: int = 0, limit: int = PAGE_LIMIT) -> Dict:
+        return {"total": len(ids), "offset": offset, "songs": [self.song(song_id) for song_id in ids[offset:offset + limit]]}
+
+    def filter(self, mood: Optional[str], artist: Optional[str]) -> array:
+        # Filters are computed once per snapshot and shared by every reader of it.
+        key = (mood, artist)
+        ids = self._filters.get(key)
+        if ids is None:
+            strings, moods, artists = self.strings, self.moods, self.artists
+            ids = array("I", (song_id for song_id in self.library
+                              if (mood is None or strings[moods[song_id]] == mood) and (artist is None or strings[artists[song_id]] == artist)))
+            self._filters[key] = ids
+        return ids
+
+    def current_status(self) -> Dict:
+        status = dict(self.status)
+        status["position"] = min(self.clock.position(), status["duration"]) if status["song"] is not None else 0.0
+        return status
+
+class ControlServer:
+    def __init__(self, player, host: str = "127.0.0.1", port: int = 8765, unix_path: Optional[str] = None,
+                 owner: Optional[Callable[[Callable], Future]] = None, on_write: Optional[Callable[[], None]] = None,
+                 refresh_interval: float = 0.25):
+        self.player = player
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.on_write = on_write
+        self.refresh_interval = refresh_interval
+        # Without a GUI a dedicated thread owns the player and also pumps playback.
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vibetune-owner") if owner is None else None
+        self.owner = owner or self._pool.submit
+        self.pump_playback = owner is None
+        self.snapshot: Optional[Snapshot] = None
+        self.version = 0
+        self._state_token = None
+        self._revision = -1
+        self._writes: Optional[asyncio.Queue] = None
+        self._search_cache: Dict[Tuple, List[int]] = {}
+        self._search_version = -1
+        self._server = None
+        self._owner_task = None
+        self._clients: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.routes = [
+            ("GET", r"/status", self.get_status, False),
+            ("GET", r"/library", self.get_library, False),
+            ("GET", r"/songs/(\d+)", self.get_song, False),
+            ("GET", r"/search", self.get_search, True),
+            ("GET", r"/playlists", self.get_playlists, False),
+            ("GET", r"/playlists/([^/]+)", self.get_playlist, False),
+            ("GET", r"/queue", self.get_queue, False),
+            ("GET", r"/metrics", self.get_metrics, False),
+            ("POST", r"/playlists", self.create_playlist, True),
+            ("DELETE", r"/playlists/([^/]+)", self.delete_playlist, True),
+            ("POST", r"/playlists/([^/]+)/songs", self.add_to_playlist, True),
+            ("DELETE", r"/playlists/([^/]+)/songs", self.remove_from_playlist, True),
+            ("POST", r"/queue", self.queue_song, True),
+            ("POST", r"/transport/(play|pause|toggle|next|prev|shuffle|repeat|volume)", self.transport, True),
+        ]
+        self._compiled = [(method, re.compile(pattern + "$"), handler, owned) for method, pattern, handler, owned in self.routes]
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._writes = asyncio.Queue()
+        await self._run_owned([])
+        self._owner_task = asyncio.create_task(self._owner_loop())
+        if self.unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop_async(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        tasks = list(self._clients) + ([self._owner_task] if self._owner_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def start_in_thread(self) -> threading.Thread:
+        ready = threading.Event()
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop_async())
+            loop.close()
+        self._thread = threading.Thread(target=run, name="vibetune-control", daemon=True)
+        self._thread.start()
+        if self._pool is not None:
+            # An external owner (the Tk thread) may be the caller; waiting would deadlock it.
+            ready.wait()
+        return self._thread
+
+    def stop(self):
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # Owner side: every call that touches the player goes through one queue, so
+    # writes are serialized and a batch of them costs a single snapshot rebuild.
+    async def _owner_loop(self):
+        while True:
+            try:
+                first = await asyncio.wait_for(self._writes.get(), self.refresh_interval)
+                batch = [first]
+                while len(batch) < WRITE_BATCH and not self._writes.empty():
+                    batch.append(self._writes.get_nowait())
+            except asyncio.TimeoutError:
+                if not self._stale():
+                    continue
+                batch = []
+            try:
+                await self._run_owned(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _stale(self) -> bool:
+        # Read off the owner thread: a torn read only costs one extra or one later refresh.
+        # Headless playback has nobody else to pump it, so it is polled while playing.
+        return self.player.revision != self._revision or (self.pump_playback and self.player.is_playing)
+
+    async def _run_owned(self, batch: List[Tuple[Callable, asyncio.Future]]):
+        results, snapshot = await asyncio.wrap_future(self.owner(lambda: self._apply(batch)))
+        if snapshot is not None:
+            self.snapshot = snapshot
+        for (_, future), (ok, value) in zip(batch, results):
+            if not future.done():
+                future.set_result(value) if ok else future.set_exception(value)
+
+    def _apply(self, batch: List[Tuple[Callable, asyncio.Future]]):
+        results = []
+        wrote = False
+        for work, _ in batch:
+            try:
+                value, changed = work(self.player)
+                results.append((True, value))
+                wrote = wrote or changed
+            except Exception as e:
+                results.append((False, e))
+        if self.pump_playback:
+            self.player.poll_playback()
+        if wrote and self.on_write is not None:
+            self.on_write()
+        self._revision = self.player.revision
+        token = self._token()
+        if self.snapshot is not None and not wrote and token == self._state_token:
+            return results, None
+        self._state_token = token
+        self.version += 1
+        return results, Snapshot(self.player, self.version, self.snapshot)
+
+    def _token(self) -> Tuple:
+        # Cheap fingerprint of state that can change outside the server (GUI clicks, playback).
+        player = self.player
+        playlists = tuple((name, playlist.song_count, id(playlist.songs.to_python_list()) if playlist.is_loaded else None)
+                          for name, playlist in player.playlists.items())
+        return (len(player.store), player.store.version, player.library_version, player.queue.version,
+                player.queue.current, player.queue.repeat, player.queue.shuffle, player.is_playing, playlists)
+
+    async def _owned(self, work: Callable):
+        future = self._loop.create_future()
+        await self._writes.put((work, future))
+        return await future
+
+    # HTTP
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = line.decode("latin-1").split()
+                if len(request) != 3:
+                    self._respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                method, target, version = request
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._respond(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY:
+                    self._respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self._respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        data = json.dumps(payload).encode("utf-8")
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}", "Content-Type: application/json", f"Content-Length: {len(data)}"]
+        if not keep_alive:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+
+    async def dispatch(self, method: str, target: str, body: bytes = b"") -> Tuple[int, object]:
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler, owned in self._compiled:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                payload = json.loads(body) if body else {}
+                if not isinstance(payload, dict):
+                    raise RequestError(400, "request body must be a JSON object")
+                args = [unquote(group) for group in match.groups()]
+                with metrics.span(f"control.{'write' if owned else 'read'}"):
+                    result = handler(*args, params=params, payload=payload)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                return (201 if method == "POST" and url.path == "/playlists" else 200), result
+            except RequestError as e:
+                return e.status, {"error": str(e)}
+            except (ValueError, TypeError, KeyError) as e:
+                return 400, {"error": f"bad request: {e}"}
+            except Exception as e:
+                metrics.inc("control.errors")
+                return 500, {"error": str(e)}
+        return (405, {"error": "method not allowed"}) if allowed else (404, {"error": "not found"})
+
+    # Reads, served from the current snapshot on the event loop.
+    def get_status(self, params, payload):
+        return self.snapshot.current_status()
+
+    def get_library(self, params, payload):
+        snapshot = self.snapshot
+        ids = snapshot.filter(params.get("mood"), params.get("artist"))
+        return snapshot.songs(ids, int(params.get("offset", 0)), min(int(params.get("limit", 100)), PAGE_LIMIT))
+
+    def get_song(self, song_id, params, payload):
+        return self.snapshot.song(int(song_id))
+
+    def get_playlists(self, params, payload):
+        return {"playlists": self.snapshot.playlists}
+
+    def get_playlist(self, name, params, payload):
+        snapshot = self.snapshot
+        ids = snapshot.playlist_songs.get(name)
+        if ids is None:
+            if not any(playlist["name"] == name for playlist in snapshot.playlists):
+                raise RequestError(404, f"No playlist named {name!r}")
+            return self._load_playlist(name, params)
+        return snapshot.songs(ids, int(params.get("offset", 0)), min(int(params.get("limit", 100)), PAGE_LIMIT))
+
+    async def _load_playlist(self, name: str, params):
+        # First read of an unloaded playlist loads it on the owner; later reads hit the snapshot.
+        await self._owned(lambda player: (player.open_playlist(name) if name in player.playlists else None, False))
+        if name not in self.snapshot.playlist_songs:
+            raise RequestError(404, f"No playlist named {name!r}")
+        return self.get_playlist(name, params, {})
+
+    def get_queue(self, params, payload):
+        snapshot = self.snapshot
+        return {"current": snapshot.status["song"], "upcoming": [snapshot.song(song_id) for song_id in snapshot.upcoming]}
+
+    def get_metrics(self, params, payload):
+        return metrics.snapshot()
+
+    # Owned calls: queued for the owner, answered once the new snapshot is in place.
+    async def get_search(self, params, payload):
+        query, limit = params.get("q", ""), min(int(params.get("limit", 50)), PAGE_LIMIT)
+        if self._search_version != self.snapshot.version or len(self._search_cache) > 1024:
+            self._search_cache.clear()
+            self._search_version = self.snapshot.version
+        ids = self._search_cache.get((query, limit))
+        if ids is None:
+            ids = await self._owned(lambda player: (list(player.search_index.search(query, limit)), False))
+            self._search_cache[(query, limit)] = ids
+        return self.snapshot.songs(ids, 0, limit)
+
+    def _song(self, player, song_id) -> object:
+        song = player.song_by_id(int(song_id))
+        if song is None:
+            raise RequestError(404, f"No song with id {song_id}")
+        return song
+
+    def _playlist_name(self, player, name: str) -> str:
+        if name not in player.playlists:
+            raise RequestError(404, f"No playlist named {name!r}")
+        return name
+
+    async def create_playlist(self, params, payload):
+        name = str(payload["name"]).strip()
+        def work(player):
+            if not player.create_playlist(name):
+                raise RequestError(409, f"Playlist {name!r} already exists")
+            return {"name": name}, True
+        return await self._owned(work)
+
+    async def delete_playlist(self, name, params, payload):
+        def work(player):
+            player.delete_playlist(self._playlist_name(player, name))
+            return {"deleted": name}, True
+        return await self._owned(work)
+
+    async def add_to_playlist(self, name, params, payload):
+        def work(player):
+            edit = player.add_songs_to_playlist(self._playlist_name(player, name), [self._song(player, song_id) for song_id in payload["ids"]])
+            return {"added": [song.id for song in edit.added], "skipped": [song.id for song in edit.skipped]}, True
+        return await self._owned(work)
+
+    async def remove_from_playlist(self, name, params, payload):
+        def work(player):
+            edit = player.remove_songs(self._playlist_name(player, name), [self._song(player, song_id) for song_id in payload["ids"]])
+            return {"removed": [song.id for song in edit.removed], "skipped": [song.id for song in edit.skipped]}, True
+        return await self._owned(work)
+
+    async def queue_song(self, params, payload):
+        def work(player):
+            song = self._song(player, payload["id"])
+            (player.play_next if payload.get("next") else player.enqueue)(song)
+            return {"queued": song.id, "queue_length": len(player.queue)}, True
+        return await self._owned(work)
+
+    async def transport(self, action, params, payload):
+        def work(player):
+            if action == "play" and "id" in payload:
+                player.play_song_id(self._song(player, payload["id"]).id)
+            elif (action == "play" and not player.is_playing) or (action == "pause" and player.is_playing) or action == "toggle":
+                player.toggle_play_pause()
+            elif action == "next":
+                player.next_song()
+            elif action == "prev":
+                player.prev_song()
+            elif action == "shuffle":
+                player.set_shuffle(bool(payload.get("enabled", not player.queue.shuffle)))
+            elif action == "repeat":
+                player.set_repeat(payload["mode"])
+            elif action == "volume":
+                player.set_volume(min(1.0, max(0.0, float(payload["level"]))))
+            return {"ok": True}, True
+        await self._owned(work)
+        return self.snapshot.current_status()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a headless VibeTune player with a JSON control API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on a Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    from core import MusicPlayer
+    player = MusicPlayer()
+    server = ControlServer(player, args.host, args.port, args.unix)
+
+    async def serve():
+        await server.start()
+        print(f"VibeTune control server listening on {args.unix or f'http://{args.host}:{server.port}'}", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop_async()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        player.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+import os
+import json
+import sqlite3
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterable, Tuple
+
+def song_key(data: Dict) -> str:
+    if data.get("filepath"):
+        return "file:" + os.path.normcase(os.path.abspath(data["filepath"]))
+    return f"track:{data['title']}|{data['artist']}|{float(data['duration']):g}"
+
+def write_json_atomic(path: str, payload):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".playlists-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class Storage(ABC):
+    # Backends must implement the playlist methods; library, fingerprint and state persistence are optional.
+    def load_library(self) -> List[Dict]:
+        return []
+
+    @abstractmethod
+    def playlist_names(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def load_playlist(self, name: str) -> List[Dict]:
+        ...
+
+    def playlist_headers(self) -> List[Tuple[str, int, float]]:
+        headers = []
+        for name in self.playlist_names():
+            songs = self.load_playlist(name)
+            headers.append((name, len(songs), sum(float(song.get("duration", 0)) for song in songs)))
+        return headers
+
+    def add_library_song(self, song: Dict):
+        pass
+
+    def add_library_songs(self, songs: Iterable[Dict]):
+        for song in songs:
+            self.add_library_song(song)
+
+    def remove_library_songs(self, songs: Iterable[Dict]):
+        pass
+
+    def update_library_song(self, old_key: str, song: Dict):
+        pass
+
+    @abstractmethod
+    def create_playlist(self, name: str):
+        ...
+
+    @abstractmethod
+    def delete_playlist(self, name: str):
+        ...
+
+    @abstractmethod
+    def append_entries(self, name: str, songs: Iterable[Dict]):
+        ...
+
+    @abstractmethod
+    def replace_entries(self, name: str, songs: Iterable[Dict]):
+        ...
+
+    def playlists_with_songs(self, songs: Iterable[Dict]) -> List[str]:
+        keys = {song_key(song) for song in songs}
+        return [name for name in self.playlist_names() if any(song_key(song) in keys for song in self.load_playlist(name))]
+
+    def save_fingerprints(self, fingerprints: Iterable[Tuple[str, str]]):
+        pass
+
+    def load_fingerprints(self) -> Dict[str, str]:
+        return {}
+
+    def save_merged(self, songs: Iterable[Tuple[str, str]]):
+        pass
+
+    def load_merged(self) -> Dict[str, str]:
+        return {}
+
+    def save_state(self, name: str, state: Dict):
+        pass
+
+    def load_state(self, name: str) -> Optional[Dict]:
+        return None
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def export_json(self, path: str):
+        write_json_atomic(path, [{"name": name, "songs": self.load_playlist(name)} for name in self.playlist_names()])
+
+    def close(self):
+        pass
+
+class JsonStorage(Storage):
+    def __init__(self, path: str = "playlists.json"):
+        self.path = path
+        self._playlists: Dict[str, List[Dict]] = {}
+        self._batch_depth = 0
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    for p_data in json.load(f):
+                        self._playlists[p_data["name"]] = list(p_data.get("songs", []))
+            except (json.JSONDecodeError, TypeError, KeyError):
+                self._playlists = {}
+
+    def playlist_names(self) -> List[str]:
+        return list(self._playlists)
+
+    def load_playlist(self, name: str) -> List[Dict]:
+        return self._playlists.get(name, [])
+
+    def create_playlist(self, name: str):
+        self._playlists.setdefault(name, [])
+        self._changed()
+
+    def delete_playlist(self, name: str):
+        self._playlists.pop(name, None)
+        self._changed()
+
+    def append_entries(self, name: str, songs: Iterable[Dict]):
+        self._playlists.setdefault(name, []).extend(songs)
+        self._changed()
+
+    def replace_entries(self, name: str, songs: Iterable[Dict]):
+        if name in self._playlists:
+            self._playlists[name] = list(songs)
+            self._changed()
+
+    def _changed(self):
+        self._dirty = True
+        if not self._batch_depth:
+            self.flush()
+
+    def flush(self):
+        if self._dirty:
+            write_json_atomic(self.path, [{"name": name, "songs": songs} for name, songs in self._playlists.items()])
+            self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    song_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    mood TEXT NOT NULL,
+    duration REAL NOT NULL,
+    filepath TEXT,
+    in_library INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    merged INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_songs_in_library ON songs(in_library);
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    song_count INTEGER NOT NULL DEFAULT 0,
+    total_duration REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS playlist_entries (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    song_id INTEGER NOT NULL REFERENCES songs(id),
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_playlist_entries_song ON playlist_entries(song_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class SqliteStorage(Storage):
+    def __init__(self, path: str = "vibetune.db", import_json: Optional[str] = "playlists.json"):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._batch_depth = 0
+        self._migrate()
+        if import_json and os.path.exists(import_json) and not self._meta("json_imported"):
+            self.import_json(import_json)
+
+    def _migrate(self):
+        song_columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(songs)")}
+        if "fingerprint" not in song_columns:
+            self.conn.execute("ALTER TABLE songs ADD COLUMN fingerprint TEXT")
+        if "merged" not in song_columns:
+            self.conn.execute("ALTER TABLE songs ADD COLUMN merged INTEGER NOT NULL DEFAULT 0")
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(playlists)")}
+        if "song_count" in columns:
+            return
+        with self.batch():
+            self.conn.execute("ALTER TABLE playlists ADD COLUMN song_count INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("ALTER TABLE playlists ADD COLUMN total_duration REAL NOT NULL DEFAULT 0")
+            self.conn.execute(
+                "UPDATE playlists SET "
+                "song_count = (SELECT COUNT(*) FROM playlist_entries e WHERE e.playlist_id = playlists.id), "
+                "total_duration = (SELECT COALESCE(SUM(s.duration), 0) FROM playlist_entries e "
+                "JOIN songs s ON s.id = e.song_id WHERE e.playlist_id = playlists.id)")
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @contextmanager
+    def batch(self):
+        if not self._batch_depth:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.conn.execute("COMMIT")
+
+    def playlists_with_songs(self, songs: Iterable[Dict]) -> List[str]:
+        keys = list({song_key(song) for song in songs})
+        names = set()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                "SELECT DISTINCT p.name FROM playlist_entries e JOIN playlists p ON p.id = e.playlist_id "
+                f"JOIN songs s ON s.id = e.song_id WHERE s.song_key IN ({','.join('?' * len(chunk))})", chunk)
+            names.update(row["name"] for row in rows)
+        return [name for name in self.playlist_names() if name in names]
+
+    def save_fingerprints(self, fingerprints: Iterable[Tuple[str, str]]):
+        with self.batch():
+            self.conn.executemany("UPDATE songs SET fingerprint = ? WHERE song_key = ?",
+                                  [(fingerprint, key) for key, fingerprint in fingerprints])
+
+    def load_fingerprints(self) -> Dict[str, str]:
+        rows = self.conn.execute("SELECT song_key, fingerprint FROM songs WHERE in_library = 1 AND fingerprint IS NOT NULL")
+        return {row["song_key"]: row["fingerprint"] for row in rows}
+
+    def save_merged(self, songs: Iterable[Tuple[str, str]]):
+        with self.batch():
+            self.conn.executemany("UPDATE songs SET merged = 1, fingerprint = ? WHERE song_key = ?",
+                                  [(fingerprint, key) for key, fingerprint in songs])
+
+    def load_merged(self) -> Dict[str, str]:
+        rows = self.conn.execute("SELECT filepath, fingerprint FROM songs WHERE merged = 1 AND in_library = 0 "
+                                 "AND filepath IS NOT NULL AND fingerprint IS NOT NULL")
+        return {os.path.abspath(row["filepath"]): row["fingerprint"] for row in rows}
+
+    def save_state(self, name: str, state: Dict):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"state:{name}", json.dumps(state)))
+
+    def load_state(self, name: str) -> Optional[Dict]:
+        value = self._meta(f"state:{name}")
+        try:
+            return json.loads(value) if value else None
+        except json.JSONDecodeError:
+            return None
+
+    def import_json(self, path: str):
+        try:
+            with open(path, "r") as f:
+                playlists_data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            playlists_data = []
+        with self.batch():
+            for p_data in playlists_data:
+                if isinstance(p_data, dict) and p_data.get("name"):
+                    self.create_playlist(p_data["name"])
+                    self.append_entries(p_data["name"], p_data.get("songs", []))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (path,))
+
+    def _song_id(self, song: Dict, in_library: bool = False) -> int:
+        key = song_key(song)
+        row = self.conn.execute("SELECT id FROM songs WHERE song_key = ?", (key,)).fetchone()
+        if row:
+            if in_library:
+                self.conn.execute("UPDATE songs SET in_library = 1, merged = 0 WHERE id = ?", (row["id"],))
+            return row["id"]
+        cursor = self.conn.execute(
+            "INSERT INTO songs (song_key, title, artist, mood, duration, filepath, in_library) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, song["title"], song["artist"], song["mood"], float(song["duration"]), song.get("filepath"), int(in_library)))
+        return cursor.lastrowid
+
+    def load_library(self) -> List[Dict]:
+        rows = self.conn.execute("SELECT title, artist, mood, duration, filepath FROM songs WHERE in_library = 1 ORDER BY id")
+        return [dict(row) for row in rows]
+
+    def playlist_names(self) -> List[str]:
+        return [row["name"] for row in self.conn.execute("SELECT name FROM playlists ORDER BY id")]
+
+    def load_playlist(self, name: str) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT s.title, s.artist, s.mood, s.duration, s.filepath FROM playlist_entries e "
+            "JOIN playlists p ON p.id = e.playlist_id JOIN songs s ON s.id = e.song_id "
+            "WHERE p.name = ? ORDER BY e.position", (name,))
+        return [dict(row) for row in rows]
+
+    def playlist_headers(self) -> List[Tuple[str, int, float]]:
+        rows = self.conn.execute("SELECT name, song_count, total_duration FROM playlists ORDER BY id")
+        return [(row["name"], row["song_count"], row["total_duration"]) for row in rows]
+
+    def add_library_song(self, song: Dict):
+        with self.batch():
+            self._song_id(song, in_library=True)
+
+    def add_library_songs(self, songs: Iterable[Dict]):
+        with self.batch():
+            for song in songs:
+                self._song_id(song, in_library=True)
+
+    def remove_library_songs(self, songs: Iterable[Dict]):
+        with self.batch():
+            self.conn.executemany("UPDATE songs SET in_library = 0 WHERE song_key = ?", [(song_key(song),) for song in songs])
+
+    def update_library_song(self, old_key: str, song: Dict):
+        key = song_key(song)
+        with self.batch():
+            row = self.conn.execute("SELECT id, duration, in_library FROM songs WHERE song_key = ?", (old_key,)).fetchone()
+            if row is None:
+                return
+            song_id = row["id"]
+            clash = self.conn.execute("SELECT id FROM songs WHERE song_key = ?", (key,)).fetchone() if key != old_key else None
+            if clash is not None:
+                # The edit made this song identical to another row (song_key is UNIQUE): fold it into that row.
+                self.conn.execute("UPDATE playlist_entries SET song_id = ? WHERE song_id = ?", (clash["id"], song_id))
+                self.conn.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+                self.conn.execute("UPDATE songs SET in_library = MAX(in_library, ?) WHERE id = ?", (row["in_library"], clash["id"]))
+                song_id = clash["id"]
+            self.conn.execute("UPDATE songs SET song_key = ?, title = ?, artist = ?, mood = ?, duration = ?, filepath = ? WHERE id = ?",
+                              (key, song["title"], song["artist"], song["mood"], float(song["duration"]), song.get("filepath"), song_id))
+            if clash is not None or float(song["duration"]) != row["duration"]:
+                self.conn.execute(
+                    "UPDATE playlists SET total_duration = (SELECT COALESCE(SUM(s.duration), 0) FROM playlist_entries e "
+                    "JOIN songs s ON s.id = e.song_id WHERE e.playlist_id = playlists.id) "
+                    "WHERE id IN (SELECT playlist_id FROM playlist_entries WHERE song_id = ?)", (song_id,))
+
+    def create_playlist(self, name: str):
+        with self.batch():
+            self.conn.execute("INSERT OR IGNORE INTO playlists (name) VALUES (?)", (name,))
+
+    def delete_playlist(self, name: str):
+        with self.batch():
+            self.conn.execute("DELETE FROM playlists WHERE name = ?", (name,))
+
+    def append_entries(self, name: str, songs: Iterable[Dict]):
+        with self.batch():
+            row = self.conn.execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return
+            playlist_id = row["id"]
+            position = self.conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM playlist_entries WHERE playlist_id = ?", (playlist_id,)).fetchone()[0]
+            entries = []
+            duration = 0.0
+            for song in songs:
+                entries.append((playlist_id, position, self._song_id(song)))
+                duration += float(song["duration"])
+                position += 1
+            self.conn.executemany("INSERT INTO playlist_entries (playlist_id, position, song_id) VALUES (?, ?, ?)", entries)
+            self.conn.execute("UPDATE playlists SET song_count = song_count + ?, total_duration = total_duration + ? WHERE id = ?",
+                              (len(entries), duration, playlist_id))
+
+    def replace_entries(self, name: str, songs: Iterable[Dict]):
+        with self.batch():
+            row = self.conn.execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return
+            self.conn.execute("DELETE FROM playlist_entries WHERE playlist_id = ?", (row["id"],))
+            self.conn.execute("UPDATE playlists SET song_count = 0, total_duration = 0 WHERE id = ?", (row["id"],))
+            self.append_entries(name, songs)
+
+    def close(self):
+        self.conn.close()
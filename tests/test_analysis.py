@@ -0,0 +1,103 @@
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from analysis import (FEATURE_VERSION, FeatureAccumulator, FeatureCache, TrackFeatures, classify_mood,
+                      extract_features, iter_wav_blocks, read_wav_layout)
+
+RATE = 22050
+
+def write_wav(path, samples, channels: int = 1, width: int = 2, rate: int = RATE) -> str:
+    # samples are floats in -1..1, interleaved when there is more than one channel.
+    scale = 2 ** (8 * width - 1) - 1
+    values = np.round(np.asarray(samples) * scale).astype(np.int64)
+    if width == 1:
+        raw = (values + 128).astype(np.uint8).tobytes()
+    else:
+        raw = b"".join(int(value).to_bytes(width, "little", signed=True) for value in values) if width == 3 \
+            else values.astype(f"<i{width}").tobytes()
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(width)
+        f.setframerate(rate)
+        f.writeframes(raw)
+    return str(path)
+
+def tone(seconds: float, frequency: float = 440.0, level: float = 0.5):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return level * np.sin(2 * np.pi * frequency * t)
+
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_blocks_stream_the_whole_signal(tmp_path, width):
+    left, right = tone(0.5, 440), tone(0.5, 660, 0.25)
+    path = write_wav(tmp_path / "stereo.wav", np.column_stack((left, right)).ravel(), channels=2, width=width)
+    layout = read_wav_layout(path)
+    assert (layout.channels, layout.sample_rate, layout.sample_width) == (2, RATE, width)
+    # An odd block size puts most windows off the mmap allocation granularity.
+    blocks = list(iter_wav_blocks(path, layout, 1001))
+    assert [len(block) for block in blocks[:-1]] == [1001] * (len(blocks) - 1)
+    mono = np.concatenate(blocks)
+    assert len(mono) == len(left)
+    assert np.allclose(mono, (left + right) / 2, atol=2.0 / 2 ** (8 * width - 1))
+
+def test_layout_skips_leading_chunks(tmp_path):
+    path = write_wav(tmp_path / "plain.wav", tone(0.1))
+    with open(path, "rb") as f:
+        data = f.read()
+    extra = b"LIST" + (5).to_bytes(4, "little") + b"hello\0"
+    patched = tmp_path / "patched.wav"
+    patched.write_bytes(data[:4] + (int.from_bytes(data[4:8], "little") + len(extra)).to_bytes(4, "little") + data[8:12] + extra + data[12:])
+    plain, shifted = read_wav_layout(path), read_wav_layout(str(patched))
+    assert shifted.data_offset == plain.data_offset + len(extra) and shifted.data_size == plain.data_size
+    (tmp_path / "fake.wav").write_bytes(b"not a wave file at all")
+    assert read_wav_layout(str(tmp_path / "fake.wav")) is None
+    assert extract_features(str(tmp_path / "fake.wav")) is None
+
+def test_features_do_not_depend_on_block_size():
+    samples = (tone(3.0) + np.random.default_rng(23).normal(0, 0.002, int(3.0 * RATE))).astype(np.float32)
+    results = []
+    for block in (1024, 4096, 3000):
+        accumulator = FeatureAccumulator(RATE)
+        for start in range(0, len(samples), block):
+            accumulator.feed(samples[start:start + block])
+        results.append(accumulator.result())
+    for features in results[1:]:
+        assert features.duration == results[0].duration == pytest.approx(3.0)
+        for name in ("rms", "dynamics", "zcr", "centroid"):
+            assert getattr(features, name) == pytest.approx(getattr(results[0], name), rel=1e-3, abs=1e-4)
+
+def test_brighter_tones_have_higher_centroids():
+    centroids = []
+    for frequency in (220, 880, 3520):
+        accumulator = FeatureAccumulator(RATE)
+        accumulator.feed(tone(1.0, frequency).astype(np.float32))
+        centroids.append(accumulator.result().centroid)
+    assert centroids == sorted(centroids)
+    assert centroids[1] == pytest.approx(880, rel=0.1)
+
+def test_tempo_of_a_click_track(tmp_path):
+    samples = np.zeros(int(16 * RATE))
+    beat = int(RATE * 60 / 120)
+    click = tone(0.03, 2000, 0.9)
+    for start in range(0, len(samples) - len(click), beat):
+        samples[start:start + len(click)] = click
+    features = extract_features(write_wav(tmp_path / "clicks.wav", samples))
+    assert features.tempo == pytest.approx(120, rel=0.05)
+    assert features.duration == pytest.approx(16, abs=0.01)
+
+def test_silence_is_unknown(tmp_path):
+    features = extract_features(write_wav(tmp_path / "silence.wav", np.zeros(RATE * 2)))
+    assert features.tempo == 0.0 and classify_mood(features) == "Unknown"
+    assert classify_mood(TrackFeatures(200, 0.3, 0.2, 0.12, 2500, 150)) == "Energetic"
+
+def test_feature_cache_round_trip(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.db"))
+    features = TrackFeatures(120.0, 0.2, 0.3, 0.05, 1500.0, 96.0)
+    cache.put_many([("/music/a.wav", 10, 20, features)])
+    assert cache.get("/music/a.wav", 10, 20) == features
+    assert cache.get("/music/a.wav", 10, 21) is None
+    cache.conn.execute("UPDATE features SET version = ?", (FEATURE_VERSION + 1,))
+    assert cache.get("/music/a.wav", 10, 20) is None
+    cache.close()
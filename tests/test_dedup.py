@@ -0,0 +1,111 @@
+import io
+import os
+import shutil
+import wave
+from contextlib import redirect_stdout
+
+import pytest
+
+from core import MusicPlayer
+from dedup import SAMPLE_BYTES, SAMPLE_POINTS, DuplicateFinder, Fingerprint, sample_offsets
+from storage import SqliteStorage
+
+LARGE = 200_000
+
+def write(path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+def large(fill: int, poke: int = -1) -> bytes:
+    data = bytearray([fill]) * LARGE
+    if poke >= 0:
+        data[poke] ^= 0xFF
+    return bytes(data)
+
+def unsampled_offset() -> int:
+    offsets = sample_offsets(LARGE)
+    return offsets[0] + SAMPLE_BYTES + (offsets[1] - offsets[0] - SAMPLE_BYTES) // 2
+
+def test_fingerprint_round_trip():
+    fingerprint = Fingerprint(10, 20, "abc", None)
+    assert Fingerprint.decode(fingerprint.encode()) == fingerprint
+    assert Fingerprint.decode("garbage") is None
+    assert Fingerprint.decode(None) is None
+
+def test_unique_sizes_are_never_read(tmp_path):
+    files = {0: write(tmp_path / "a", b"x" * 10), 1: write(tmp_path / "b", b"x" * 11)}
+    report, updated = DuplicateFinder(workers=1).find(files, {})
+    assert (report.groups, report.bytes_read, updated) == ([], 0, {})
+
+def test_small_files_are_settled_by_the_sample_stage(tmp_path):
+    files = {0: write(tmp_path / "a", b"same"), 1: write(tmp_path / "b", b"same"), 2: write(tmp_path / "c", b"diff")}
+    report, updated = DuplicateFinder(workers=1).find(files, {})
+    assert report.groups == [[0, 1]]
+    assert report.bytes_read == 12
+    assert all(fingerprint.full == fingerprint.sample for fingerprint in updated.values())
+
+def test_different_samples_skip_the_full_hash(tmp_path):
+    files = {0: write(tmp_path / "a", large(1)), 1: write(tmp_path / "b", large(2))}
+    report, updated = DuplicateFinder(workers=1).find(files, {})
+    assert report.groups == []
+    assert report.bytes_read == 2 * SAMPLE_BYTES * SAMPLE_POINTS
+    assert all(fingerprint.full is None for fingerprint in updated.values())
+
+def test_equal_samples_are_confirmed_by_the_full_hash(tmp_path):
+    files = {0: write(tmp_path / "a", large(1)), 1: write(tmp_path / "b", large(1)),
+             2: write(tmp_path / "c", large(1, poke=unsampled_offset()))}
+    report, updated = DuplicateFinder(workers=2).find(files, {})
+    assert report.groups == [[0, 1]]
+    assert report.bytes_read == 3 * (SAMPLE_BYTES * SAMPLE_POINTS + LARGE)
+    assert len({updated[0].sample, updated[1].sample, updated[2].sample}) == 1
+
+def test_known_fingerprints_are_not_read_again(tmp_path):
+    files = {0: write(tmp_path / "a", large(1)), 1: write(tmp_path / "b", large(1))}
+    finder = DuplicateFinder(workers=1)
+    _, updated = finder.find(files, {})
+    report, again = finder.find(files, updated)
+    assert (report.groups, report.bytes_read, again) == ([[0, 1]], 0, {})
+    os.utime(files[1], ns=(1, 1))
+    report, again = finder.find(files, updated)
+    assert list(again) == [1]
+
+def write_wav(path, seconds: float = 1.0, tone: int = 0) -> str:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(bytes([tone, 0]) * int(seconds * 8000))
+    return str(path)
+
+@pytest.fixture
+def player(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with redirect_stdout(io.StringIO()):
+        player = MusicPlayer(storage=SqliteStorage(str(tmp_path / "test.db"), import_json=None))
+    yield player
+    player.close()
+
+def test_merge_rewrites_playlists_and_survives_a_rescan(player, tmp_path):
+    music = tmp_path / "music"
+    music.mkdir()
+    first = write_wav(music / "first.wav", 2.0)
+    copy = str(music / "copy.wav")
+    shutil.copyfile(first, copy)
+    write_wav(music / "other.wav", 2.0, tone=7)
+    player.import_directory(str(music), workers=1)
+    songs = {song.filepath: song for song in player.music_library if song.filepath}
+    player.create_playlist("Mix")
+    player.add_songs_to_playlist("Mix", [songs[copy], songs[first]])
+    report = player.find_duplicates()
+    assert [[song.filepath for song in group] for group in report.groups] == [[first, copy]]
+    size = len(player.music_library)
+    assert player.merge_duplicates(report.groups) == 1
+    assert len(player.music_library) == size - 1
+    assert [song.filepath for song in player.open_playlist("Mix")] == [first]
+    rescan = player.import_directory(str(music), workers=1)
+    assert (rescan.added, rescan.skipped) == (0, 1)
+    assert len(player.music_library) == size - 1
+    with open(copy, "ab") as f:
+        f.write(b"\0\0")
+    assert player.import_directory(str(music), workers=1).added == 1
+    assert copy in {song.filepath for song in player.music_library}
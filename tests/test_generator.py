@@ -0,0 +1,80 @@
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+from core import SongStore
+from generator import MOOD_ENERGY, PlaylistGenerator, reachable_rows, subset_near
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+@pytest.fixture
+def without_numpy(monkeypatch):
+    # A None entry makes "import numpy" raise ImportError, which selects the bitset rows.
+    monkeypatch.setitem(sys.modules, "numpy", None)
+
+@pytest.fixture
+def store():
+    rng = random.Random(22)
+    store = SongStore()
+    for i in range(400):
+        store.add(f"Track {i}", f"Artist {i % 60}", rng.choice(MOODS), rng.randint(120, 420))
+    return store
+
+def reachable(weights, cells):
+    rows, has = reachable_rows(weights, cells)
+    return [[bool(has(row, cell)) for cell in range(cells)] for row in rows]
+
+def test_numpy_and_bitset_rows_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    rng = random.Random(5)
+    weights = [rng.randint(1, 40) for _ in range(30)] + [500]
+    vectorized = reachable(weights, 300)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    assert reachable(weights, 300) == vectorized
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_subset_near(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setitem(sys.modules, "numpy", None)
+    weights = [50, 70, 110, 200]
+    assert sum(weights[i] for i in subset_near(weights, 180, 0)) == 180
+    assert sum(weights[i] for i in subset_near(weights, 185, 10)) in (180, 190)
+    # Nothing within the slack: the closest total below the target wins.
+    assert sum(weights[i] for i in subset_near(weights, 105, 2)) == 70
+    assert subset_near(weights, 10_000, 30) == [0, 1, 2, 3]
+
+@pytest.mark.parametrize("target", [1800.0, 7200.0])
+def test_generated_playlist_lands_on_target(store, target):
+    ids = PlaylistGenerator(store, dp_items=200, dp_window=1800.0).generate(range(len(store)), target, tolerance=30,
+                                                                             max_per_artist=2, seed=1)
+    assert len(set(ids)) == len(ids)
+    assert abs(sum(store.durations[song_id] for song_id in ids) - target) <= 30
+    assert max(Counter(store.artists[song_id] for song_id in ids).values()) <= 2
+
+def test_bitset_path_lands_on_target(store, without_numpy):
+    generator = PlaylistGenerator(store, dp_items=200)
+    ids = generator.generate(range(len(store)), 3600.0, tolerance=30, seed=3)
+    assert abs(sum(store.durations[song_id] for song_id in ids) - 3600.0) <= 30
+
+def test_numpy_path_matches_bitset_path(store, monkeypatch):
+    pytest.importorskip("numpy")
+    generator = PlaylistGenerator(store, dp_items=200)
+    vectorized = generator.generate(range(len(store)), 3600.0, tolerance=30, seed=3)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    assert generator.generate(range(len(store)), 3600.0, tolerance=30, seed=3) == vectorized
+
+def test_rise_orders_by_mood_energy(store):
+    ids = PlaylistGenerator(store).generate(range(len(store)), 3600.0, order="rise", seed=4)
+    energy = [MOOD_ENERGY[store.strings[store.moods[song_id]]] for song_id in ids]
+    assert energy == sorted(energy)
+
+def test_short_or_invalid_requests(store):
+    generator = PlaylistGenerator(store)
+    assert generator.generate(range(len(store)), 0) == []
+    assert generator.generate([], 600) == []
+    with pytest.raises(ValueError):
+        generator.generate(range(len(store)), 600, order="sideways")
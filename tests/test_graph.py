@@ -0,0 +1,64 @@
+import random
+import threading
+
+from core import SongStore
+from graph import DFSManager, GraphSnapshot, SongGraph
+
+MOODS = ["Happy", "Energetic", "Sad", "Calm"]
+
+def build(count: int = 400, seed: int = 5):
+    rng = random.Random(seed)
+    store = SongStore()
+    songs = [store.add(f"Track {i}", f"Artist {rng.randrange(20)}", rng.choice(MOODS), rng.uniform(90, 480))
+             for i in range(count)]
+    graph = SongGraph(store, k=4)
+    graph.build(songs)
+    return graph, songs
+
+def test_removal_refills_neighbour_lists():
+    graph, songs = build()
+    for song in songs[:40]:
+        graph.remove_song(song)
+    removed = {song.id for song in songs[:40]}
+    for song in songs[40:]:
+        edges = graph.edges(song.id)
+        assert len(edges) == graph.k
+        assert not removed & {other for _, other in edges}
+
+def test_edited_song_is_recommended_again():
+    graph, songs = build()
+    song = songs[0]
+    pointing = [source for source, neighbors in graph.neighbors.items() if any(other == song.id for _, other in neighbors)]
+    graph.remove_song(song)
+    graph.add_song(song)
+    assert any(song.id in (other for _, other in graph.edges(source)) for source in pointing)
+
+def test_snapshot_is_unaffected_by_later_edits():
+    graph, songs = build()
+    snapshot = GraphSnapshot(graph, reverse=True)
+    before = {song_id: list(neighbors) for song_id, neighbors in snapshot.neighbors.items()}
+    for song in songs[:40]:
+        graph.remove_song(song)
+    for i in range(40):
+        graph.add_song(graph.store.add(f"New {i}", "Artist 1", "Calm", 200.0))
+    graph.flush()
+    assert snapshot.neighbors == before
+    assert snapshot.reverse_edges() is not graph.reverse_edges()
+
+def test_threaded_search_walks_a_snapshot():
+    graph, songs = build()
+    start = songs[0].id
+    middle = graph.edges(start)[0][1]
+    end = next(other for _, other in graph.edges(middle) if other != start)
+    results = []
+    done = threading.Event()
+    manager = DFSManager(update_callback=lambda highlights, message: results.append(highlights),
+                         finished_callback=done.set, delay=0)
+    manager.headless = True
+    expected = manager.find_path(graph, start, end, "bidirectional")
+    manager.find_path_in_thread(graph, start, end, "bidirectional")
+    for song_id in (middle, end):
+        graph.remove_song(graph.store.get(song_id))
+    graph.flush()
+    assert done.wait(5)
+    assert results == [{"path": expected}]
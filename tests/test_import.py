@@ -0,0 +1,74 @@
+import io
+import os
+import wave
+from contextlib import redirect_stdout
+
+import pytest
+
+from core import MusicPlayer
+from storage import SqliteStorage, song_key
+
+@pytest.fixture
+def player(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with redirect_stdout(io.StringIO()):
+        player = MusicPlayer(storage=SqliteStorage(str(tmp_path / "test.db"), import_json=None))
+    yield player
+    player.close()
+
+@pytest.fixture
+def music(tmp_path):
+    folder = tmp_path / "music"
+    folder.mkdir()
+    return folder
+
+def write_wav(path, seconds: float = 1.0, rate: int = 8000) -> str:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0" * int(seconds * rate))
+    return str(path)
+
+def rescan(player, folder):
+    return player.import_directory(str(folder), workers=1)
+
+def test_import_adds_then_skips_unchanged_files(player, music):
+    write_wav(music / "one.wav", 2.0)
+    write_wav(music / "two.wav", 3.0)
+    report = rescan(player, music)
+    assert (report.added, report.failed) == (2, [])
+    assert sorted(song.title for song in player.music_library if song.filepath) == ["one", "two"]
+    report = rescan(player, music)
+    assert (report.added, report.unchanged) == (0, 2)
+
+def test_a_file_that_comes_back_is_one_live_song(player, music, tmp_path):
+    path = write_wav(music / "song.wav", 2.0)
+    rescan(player, music)
+    key = song_key({"filepath": path})
+    player.create_playlist("Mix")
+    player.add_song_to_playlist("Mix", player.store.find(key))
+    os.rename(path, tmp_path / "away.wav")
+    assert rescan(player, music).removed == 1
+    assert player.store.find(key) is None
+    os.rename(tmp_path / "away.wav", path)
+    assert rescan(player, music).added == 1
+    restored = player.store.find(key)
+    assert restored.id in player.music_library.ids
+    assert player.update_song(restored, mood="Calm")
+    assert [song.id for song in player._load_playlist_songs("Mix")] == [restored.id]
+    assert [data["mood"] for data in player.storage.load_library() if data["filepath"] == path] == ["Calm"]
+
+def test_a_returning_file_reuses_the_row_a_playlist_holds(player, music, tmp_path):
+    path = write_wav(music / "song.wav", 2.0)
+    rescan(player, music)
+    player.create_playlist("Mix")
+    player.add_song_to_playlist("Mix", player.store.find(song_key({"filepath": path})))
+    os.rename(path, tmp_path / "away.wav")
+    rescan(player, music)
+    held = player._load_playlist_songs("Mix")[0]
+    assert held.id not in player.music_library.ids
+    os.rename(tmp_path / "away.wav", path)
+    rescan(player, music)
+    assert held.id in player.music_library.ids
+    assert len([song for song in player.music_library if song.filepath == path]) == 1
@@ -0,0 +1,81 @@
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+from core import LibraryIndex, MusicPlayer, SongStore
+from storage import SqliteStorage
+
+@pytest.fixture
+def store():
+    store = SongStore()
+    for title, artist, mood, duration in [("A", "X", "Happy", 200), ("B", "Y", "Sad", 120), ("C", "X", "Happy", 300),
+                                          ("D", "Z", "Calm", 240), ("E", "Y", "Happy", 90)]:
+        store.add(title, artist, mood, duration)
+    return store
+
+@pytest.fixture
+def player(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with redirect_stdout(io.StringIO()):
+        player = MusicPlayer(storage=SqliteStorage(str(tmp_path / "test.db"), import_json=None))
+    yield player
+    player.close()
+
+def add(player, title: str, artist: str, mood: str, duration: float):
+    song = player.store.add(title, artist, mood, duration)
+    player._add_to_library(song)
+    player.storage.add_library_song(song.to_dict())
+    return song
+
+def test_index_postings_follow_adds_and_removes(store):
+    index = LibraryIndex(store)
+    for song in store:
+        index.add(song)
+    assert list(index.mood("Happy").ids) == [0, 2, 4]
+    index.remove(store.get(2))
+    store.update(2, mood="Calm")
+    index.add(store.get(2))
+    assert list(index.mood("Happy").ids) == [0, 4]
+    assert list(index.mood("Calm").ids) == [2, 3]
+    assert list(index.artist("X").ids) == [0, 2]
+
+def test_index_query_combines_filters_and_duration_range(store):
+    index = LibraryIndex(store)
+    for song in store:
+        index.add(song)
+    assert list(index.query(mood="Happy", artist="X").ids) == [0, 2]
+    assert list(index.query(mood="Happy", min_duration=100).ids) == [0, 2]
+    assert list(index.query(min_duration=100, max_duration=240).ids) == [0, 1, 3]
+    assert list(index.query(artist="Y", max_duration=100).ids) == [4]
+    assert index.query() is None
+
+def test_player_update_keeps_indexes_in_step(player):
+    song = add(player, "Late", "New Artist", "Unknown", 180)
+    assert player.update_song(song, mood="Calm", title="Later")
+    assert song.id in player.get_songs_by_mood("Calm").ids
+    assert song.id not in player.get_songs_by_mood("Unknown").ids
+    assert song.id in player.search("later").ids
+    assert [data["title"] for data in player.storage.load_library()] == ["Later"]
+
+def test_removed_songs_leave_every_index(player):
+    song = player.music_library[0]
+    assert player.remove_song(song)
+    assert song.id not in player.music_library.ids
+    assert song.id not in player.get_songs_by_mood(song.mood).ids
+    assert song.id not in player.search(song.title).ids
+
+def test_player_refuses_an_edit_that_duplicates_another_song(player):
+    add(player, "One", "X", "Happy", 100)
+    second = add(player, "Two", "X", "Happy", 100)
+    assert not player.update_song(second, title="One")
+    assert second.title == "Two"
+
+def test_view_positions_follow_library_edits(player):
+    view = player.get_songs_by_mood("Happy")
+    player.set_view(view)
+    last = view[len(view) - 1]
+    assert player.view_position(last.id) == len(view) - 1
+    player.update_song(view[0], mood="Sad")
+    assert player.play_song_id(last.id)
+    assert player.get_current_song().id == last.id
@@ -0,0 +1,74 @@
+import pytest
+
+from core import LinkedList, SongStore
+
+@pytest.fixture
+def songs():
+    store = SongStore()
+    return [store.add(f"Song {i}", "Artist", "Happy", 100 + i) for i in range(6)]
+
+def links(songs: LinkedList):
+    forward, backward = [], []
+    node = songs.head
+    while node:
+        forward.append(node.data)
+        node = node.next
+    node = songs.tail
+    while node:
+        backward.append(node.data)
+        node = node.prev
+    return forward, backward[::-1]
+
+@pytest.mark.parametrize("doubly", [False, True])
+def test_append_keeps_tail_and_index(songs, doubly):
+    linked = LinkedList(songs, doubly=doubly)
+    assert len(linked) == 6
+    assert linked.tail.data is songs[-1] and linked.tail.next is None
+    assert [linked[i] for i in range(6)] == songs
+    assert linked[-1] is songs[-1] and list(linked[1:3]) == songs[1:3]
+    with pytest.raises(IndexError):
+        linked[6]
+
+@pytest.mark.parametrize("doubly", [False, True])
+@pytest.mark.parametrize("index", [0, 2, -1])
+def test_pop_relinks_neighbours(songs, doubly, index):
+    linked = LinkedList(songs, doubly=doubly)
+    expected = list(songs)
+    assert linked.pop(index) is expected.pop(index)
+    assert list(linked) == expected and len(linked) == 5
+    assert linked.head.data is expected[0] and linked.tail.data is expected[-1]
+    if doubly:
+        assert links(linked) == (expected, expected)
+    linked.append(songs[0])
+    assert linked[-1] is songs[0]
+
+def test_pop_until_empty(songs):
+    linked = LinkedList(songs[:2], doubly=True)
+    linked.pop()
+    linked.pop()
+    assert (linked.head, linked.tail, len(linked)) == (None, None, 0)
+    linked.append(songs[3])
+    assert list(linked) == [songs[3]]
+
+def test_snapshot_is_cached_until_the_list_changes(songs):
+    linked = LinkedList(songs[:3])
+    snapshot = linked.to_python_list()
+    assert snapshot == tuple(songs[:3]) and linked.to_python_list() is snapshot
+    linked.append(songs[3])
+    assert linked.to_python_list() == tuple(songs[:4])
+    linked.pop(0)
+    assert linked.to_python_list() == tuple(songs[1:4])
+
+def test_invalidate_after_relinking(songs):
+    linked = LinkedList(songs[:4], doubly=True)
+    snapshot = linked.to_python_list()
+    # Reverse the nodes from outside, as the merge sort does.
+    previous, node = None, linked.head
+    while node:
+        node.next, previous, node = previous, node, node.next
+    linked.head = previous
+    linked.invalidate()
+    expected = songs[3::-1]
+    assert linked.to_python_list() is not snapshot and list(linked.to_python_list()) == expected
+    assert links(linked) == (expected, expected)
+    assert linked[1] is expected[1] and len(linked) == 4
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+
+from metrics import NULL_SPAN, Histogram, Metrics, SamplingProfiler
+
+def test_counters_and_spans():
+    registry = Metrics()
+    registry.inc("imports")
+    registry.inc("imports", 2)
+    with registry.span("load"):
+        pass
+
+    @registry.timed("save")
+    def save(value):
+        return value * 2
+
+    assert save(4) == 8
+    snapshot = registry.snapshot()
+    assert snapshot["counters"] == {"imports": 3}
+    assert snapshot["histograms"]["load"]["count"] == 1 and snapshot["histograms"]["save"]["count"] == 1
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "histograms": {}}
+
+def test_disabled_registry_records_nothing():
+    registry = Metrics(enabled=False)
+    registry.inc("imports")
+    registry.observe("load", 1.0)
+    assert registry.span("load") is NULL_SPAN
+    assert registry.timed("save")(lambda: 5)() == 5
+    assert registry.snapshot() == {"counters": {}, "histograms": {}}
+
+def test_histogram_summary():
+    histogram = Histogram(max_samples=1000)
+    for value in range(1, 101):
+        histogram.observe(value / 100)
+    summary = histogram.summary()
+    assert (summary["count"], summary["min"], summary["max"]) == (100, 0.01, 1.0)
+    assert summary["p50"] == histogram.quantile(0.5) == 0.51
+    assert summary["p99"] == 1.0
+    assert Histogram().summary()["p50"] == 0.0
+
+def test_histogram_keeps_a_bounded_sample():
+    histogram = Histogram(max_samples=64)
+    for value in range(10_000):
+        histogram.observe(value)
+    assert len(histogram.samples) == 64
+    assert histogram.count == 10_000 and histogram.high == 9_999
+
+def test_exports():
+    registry = Metrics()
+    registry.inc("library.decode-errors", 2)
+    registry.observe("playlist.load", 0.25)
+    assert json.loads(registry.to_json())["counters"] == {"library.decode-errors": 2}
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE vibetune_library_decode_errors_total counter" in lines
+    assert "vibetune_library_decode_errors_total 2" in lines
+    assert 'vibetune_playlist_load_seconds{quantile="0.5"} 0.25' in lines
+    assert "vibetune_playlist_load_seconds_count 1" in lines
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(100))
+
+def test_sampling_profiler_sees_a_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001, thread_ids=[worker.ident])
+    profiler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while profiler.ticks < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        profiler.stop()
+        stop.set()
+        worker.join()
+    assert not profiler.running and profiler.ticks >= 20
+    assert any(name.startswith("busy_loop (test_metrics.py:") for name, _ in profiler.top())
@@ -0,0 +1,154 @@
+import io
+import threading
+import wave
+from contextlib import redirect_stdout
+
+import pytest
+
+from audio import AudioError, NullAudio
+from core import MusicPlayer
+from playback import PlaybackClock
+from storage import SqliteStorage
+
+class FakeAudio(NullAudio):
+    name = "fake"
+    available = True
+
+    def __init__(self):
+        self.loaded = []
+        self.queued = []
+        self.ends = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def load(self, source, namehint: str = ""):
+        self.gate.wait(5)
+        data = source.getvalue() if isinstance(source, io.BytesIO) else b""
+        if data.endswith(b"broken"):
+            raise AudioError("cannot decode")
+        self.loaded.append(data)
+
+    def queue(self, source, namehint: str = ""):
+        self.queued.append(source)
+
+    def ended_events(self) -> int:
+        ends, self.ends = self.ends, 0
+        return ends
+
+    def get_busy(self) -> bool:
+        return True
+
+def write_wav(path, tail: bytes = b"") -> str:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b"\0\0" * 8000)
+    with open(path, "ab") as f:
+        f.write(tail)
+    return str(path)
+
+@pytest.fixture
+def audio():
+    return FakeAudio()
+
+@pytest.fixture
+def player(tmp_path, monkeypatch, audio):
+    monkeypatch.chdir(tmp_path)
+    with redirect_stdout(io.StringIO()):
+        player = MusicPlayer(storage=SqliteStorage(str(tmp_path / "test.db"), import_json=None), audio=audio)
+    yield player
+    player.close()
+
+def add(player, path: str, title: str):
+    return player.add_song_from_file(path, title, "Artist", "Calm")
+
+def test_errors_are_applied_by_poll_on_the_owner_thread(player, tmp_path):
+    broken = add(player, write_wav(tmp_path / "broken.wav", b"broken"), "Broken")
+    with redirect_stdout(io.StringIO()):
+        player.play_song([broken], 0)
+        assert player.playback.wait_idle(5)
+        assert player.is_playing and player._audio_active
+        assert player.poll_playback()
+    assert not player.is_playing and not player._audio_active
+
+def test_an_error_for_a_replaced_track_is_dropped(player, audio, tmp_path):
+    broken = add(player, write_wav(tmp_path / "broken.wav", b"broken"), "Broken")
+    good = add(player, write_wav(tmp_path / "good.wav"), "Good")
+    with redirect_stdout(io.StringIO()):
+        audio.gate.clear()
+        player.play_song([broken], 0)
+        player.playback.wait_idle(0.2)
+        player.play_song([good], 0)
+        audio.gate.set()
+        assert player.playback.wait_idle(5)
+        player.poll_playback()
+    assert player.get_current_song() == good
+    assert player.is_playing and player._audio_active
+    assert len(audio.loaded) == 1
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_clock_tracks_position_across_pauses():
+    now = FakeClock()
+    clock = PlaybackClock(now)
+    assert clock.position() == 0.0 and not clock.running
+    clock.start()
+    now.now += 3
+    clock.pause()
+    now.now += 50
+    assert clock.position() == 3 and not clock.running
+    clock.resume()
+    now.now += 2
+    assert clock.position() == 5 and clock.running
+    clock.start(offset=1.5)
+    now.now += 1
+    assert clock.position() == 2.5
+    clock.stop()
+    assert clock.position() == 0.0 and not clock.running
+
+def test_dummy_tracks_advance_on_the_clock(player):
+    now = FakeClock()
+    player.clock = PlaybackClock(now)
+    first, second = list(player.music_library)[:2]
+    player.set_repeat("off")
+    with redirect_stdout(io.StringIO()):
+        player.play_song([first, second], 0)
+        assert not player.poll_playback()
+        now.now += first.duration
+        assert player.poll_playback()
+        assert player.get_current_song() == second and player.clock.position() == 0.0
+        now.now += second.duration
+        player.poll_playback()
+    assert not player.is_playing
+
+def test_end_event_switches_to_the_prefetched_track(player, audio, tmp_path):
+    first = add(player, write_wav(tmp_path / "one.wav"), "One")
+    second = add(player, write_wav(tmp_path / "two.wav"), "Two")
+    player.play_song([first, second], 0)
+    assert player.playback.wait_idle(5)
+    assert len(audio.loaded) == 1 and len(audio.queued) == 1
+    assert not player.poll_playback()
+    audio.ends = 1
+    assert player.poll_playback()
+    assert player.get_current_song() == second and player.playback.current == second.filepath
+    assert len(audio.loaded) == 1
+
+def test_missing_files_are_remembered(player, audio, tmp_path):
+    path = tmp_path / "gone.wav"
+    song = add(player, write_wav(path), "Gone")
+    path.unlink()
+    with redirect_stdout(io.StringIO()):
+        player.play_song([song], 0)
+        assert player.playback.wait_idle(5)
+        player.poll_playback()
+        assert player.playback.is_missing(song.filepath)
+        player.play_song([song], 0)
+    # A known-missing file plays as a dummy track on the clock without touching the disk again.
+    assert player.is_playing and not player._audio_active
+    assert audio.loaded == []
@@ -0,0 +1,106 @@
+import pytest
+
+from playqueue import PlayQueue
+
+def queue(count: int = 5, start: int = 0, repeat: str = "all", shuffle: bool = False) -> PlayQueue:
+    q = PlayQueue(seed=21)
+    q.set_repeat(repeat)
+    q.load(range(count), start)
+    q.set_shuffle(shuffle)
+    return q
+
+def test_next_and_prev_follow_the_loaded_order():
+    q = queue(start=1)
+    assert [q.next(), q.next(), q.prev()] == [2, 3, 2]
+
+def test_repeat_all_wraps_and_repeat_off_stops():
+    q = queue(3, start=2)
+    assert q.next() == 0
+    q = queue(3, start=2, repeat="off")
+    assert q.next() is None
+    assert q.current_song_id == 2
+
+def test_repeat_one_replays_on_track_end_but_not_on_skip():
+    q = queue(start=1, repeat="one")
+    assert q.next(auto=True) == 1
+    assert q.peek(3) == [1]
+    assert q.next() == 2
+
+def test_unknown_repeat_mode_is_rejected():
+    with pytest.raises(ValueError):
+        queue().set_repeat("twice")
+
+def test_play_next_is_fifo_and_enqueue_appends():
+    q = queue(3)
+    q.play_next(10)
+    q.play_next(11)
+    q.enqueue(12)
+    assert list(q) == [0, 10, 11, 1, 2, 12]
+    assert [q.next(), q.next(), q.next()] == [10, 11, 1]
+
+def test_removing_the_current_entry_keeps_it_until_the_next_advance():
+    q = queue(start=2)
+    assert q.remove(2)
+    assert q.current_song_id == 2
+    assert list(q) == [0, 1, 3, 4]
+    assert q.peek(2) == [3, 4]
+    assert q.next() == 3
+    assert q.prev() == 1
+
+def test_prev_from_a_removed_current_goes_to_the_song_before_it():
+    q = queue(start=2)
+    q.remove(2)
+    q.remove(1)
+    assert q.prev() == 0
+
+def test_removed_current_at_the_tail_continues_with_later_enqueues():
+    q = queue(3, start=2, repeat="off")
+    q.remove(2)
+    q.enqueue(7)
+    assert q.next() == 7
+
+def test_repeat_one_moves_on_from_a_removed_track():
+    q = queue(start=1, repeat="one")
+    q.remove(1)
+    assert q.next(auto=True) == 2
+
+def test_shuffle_plays_every_song_once_per_cycle():
+    q = queue(20, start=4, repeat="off", shuffle=True)
+    played = [q.current_song_id]
+    while (song_id := q.next()) is not None:
+        played.append(song_id)
+    assert sorted(played) == list(range(20))
+
+def test_shuffle_repeat_all_starts_a_new_cycle():
+    q = queue(4, shuffle=True)
+    played = [q.next() for _ in range(8)]
+    assert None not in played
+    assert sorted(played[:3] + [0]) == [0, 1, 2, 3]
+
+def test_shuffle_peek_matches_the_following_draws():
+    q = queue(30, shuffle=True)
+    upcoming = q.peek(5)
+    assert [q.next() for _ in range(5)] == upcoming
+
+def test_shuffle_prev_walks_back_through_what_was_played():
+    q = queue(30, shuffle=True)
+    played = [q.current_song_id] + [q.next() for _ in range(4)]
+    assert [q.prev() for _ in range(4)] == played[-2::-1]
+
+def test_shuffle_skips_removed_entries():
+    q = queue(10, repeat="off", shuffle=True)
+    for song_id in range(1, 10, 2):
+        q.remove(song_id)
+    played = []
+    while (song_id := q.next()) is not None:
+        played.append(song_id)
+    assert sorted(played) == [2, 4, 6, 8]
+
+def test_cursor_and_order_state_round_trip():
+    q = queue(start=3, repeat="one", shuffle=True)
+    q.enqueue(9)
+    restored = PlayQueue()
+    key_of, resolve = str, int
+    restored.restore(q.order_state(key_of), q.cursor_state(key_of), resolve)
+    assert list(restored) == list(q)
+    assert (restored.current_song_id, restored.repeat, restored.shuffle) == (3, "one", True)
@@ -0,0 +1,86 @@
+import struct
+
+from probe import read_header_info
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames of 1152 samples.
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_BYTES = 417
+
+def id3v2(major: int, frames: bytes) -> bytes:
+    size = len(frames)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3" + bytes([major, 0, 0]) + syncsafe + frames
+
+def text_frame(frame_id: str, text: str, major: int = 3) -> bytes:
+    payload = b"\x03" + text.encode("utf-8") if major == 4 else b"\x00" + text.encode("latin-1")
+    if major == 2:
+        return frame_id.encode() + len(payload).to_bytes(3, "big") + payload
+    if major == 4:
+        size = len(payload)
+        return frame_id.encode() + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + b"\0\0" + payload
+    return frame_id.encode() + struct.pack(">I", len(payload)) + b"\0\0" + payload
+
+def frames(count: int, first: bytes = b"") -> bytes:
+    head = (FRAME_HEADER + first).ljust(FRAME_BYTES, b"\0")
+    return head + (FRAME_HEADER.ljust(FRAME_BYTES, b"\0")) * (count - 1)
+
+def write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_cbr_mp3_duration_and_id3v23_tags(tmp_path):
+    tag = id3v2(3, text_frame("TIT2", "Song") + text_frame("TPE1", "Band"))
+    path = write(tmp_path, "a.mp3", tag + frames(100))
+    info = read_header_info(path)
+    assert (info.title, info.artist) == ("Song", "Band")
+    assert abs(info.duration - 100 * FRAME_BYTES * 8 / 128000) < 1e-9
+
+def test_id3v1_trailer_is_not_counted_as_audio(tmp_path):
+    path = write(tmp_path, "a.mp3", frames(100) + b"TAG".ljust(128, b"\0"))
+    assert abs(read_header_info(path).duration - 100 * FRAME_BYTES * 8 / 128000) < 1e-9
+
+def test_id3v22_and_id3v24_frames(tmp_path):
+    v22 = write(tmp_path, "v22.mp3", id3v2(2, text_frame("TT2", "Old", 2) + text_frame("TP1", "Timer", 2)) + frames(10))
+    v24 = write(tmp_path, "v24.mp3", id3v2(4, text_frame("TIT2", "Café", 4)) + frames(10))
+    assert (read_header_info(v22).title, read_header_info(v22).artist) == ("Old", "Timer")
+    assert read_header_info(v24).title == "Café"
+
+def test_xing_frame_count_sets_vbr_duration(tmp_path):
+    # The Xing header sits after the 4-byte frame header and 32 bytes of stereo side info.
+    xing = b"\0" * 32 + b"Xing" + struct.pack(">II", 1, 5000)
+    path = write(tmp_path, "vbr.mp3", frames(3, xing))
+    assert abs(read_header_info(path).duration - 5000 * 1152 / 44100) < 1e-9
+
+def test_vbri_frame_count_sets_vbr_duration(tmp_path):
+    vbri = b"\0" * 32 + b"VBRI" + b"\0" * 10 + struct.pack(">I", 2500)
+    path = write(tmp_path, "vbri.mp3", frames(3, vbri))
+    assert abs(read_header_info(path).duration - 2500 * 1152 / 44100) < 1e-9
+
+def test_false_sync_before_the_first_frame_is_skipped(tmp_path):
+    path = write(tmp_path, "junk.mp3", b"\xff\xfb\xff\x00junk" + frames(20))
+    assert abs(read_header_info(path).duration - 20 * FRAME_BYTES * 8 / 128000) < 1e-9
+
+def wav(data_bytes: int, info: bytes = b"") -> bytes:
+    fmt = struct.pack("<HHIIHH", 1, 2, 44100, 44100 * 4, 4, 16)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if info:
+        chunks += b"LIST" + struct.pack("<I", len(info)) + info
+    chunks += b"data" + struct.pack("<I", data_bytes) + b"\0" * data_bytes
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+def test_wav_duration_and_riff_info_tags(tmp_path):
+    info = b"INFO" + b"INAM" + struct.pack("<I", 5) + b"Tone\0" + b"\0" + b"IART" + struct.pack("<I", 4) + b"Lab\0"
+    path = write(tmp_path, "a.wav", wav(44100 * 4 * 2, info))
+    result = read_header_info(path)
+    assert (result.title, result.artist) == ("Tone", "Lab")
+    assert result.duration == 2.0
+
+def test_truncated_wav_uses_the_bytes_present(tmp_path):
+    path = write(tmp_path, "cut.wav", wav(44100 * 4)[:-44100 * 2])
+    assert read_header_info(path).duration == 0.5
+
+def test_unrecognised_files_return_none(tmp_path):
+    assert read_header_info(write(tmp_path, "noise.mp3", b"\x00\x01" * 500)) is None
+    assert read_header_info(write(tmp_path, "bad.wav", b"RIFF\0\0\0\0WAVE")) is None
+    assert read_header_info(str(tmp_path / "missing.mp3")) is None
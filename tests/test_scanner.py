@@ -0,0 +1,64 @@
+import os
+import wave
+
+import scanner
+from probe import MetadataCache, TrackInfo
+from scanner import ScannedFile, diff_scan, probe_files, walk_audio_files
+
+def write_wav(path, seconds: float = 1.0, rate: int = 8000) -> str:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0" * int(seconds * rate))
+    return str(path)
+
+def scanned(path: str) -> ScannedFile:
+    stat = os.stat(path)
+    return ScannedFile(path, stat.st_size, stat.st_mtime_ns)
+
+def test_walk_recurses_and_keeps_audio_extensions(tmp_path):
+    (tmp_path / "sub").mkdir()
+    write_wav(tmp_path / "a.wav")
+    write_wav(tmp_path / "sub" / "b.WAV")
+    (tmp_path / "notes.txt").write_text("x")
+    assert sorted(os.path.basename(path) for path, _, _ in walk_audio_files(str(tmp_path))) == ["a.wav", "b.WAV"]
+
+def test_diff_scan_splits_changed_missing_and_unchanged(tmp_path):
+    same = write_wav(tmp_path / "same.wav")
+    edited = write_wav(tmp_path / "edited.wav")
+    new = write_wav(tmp_path / "new.wav")
+    stat = os.stat(same)
+    known = {same: (stat.st_size, stat.st_mtime_ns), edited: (1, 1), str(tmp_path / "gone.wav"): (1, 1)}
+    changed, missing, unchanged = diff_scan(str(tmp_path), known)
+    assert sorted(file.path for file in changed) == sorted([edited, new])
+    assert missing == [str(tmp_path / "gone.wav")]
+    assert unchanged == 1
+
+def test_probe_reads_headers_and_falls_back(tmp_path):
+    wav = write_wav(tmp_path / "a.wav", 2.0)
+    junk = tmp_path / "b.mp3"
+    junk.write_bytes(b"not audio")
+    results = {file.path: file.info for file in probe_files([scanned(wav), scanned(str(junk))], workers=1,
+                                                             fallback=lambda path: 7.0)}
+    assert results[wav].duration == 2.0
+    assert results[str(junk)].duration == 7.0
+
+def test_probe_uses_the_cache_and_fills_it(tmp_path, monkeypatch):
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    try:
+        wav = write_wav(tmp_path / "a.wav", 2.0)
+        file = scanned(wav)
+        assert list(probe_files([file], workers=1, cache=cache))[0].info.duration == 2.0
+        assert cache.get(file.path, file.size, file.mtime_ns).duration == 2.0
+
+        def fail(path):
+            raise AssertionError("probed a cached file")
+
+        monkeypatch.setattr(scanner, "read_header_info", fail)
+        assert list(probe_files([scanned(wav)], workers=1, cache=cache))[0].info.duration == 2.0
+        cache.put(file.path, file.size, file.mtime_ns + 1, TrackInfo(duration=9.0))
+        monkeypatch.setattr(scanner, "read_header_info", lambda path: TrackInfo(duration=3.0))
+        assert list(probe_files([scanned(wav)], workers=1, cache=cache))[0].info.duration == 3.0
+    finally:
+        cache.close()
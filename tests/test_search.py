@@ -0,0 +1,29 @@
+from core import SongStore
+from search import SearchIndex
+
+def build(titles):
+    store = SongStore()
+    index = SearchIndex(store)
+    songs = [store.add(title, f"Artist {i % 7}", "Happy", 200) for i, title in enumerate(titles)]
+    for song in songs:
+        index.add(song)
+    return index, songs
+
+def test_late_exact_match_beats_earlier_prefix_hits():
+    index, songs = build([f"Lovely {i}" for i in range(200)] + ["Love"])
+    assert index.search("love", 5)[0] == songs[-1].id
+
+def test_exact_tier_is_ranked_in_full():
+    index, songs = build([f"My Love {i}" for i in range(200)] + ["Love Story"])
+    assert index.search("love", 5)[0] == songs[-1].id
+
+def test_prefix_hits_fill_remaining_slots():
+    index, songs = build([f"Lovely {i}" for i in range(10)] + ["Love"])
+    results = index.search("love", 5)
+    assert results[0] == songs[-1].id
+    assert len(results) == 5
+
+def test_fuzzy_terms_are_a_fallback():
+    index, songs = build(["Sunshine", "Moonlight"])
+    assert index.search("sunshina") == [songs[0].id]
+    assert index.search("moon") == [songs[1].id]
@@ -0,0 +1,80 @@
+import json
+import socket
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import pytest
+
+from core import MusicPlayer
+from server import ControlServer
+from storage import SqliteStorage
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with redirect_stdout(StringIO()):
+        player = MusicPlayer(storage=SqliteStorage(str(tmp_path / "test.db"), import_json=None))
+    server = ControlServer(player, port=0, refresh_interval=0.01)
+    server.start_in_thread()
+    yield server
+    server.stop()
+    player.close()
+
+def send(server, raw: bytes):
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+        sock.sendall(raw)
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def request(server, method: str, path: str, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    return send(server, f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_malformed_requests_are_rejected(server):
+    assert send(server, b"GARBAGE\r\n\r\n")[0] == 400
+    assert send(server, b"POST /playlists HTTP/1.1\r\nContent-Length: lots\r\n\r\n")[0] == 400
+    assert send(server, b"POST /playlists HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")[0] == 413
+    assert request(server, "POST", "/playlists", ["not", "an", "object"])[0] == 400
+    assert request(server, "POST", "/playlists", {})[0] == 400
+    assert request(server, "GET", "/nowhere")[0] == 404
+    assert request(server, "PUT", "/status")[0] == 405
+    assert request(server, "GET", "/songs/100000")[0] == 404
+
+def test_reads_and_writes(server):
+    status, body = request(server, "GET", "/status")
+    assert status == 200 and body["playing"] is False
+    status, body = request(server, "GET", "/library?limit=5")
+    assert status == 200 and body["total"] == 12 and len(body["songs"]) == 5
+    assert request(server, "POST", "/playlists", {"name": "Mix"}) == (201, {"name": "Mix"})
+    assert request(server, "POST", "/playlists", {"name": "Mix"})[0] == 409
+    assert request(server, "POST", "/playlists/Mix/songs", {"ids": [0, 1, 0]}) == (200, {"added": [0, 1], "skipped": [0]})
+    assert [song["id"] for song in request(server, "GET", "/playlists/Mix")[1]["songs"]] == [0, 1]
+    assert request(server, "POST", "/transport/play", {"id": 3})[1]["song"] == 3
+    assert request(server, "DELETE", "/playlists/Mix") == (200, {"deleted": "Mix"})
+    assert request(server, "GET", "/playlists/Mix")[0] == 404
+
+def test_idle_server_does_not_wake_the_owner(server):
+    jobs = []
+    submit = server.owner
+    server.owner = lambda work: jobs.append(work) or submit(work)
+    time.sleep(0.2)
+    assert jobs == []
+    # A change made by the owner itself (a GUI click) is still picked up without a request.
+    submit(lambda: server.player.create_playlist("Side")).result()
+    wait_for(lambda: any(playlist["name"] == "Side" for playlist in server.snapshot.playlists))
+    settled = len(jobs)
+    time.sleep(0.2)
+    assert len(jobs) == settled
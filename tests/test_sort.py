@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from core import LinkedList, SongStore, SortingManager
+
+ARTISTS = ["b", "A", "c"]
+
+def songs(count: int = 60, seed: int = 4) -> list:
+    rng = random.Random(seed)
+    store = SongStore()
+    return [store.add(f"T{rng.randrange(20)}", rng.choice(ARTISTS), "Calm", rng.randrange(5) * 60) for _ in range(count)]
+
+def expected(items, spec):
+    ordered = list(items)
+    for name, descending in reversed(spec):
+        if name == "duration":
+            ordered.sort(key=lambda song: song.duration, reverse=descending)
+        else:
+            ordered.sort(key=lambda song: getattr(song, name).lower(), reverse=descending)
+    return [song.id for song in ordered]
+
+SPECS = [[("artist", False), ("title", True)], [("duration", True), ("artist", False), ("title", False)], ["-title"]]
+
+@pytest.mark.parametrize("engine", ["timsort", "merge"])
+@pytest.mark.parametrize("spec", SPECS)
+def test_engines_match_a_stable_multi_key_sort(engine, spec):
+    items = songs()
+    manager = SortingManager()
+    result = manager.sort_songs(LinkedList(items), spec, engine=engine)
+    parsed = [(item.lstrip("-"), item.startswith("-")) if isinstance(item, str) else item for item in spec]
+    assert [song.id for song in result] == expected(items, parsed)
+    assert len(result) == len(items)
+
+def test_merge_engine_relinks_nodes_and_counts():
+    items = songs()
+    linked = LinkedList(items)
+    manager = SortingManager()
+    manager.sort_songs(linked, ["artist"], engine="merge")
+    assert list(linked.to_python_list()) == sorted(items, key=lambda song: song.artist.lower())
+    assert linked.size == len(items)
+    linked.append(items[0])
+    assert linked.to_python_list()[-1] == items[0]
+    assert 0 < manager.comparisons < len(items) * 8
+    assert manager.swaps > 0
+
+def test_timsort_comparisons_are_counted_or_reported_unavailable():
+    items = songs()
+    manager = SortingManager()
+    stats = []
+    manager.stats_callback = lambda comparisons, swaps: stats.append((comparisons, swaps))
+    manager.sort_songs(LinkedList(items), ["title"])
+    assert manager.comparisons is None
+    manager.sort_songs(LinkedList(items), ["title"], count_comparisons=True)
+    assert manager.comparisons >= len(items) - 1
+    assert stats[0][0] is None and stats[1][0] == manager.comparisons
+
+def test_sorted_input_needs_no_swaps():
+    items = sorted(songs(), key=lambda song: song.title.lower())
+    manager = SortingManager()
+    manager.sort_songs(LinkedList(items), ["title"], count_comparisons=True)
+    assert manager.swaps == 0
+    assert manager.comparisons == len(items) - 1
+
+def test_unknown_engine_and_field_are_rejected():
+    manager = SortingManager()
+    with pytest.raises(ValueError):
+        manager.sort_songs(LinkedList(songs()), ["title"], engine="quick")
+    with pytest.raises(ValueError):
+        manager.sort_songs(LinkedList(songs()), ["genre"])
+
+def replay(items, events):
+    # Apply the delta events to a copy the way the song table does, to check they describe the sort.
+    view = list(items)
+    for event in events:
+        if event[0] == "swap":
+            view[event[1]], view[event[2]] = view[event[2]], view[event[1]]
+        elif event[0] == "move":
+            view.insert(event[2], view.pop(event[1]))
+    return view
+
+@pytest.mark.parametrize("algorithm", ["Bubble Sort", "Selection Sort", "Insertion Sort"])
+def test_step_events_replay_to_the_sorted_order(algorithm):
+    items = songs(25)
+    manager = SortingManager()
+    stats = []
+    manager.stats_callback = lambda comparisons, swaps: stats.append((comparisons, swaps))
+    run = manager.start(algorithm, items, ["title"])
+    events = []
+    while not run.finished:
+        events.extend(run.step(7))
+    result = list(run.songs)
+    assert replay(items, events) == result
+    assert [song.title.lower() for song in result] == sorted(song.title.lower() for song in items)
+    assert manager.comparisons == sum(1 for event in events if event[0] == "compare")
+    assert manager.swaps == sum(1 for event in events if event[0] in ("swap", "move"))
+    assert stats == [(manager.comparisons, manager.swaps)]
+    assert not manager.is_sorting
+
+def test_paused_runs_emit_nothing_and_cancel_finishes_the_run():
+    manager = SortingManager()
+    run = manager.start("Bubble Sort", songs(25))
+    assert manager.start("Bubble Sort", songs(5)) is None
+    run.set_speed(3)
+    assert len(run.next_frame()) == 3
+    run.pause()
+    assert run.next_frame() == []
+    run.resume()
+    run.cancel()
+    assert run.finished and run.cancelled and not manager.is_sorting
+    assert run.step() == []
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        SortingManager().start("Bogo Sort", songs(5))
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+
+import pytest
+
+from storage import SqliteStorage, Storage, song_key
+
+def song(title: str, duration: float = 100.0, **fields) -> dict:
+    return {"title": title, "artist": "Artist", "mood": "Happy", "duration": duration, "filepath": None, **fields}
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "test.db"), import_json=None)
+    yield storage
+    storage.close()
+
+def test_incomplete_backends_fail_at_construction():
+    class PlaylistNamesOnly(Storage):
+        def playlist_names(self):
+            return []
+
+    with pytest.raises(TypeError):
+        PlaylistNamesOnly()
+
+def test_migration_adds_columns_and_backfills_playlist_totals(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE songs (id INTEGER PRIMARY KEY, song_key TEXT NOT NULL UNIQUE, title TEXT NOT NULL, artist TEXT NOT NULL,
+                            mood TEXT NOT NULL, duration REAL NOT NULL, filepath TEXT, in_library INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE playlists (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE playlist_entries (playlist_id INTEGER NOT NULL, position INTEGER NOT NULL, song_id INTEGER NOT NULL,
+                                       PRIMARY KEY (playlist_id, position));
+        INSERT INTO songs VALUES (1, 'track:A|Artist|100', 'A', 'Artist', 'Happy', 100, NULL, 1);
+        INSERT INTO songs VALUES (2, 'track:B|Artist|50', 'B', 'Artist', 'Sad', 50, NULL, 1);
+        INSERT INTO playlists VALUES (1, 'Mix');
+        INSERT INTO playlist_entries VALUES (1, 0, 1), (1, 1, 2), (1, 2, 1);
+    """)
+    conn.commit()
+    conn.close()
+    storage = SqliteStorage(path, import_json=None)
+    try:
+        assert storage.playlist_headers() == [("Mix", 3, 250.0)]
+    finally:
+        storage.close()
+
+def test_batch_commits_once_and_rolls_back_on_error(storage):
+    with storage.batch():
+        storage.create_playlist("Kept")
+        with storage.batch():
+            storage.append_entries("Kept", [song("A")])
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.create_playlist("Dropped")
+            storage.append_entries("Kept", [song("B")])
+            raise RuntimeError
+    assert storage.playlist_headers() == [("Kept", 1, 100.0)]
+    assert not storage.conn.in_transaction
+
+def test_append_and_replace_keep_headers_in_step(storage):
+    storage.create_playlist("Mix")
+    storage.append_entries("Mix", [song("A"), song("B", 50)])
+    storage.append_entries("Mix", [song("A")])
+    assert storage.playlist_headers() == [("Mix", 3, 250.0)]
+    storage.replace_entries("Mix", [song("B", 50)])
+    assert storage.playlist_headers() == [("Mix", 1, 50.0)]
+    assert [entry["title"] for entry in storage.load_playlist("Mix")] == ["B"]
+
+def test_duration_edit_updates_playlist_totals(storage):
+    storage.add_library_songs([song("A")])
+    storage.create_playlist("Mix")
+    storage.append_entries("Mix", [song("A"), song("A")])
+    storage.update_library_song(song_key(song("A")), song("A", 130))
+    assert storage.playlist_headers() == [("Mix", 2, 260.0)]
+
+def test_edit_that_clashes_with_another_song_merges_the_rows(storage):
+    storage.add_library_songs([song("A"), song("B", 50)])
+    storage.create_playlist("Mix")
+    storage.append_entries("Mix", [song("A"), song("B", 50)])
+    storage.update_library_song(song_key(song("B", 50)), song("A", mood="Sad"))
+    assert [(entry["title"], entry["mood"]) for entry in storage.load_playlist("Mix")] == [("A", "Sad"), ("A", "Sad")]
+    assert storage.playlist_headers() == [("Mix", 2, 200.0)]
+    assert len(storage.load_library()) == 1
+
+def test_removed_songs_leave_the_library_but_stay_in_playlists(storage):
+    storage.add_library_songs([song("A"), song("B")])
+    storage.create_playlist("Mix")
+    storage.append_entries("Mix", [song("A")])
+    storage.remove_library_songs([song("A")])
+    assert [entry["title"] for entry in storage.load_library()] == ["B"]
+    assert storage.playlists_with_songs([song("A")]) == ["Mix"]
+
+def test_state_round_trip(storage):
+    storage.save_state("queue", {"songs": ["a", "b"]})
+    assert storage.load_state("queue") == {"songs": ["a", "b"]}
+    assert storage.load_state("missing") is None
+
+def test_fingerprints_and_merged_copies_persist(storage):
+    copy = song("Copy", filepath="/music/copy.wav")
+    storage.add_library_songs([song("A"), copy])
+    storage.save_fingerprints([(song_key(song("A")), "fp")])
+    assert storage.load_fingerprints() == {song_key(song("A")): "fp"}
+    storage.remove_library_songs([copy])
+    storage.save_merged([(song_key(copy), "10:20::")])
+    assert storage.load_merged() == {os.path.abspath("/music/copy.wav"): "10:20::"}
+    storage.add_library_songs([copy])
+    assert storage.load_merged() == {}
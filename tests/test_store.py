@@ -0,0 +1,29 @@
+import pytest
+
+from core import SongStore
+
+@pytest.fixture
+def store():
+    store = SongStore()
+    for title, artist, mood, duration in [("A", "X", "Happy", 200), ("B", "Y", "Sad", 120), ("C", "X", "Happy", 300),
+                                          ("D", "Z", "Calm", 240), ("E", "Y", "Happy", 90)]:
+        store.add(title, artist, mood, duration)
+    return store
+
+def test_strings_are_interned_once(store):
+    assert store.artists[0] == store.artists[2]
+    assert store.strings.count("Happy") == 1
+
+def test_update_moves_the_key(store):
+    song = store.get(1)
+    old_key = song.key
+    version = store.version
+    store.update(1, title="B2", duration=121)
+    assert store.find(old_key) is None
+    assert store.find(song.key).id == 1
+    assert (song.title, song.duration, song.artist) == ("B2", 121.0, "Y")
+    assert store.version > version
+
+def test_intern_song_reuses_matching_entries(store):
+    assert store.intern_song({"title": "A", "artist": "X", "mood": "Sad", "duration": 200}).id == 0
+    assert store.intern_song({"title": "F", "artist": "X", "mood": "Sad", "duration": 10}).id == 5